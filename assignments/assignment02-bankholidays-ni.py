@@ -10,28 +10,24 @@ public JSON API: https://www.gov.uk/bank-holidays.json
 
 import requests
 
+from bankholidays_client import get_bank_holidays
+from bankholidays_index import index_for
+
 def fetch_bank_holiday_data():
-    """Fetches bank holiday data from the UK Government API."""
-    url = "https://www.gov.uk/bank-holidays.json"
+    """Fetches bank holiday data from the UK Government API (via the cached client)."""
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json()
+        return get_bank_holidays()
     except requests.RequestException as e:
         print(f"Error fetching data: {e}")
         return None
 
 def find_unique_ni_holidays(data):
-    """Identifies holidays unique to Northern Ireland."""
-    ni_events = data['northern-ireland']['events']
-    ew_titles = set(event['title'] for event in data['england-and-wales']['events'])
-    scot_titles = set(event['title'] for event in data['scotland']['events'])
-
-    unique_events = [
-        event for event in ni_events
-        if event['title'] not in ew_titles and event['title'] not in scot_titles
-    ]
-    return unique_events
+    """Identifies holidays unique to Northern Ireland.
+
+    The title sets are built once per payload by bankholidays_index, so
+    repeated calls are just a dictionary lookup.
+    """
+    return index_for(data).exclusive('northern-ireland')
 
 def display_unique_holidays(events):
     """Prints unique Northern Ireland holidays to the terminal."""
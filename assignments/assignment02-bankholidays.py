@@ -9,13 +9,16 @@ using the UK Government's public JSON API: https://www.gov.uk/bank-holidays.json
 
 import requests
 
+from bankholidays_client import get_bank_holidays
+
 def fetch_bank_holidays(region="northern-ireland"):
-    """Fetches bank holiday events for the specified UK region."""
-    url = "https://www.gov.uk/bank-holidays.json"
+    """Fetches bank holiday events for the specified UK region.
+
+    Goes through the shared cached client, so repeat runs within a day
+    do not hit the API again.
+    """
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
+        data = get_bank_holidays()
         return data[region]["events"]
     except requests.RequestException as e:
         print(f"Error fetching data: {e}")
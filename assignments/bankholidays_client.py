@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+bankholidays_client.py
+Author: Edward Cronin
+
+Shared, cached client for the UK Government bank holidays API
+(https://www.gov.uk/bank-holidays.json), used by assignment02-bankholidays.py,
+assignment02-bankholidays-ni.py and my-work/code/Lab02_bank_holidays.py.
+
+- The parsed JSON is kept in memory for the life of the process and in a
+  small cache file on disk, so repeat lookups and repeat runs do not touch
+  the network at all while the cache is younger than the TTL (24 hours).
+- Once the TTL has passed the cache is revalidated with a conditional GET
+  (If-None-Match / If-Modified-Since). A 304 reply just renews the cache.
+- All requests go through one pooled requests.Session with a timeout.
+- If the API cannot be reached but an older copy is cached, that copy is
+  returned rather than failing.
+
+The URL, TTL and cache file can all be passed in, so the client can be
+exercised against a local stub HTTP server.
+"""
+
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import requests
+
+URL = "https://www.gov.uk/bank-holidays.json"
+DEFAULT_TTL = 24 * 60 * 60      # seconds
+TIMEOUT = 10                    # seconds
+CACHE_FILE = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "pfda" / "bank-holidays.json"
+
+_session = None
+_memory = {}    # url -> cache record, for repeat lookups in the same process
+
+
+def get_session():
+    """One shared Session, so connections are pooled and kept alive."""
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        _session.headers.update({"Accept": "application/json"})
+    return _session
+
+
+def _read_cache(cache_path):
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache(cache_path, record):
+    cache_path = Path(cache_path)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = cache_path.with_name(cache_path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(record, f)
+    os.replace(tmp, cache_path)
+
+
+def get_bank_holidays(url=URL, ttl=DEFAULT_TTL, cache_path=CACHE_FILE, session=None, timeout=TIMEOUT):
+    """Returns the full bank holidays payload (a dict keyed by region).
+
+    Raises requests.RequestException only when the API fails and nothing
+    usable is cached.
+    """
+    now = time.time()
+    record = _memory.get(url)
+    if record is None and cache_path is not None:
+        record = _read_cache(cache_path)
+        if record is not None and record.get("url") != url:
+            record = None
+    if record is not None and now - record["fetched_at"] < ttl:
+        _memory[url] = record
+        return record["data"]
+
+    headers = {}
+    if record is not None:
+        if record.get("etag"):
+            headers["If-None-Match"] = record["etag"]
+        if record.get("last_modified"):
+            headers["If-Modified-Since"] = record["last_modified"]
+
+    try:
+        response = (session or get_session()).get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and record is not None:
+            record = dict(record, fetched_at=now)
+        else:
+            response.raise_for_status()
+            record = {
+                "url": url,
+                "fetched_at": now,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "data": response.json(),
+            }
+    except (requests.RequestException, ValueError) as e:
+        if record is None:
+            raise requests.RequestException(f"Could not fetch {url}: {e}") from e
+        print(f"Warning: using cached bank holidays ({e})", file=sys.stderr)
+        _memory[url] = record
+        return record["data"]
+
+    _memory[url] = record
+    if cache_path is not None:
+        _write_cache(cache_path, record)
+    return record["data"]
+
+
+def get_region_events(region="northern-ireland", **kwargs):
+    """Returns the list of events for one region, e.g. 'scotland'."""
+    return get_bank_holidays(**kwargs)[region]["events"]
+
+
+def clear_memory_cache():
+    """Forgets the in-process copy (the disk cache is left alone)."""
+    _memory.clear()
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    data = get_bank_holidays()
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    get_bank_holidays()
+    again = time.perf_counter() - start
+    print(f"Regions: {', '.join(data)}")
+    print(f"First lookup: {first * 1e3:.1f} ms, repeat lookup: {again * 1e6:.1f} µs")
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+bankholidays_index.py
+Author: Edward Cronin
+
+In-memory index over the UK bank holidays payload for fast, repeated
+questions such as "is this date a holiday in Scotland?" or "how many
+business days between A and B in Northern Ireland?".
+
+The index is built once from the JSON (see bankholidays_client.py):
+
+- per region, a sorted NumPy datetime64[D] array of holiday dates and a set
+  of ISO date strings, so a single lookup is one set membership test and a
+  batch of dates is one np.isin call;
+- per region, a NumPy business-day calendar (Mon-Fri minus that region's
+  holidays), so business days between many (start, end) pairs are counted
+  by one vectorised np.busday_count call;
+- the holidays unique to each region (by title, as in
+  assignment02-bankholidays-ni.py), computed once with set differences.
+
+Run `python bankholidays_index.py --benchmark` for a micro-benchmark
+against the linear list scans.
+"""
+
+import argparse
+import datetime as dt
+import time
+
+import numpy as np
+import requests
+
+from bankholidays_client import get_bank_holidays
+
+
+def _iso(day):
+    return day if isinstance(day, str) else day.isoformat()
+
+
+class HolidayIndex:
+    """Lookup structures for every region in a bank holidays payload."""
+
+    def __init__(self, data):
+        self.regions = list(data)
+        self.events = {r: sorted(data[r]["events"], key=lambda e: e["date"]) for r in self.regions}
+        self.dates = {r: np.array([e["date"] for e in self.events[r]], dtype="datetime64[D]")
+                      for r in self.regions}
+        self.date_sets = {r: {e["date"] for e in self.events[r]} for r in self.regions}
+        self.calendars = {r: np.busdaycalendar(holidays=self.dates[r]) for r in self.regions}
+
+        titles = {r: {e["title"] for e in self.events[r]} for r in self.regions}
+        self.exclusive_titles = {}
+        for r in self.regions:
+            others = set().union(*(titles[o] for o in self.regions if o != r))
+            self.exclusive_titles[r] = titles[r] - others
+        self.exclusive_events = {r: [e for e in self.events[r] if e["title"] in self.exclusive_titles[r]]
+                                 for r in self.regions}
+
+    def is_holiday(self, day, region="northern-ireland"):
+        """True if ``day`` (a date or 'YYYY-MM-DD') is a bank holiday in ``region``."""
+        return _iso(day) in self.date_sets[region]
+
+    def are_holidays(self, days, region="northern-ireland"):
+        """Vectorised is_holiday: boolean array for an array-like of dates."""
+        return np.isin(np.asarray(days, dtype="datetime64[D]"), self.dates[region])
+
+    def holidays_between(self, start, end, region="northern-ireland"):
+        """Events with start <= date < end, found by binary search."""
+        dates = self.dates[region]
+        lo, hi = np.searchsorted(dates, np.datetime64(_iso(start), "D")), \
+            np.searchsorted(dates, np.datetime64(_iso(end), "D"))
+        return self.events[region][lo:hi]
+
+    def business_days(self, start, end, region="northern-ireland"):
+        """Mon-Fri non-holidays in [start, end); start/end may be arrays (vectorised)."""
+        return np.busday_count(np.asarray(start, dtype="datetime64[D]"),
+                               np.asarray(end, dtype="datetime64[D]"),
+                               busdaycal=self.calendars[region])
+
+    def exclusive(self, region="northern-ireland"):
+        """Events whose title appears in ``region`` and in no other region."""
+        return self.exclusive_events[region]
+
+
+_cached = (None, None)
+
+
+def index_for(data):
+    """The HolidayIndex for ``data``, rebuilt only when the payload object changes."""
+    global _cached
+    if _cached[0] is not data:
+        _cached = (data, HolidayIndex(data))
+    return _cached[1]
+
+
+def benchmark(data, n=1_000_000, region="northern-ireland"):
+    """Time set/vectorised lookups against the linear scans callers used before."""
+    index = index_for(data)
+    events = data[region]["events"]
+    rng = np.random.default_rng(0)
+    first, last = index.dates[region][0], index.dates[region][-1]
+    span = int((last - first).astype(int)) + 1
+    days = first + rng.integers(0, span, n).astype("timedelta64[D]")
+    iso_days = days.astype(str).tolist()
+
+    sample = iso_days[:10_000]
+    t = time.perf_counter()
+    linear = [any(e["date"] == d for e in events) for d in sample]
+    t_linear = (time.perf_counter() - t) / len(sample)
+
+    t = time.perf_counter()
+    fast = [index.is_holiday(d, region) for d in iso_days]
+    t_set = (time.perf_counter() - t) / n
+
+    t = time.perf_counter()
+    vec = index.are_holidays(days, region)
+    t_vec = (time.perf_counter() - t) / n
+
+    ends = days + rng.integers(1, 365, n).astype("timedelta64[D]")
+    t = time.perf_counter()
+    index.business_days(days, ends, region)
+    t_bus = (time.perf_counter() - t) / n
+
+    print(f"is_holiday, linear scan of events   {1 / t_linear:14,.0f} lookups/s")
+    print(f"is_holiday, set lookup              {1 / t_set:14,.0f} lookups/s")
+    print(f"are_holidays, vectorised            {1 / t_vec:14,.0f} lookups/s")
+    print(f"business_days, vectorised ranges    {1 / t_bus:14,.0f} ranges/s")
+    print("Results agree:", linear == fast[:len(sample)] == vec[:len(sample)].tolist())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bank holiday lookups from an in-memory index.")
+    parser.add_argument("--region", default="northern-ireland")
+    parser.add_argument("--benchmark", action="store_true")
+    args = parser.parse_args()
+
+    try:
+        payload = get_bank_holidays()
+    except requests.RequestException as e:
+        print(f"Error fetching data: {e}")
+        raise SystemExit(1)
+    if args.benchmark:
+        benchmark(payload, region=args.region)
+    else:
+        idx = index_for(payload)
+        today = dt.date.today()
+        print(f"Today is a holiday in {args.region}: {idx.is_holiday(today, args.region)}")
+        print(f"Business days in the next 30 days: "
+              f"{idx.business_days(today, today + dt.timedelta(days=30), args.region)}")
+        print(f"Holidays only in {args.region}: {sorted(idx.exclusive_titles[args.region])}")
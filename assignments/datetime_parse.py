@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+datetime_parse.py
+Author: Edward Cronin
+
+One datetime parser for the weather and flight cleaners, with the format
+of each column detected once and remembered.
+
+clean_weather_data (project.ipynb Step 3), the flight cleaners (Steps 15
+and 19, now flight_clean.py) and assignment06's parse_datetime_column
+each called pd.to_datetime(..., errors="coerce") and worked the format out
+again on every load: probing candidate formats against a sample, or
+letting pandas guess from the first value. A column mixing ISO
+('2025-06-01 10:00:00') and Met Éireann ('01-jun-2025 10:00') values
+matched no single format, so it went to flexible parsing, which either
+guesses from the first value and turns every row in the other layout into
+NaT, or (format="mixed") parses each string on its own. Here instead:
+
+- every value is reduced to a "shape": its first ``SHAPE_CHARS``
+  characters with digits as '9' and letters as 'a' ('01-jun-2025 10:00'
+  -> '99-aaa-9999 99:99'). This is computed for the whole column with
+  numpy byte-array operations, and a column normally has one to three
+  shapes;
+- the format of each shape is detected once from a sample of its values
+  (the first of ``FORMATS`` that parses at least ``MATCH_SHARE`` of them)
+  and kept in a cache keyed by (source, column, shape);
+- every shape's rows are then parsed with their explicit format in one
+  vectorised pd.to_datetime call. Formats already in ISO order
+  (``ISO_FORMATS``) go to pandas as they are; fixed-width formats that are
+  not (the Met Éireann '%d-%b-%Y %H:%M' included) are first rearranged
+  into 'YYYY-MM-DD HH:MM:SS' with numpy byte copies, because pandas only
+  has a fast parser for ISO order. Once a column's only cached format is
+  ISO-ordered, later calls hand the whole column to pandas with that
+  format and skip the shape pass unless some value fails to parse. A cached format that stops matching
+  (under ``MATCH_SHARE`` parsed) is detected again; only a shape no
+  format fits falls back to per-value parsing.
+
+Values that are already datetimes pass straight through, and the result
+is always datetime64[ns] with NaT for anything unparseable.
+
+Run `python datetime_parse.py --benchmark` for rows/sec against the
+notebooks' pd.to_datetime calls.
+"""
+
+import argparse
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+FORMATS = [
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S.%f",
+    "%Y-%m-%dt%H:%M:%S.%f",     # Aviation Edge
+    "%d-%b-%Y %H:%M",           # Met Éireann
+    "%d/%m/%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M",
+    "%d-%m-%Y %H:%M",
+    "%d %b %Y %H:%M",
+    "%d %B %Y %H:%M",
+    "%Y-%m-%d",
+]
+SAMPLE_ROWS = 80
+MATCH_SHARE = 0.7
+SHAPE_CHARS = 24
+FIXED_WIDTHS = {"%Y": 4, "%m": 2, "%d": 2, "%b": 3, "%H": 2, "%M": 2, "%S": 2}
+# ISO-ordered formats ('T' or ' ' between date and time) that pandas' own C parser handles
+ISO_FORMATS = {"%Y-%m-%d", "%Y-%m-%d %H", "%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S"}
+MONTHS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+
+_CACHE = {}
+
+
+def detect_format(samples, formats=FORMATS):
+    """The first of ``formats`` that parses at least MATCH_SHARE of ``samples``, or None."""
+    samples = pd.Series(samples, dtype=object)
+    for fmt in formats:
+        parsed = pd.to_datetime(samples, format=fmt, errors="coerce")
+        if parsed.notna().sum() >= max(1, int(len(samples) * MATCH_SHARE)):
+            return fmt
+    return None
+
+
+def shapes(values):
+    """Integer shape code per value of ``values`` (strings), and the shape strings themselves.
+
+    A shape is the value's first SHAPE_CHARS characters with every digit
+    replaced by '9' and every ASCII letter by 'a'; shorter values are padded
+    with NULs, so the length is part of the shape.
+    """
+    try:
+        chars = np.asarray(values, dtype=f"S{SHAPE_CHARS}").view(np.uint8)
+    except UnicodeEncodeError:
+        chars = np.minimum(np.asarray(values, dtype=f"U{SHAPE_CHARS}").view(np.uint32), 127).astype(np.uint8)
+    chars = chars.reshape(len(values), SHAPE_CHARS)
+    cls = chars.copy()
+    cls[(chars >= 48) & (chars <= 57)] = ord("9")
+    lower = chars | 32
+    cls[(lower >= 97) & (lower <= 122)] = ord("a")
+    # one 64-bit key per value from the SHAPE_CHARS class bytes, then a hash-based factorize
+    words = cls.view(np.uint64)
+    key = np.zeros(len(values), dtype=np.uint64)
+    for j in range(words.shape[1]):
+        key = key * np.uint64(0x9E3779B97F4A7C15) ^ words[:, j]
+    inverse, _ = pd.factorize(key)
+    first = np.unique(inverse, return_index=True)[1]
+    names = [cls[i].tobytes().rstrip(b"\0").decode("ascii", "replace") for i in first]
+    return inverse, names
+
+
+def parse_datetimes(values, source=None, column=None, formats=FORMATS, cache=_CACHE):
+    """``values`` as datetime64[ns], each shape parsed with its cached explicit format.
+
+    ``source`` and ``column`` name the cache entry (e.g. "hly532", "date");
+    without them the formats are detected afresh. Returns a Series on the
+    input's index.
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.tz_localize(None).astype("datetime64[ns]") if series.dt.tz else series.astype("datetime64[ns]")
+    out = np.full(len(series), np.datetime64("NaT"), dtype="datetime64[ns]")
+    present = series.notna().to_numpy()
+    if present.any() and source is not None:
+        # a column seen before with one ISO-ordered format: let pandas parse it whole, and only
+        # group by shape if that leaves anything unparsed
+        known = [(k[2], fmt) for k, fmt in cache.items() if k[:2] == (source, column)]
+        if len(known) == 1 and _fixed_layout(known[0][1], known[0][0]) is None:
+            whole = present.all()
+            result = pd.to_datetime(series if whole else series[present], format=known[0][1], errors="coerce")
+            if result.notna().all():
+                if whole:
+                    return result.astype("datetime64[ns]")
+                out[present] = result.to_numpy(dtype="datetime64[ns]")
+                return pd.Series(out, index=series.index, name=series.name)
+    if present.any():
+        text = series[present].astype(str).to_numpy(dtype=object)
+        inverse, names = shapes(text)
+        parsed = np.empty(len(text), dtype="datetime64[ns]")
+        for code, shape in enumerate(names):
+            rows = inverse == code if len(names) > 1 else slice(None)
+            group = pd.Series(text[rows], dtype=object)
+            key = (source, column, shape)
+            fmt = cache.get(key) if source is not None else None
+            result = _parse(group, fmt, shape) if fmt else None
+            if result is None or result.notna().mean() < MATCH_SHARE:
+                fmt = detect_format(group.head(SAMPLE_ROWS), formats)
+                result = _parse(group, fmt, shape)
+                if fmt and source is not None:
+                    cache[key] = fmt
+            parsed[rows] = result.to_numpy(dtype="datetime64[ns]")
+        out[present] = parsed
+    return pd.Series(out, index=series.index, name=series.name)
+
+
+def _parse(group, fmt, shape=None):
+    if fmt:
+        layout = _fixed_layout(fmt, shape)
+        if layout is not None:
+            return _parse_fixed(group, layout)
+        return pd.to_datetime(group, format=fmt, errors="coerce")
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return pd.to_datetime(group, format="mixed", dayfirst=True, errors="coerce")
+
+
+def _fixed_layout(fmt, shape):
+    """{directive: (start, width)} if ``fmt`` is all fixed-width fields, not already in ISO order,
+    and ``shape`` has its exact width; else None (parse with ``fmt`` directly)."""
+    if fmt.replace("T", " ") in ISO_FORMATS:
+        return None
+    if shape is None or "%Y" not in fmt or "%d" not in fmt or ("%m" in fmt) == ("%b" in fmt):
+        return None
+    layout, pos, i = {}, 0, 0
+    while i < len(fmt):
+        if fmt[i] == "%":
+            directive = fmt[i:i + 2]
+            if directive not in FIXED_WIDTHS:
+                return None
+            layout[directive] = (pos, FIXED_WIDTHS[directive])
+            pos += FIXED_WIDTHS[directive]
+            i += 2
+        else:
+            pos += 1
+            i += 1
+    return layout if pos == len(shape) else None
+
+
+def _parse_fixed(group, layout):
+    """Copy each field's bytes into 'YYYY-MM-DD HH:MM:SS' order and parse with pandas' ISO parser.
+
+    Only ISO-ordered strings get pandas' fast C parser; anything else (the
+    Met Éireann '%d-%b-%Y %H:%M' included) goes through strptime value by
+    value, about ten times slower.
+    """
+    width = max(start + size for start, size in layout.values())
+    chars = np.asarray(group.to_numpy(dtype=object), dtype=f"S{width}").view(np.uint8).reshape(len(group), width)
+    iso = np.tile(np.frombuffer(b"0000-00-00 00:00:00", dtype=np.uint8), (len(group), 1))
+    for directive, target in (("%Y", 0), ("%d", 8), ("%H", 11), ("%M", 14), ("%S", 17)):
+        if directive in layout:
+            start, size = layout[directive]
+            iso[:, target:target + size] = chars[:, start:start + size]
+    if "%m" in layout:
+        start, _ = layout["%m"]
+        iso[:, 5:7] = chars[:, start:start + 2]
+    else:
+        start, _ = layout["%b"]
+        letters = (chars[:, start:start + 3] | 32).astype(np.int64)
+        code = (letters[:, 0] << 16) | (letters[:, 1] << 8) | letters[:, 2]
+        known = np.array([(ord(m[0]) << 16) | (ord(m[1]) << 8) | ord(m[2]) for m in MONTHS])
+        order = np.argsort(known)
+        at = np.minimum(np.searchsorted(known[order], code), len(MONTHS) - 1)
+        month = order[at] + 1
+        iso[:, 5] = 48 + month // 10
+        iso[:, 6] = 48 + month % 10
+        iso[known[order][at] != code, :4] = ord("x")   # not a month name: NaT
+    text = iso.view("S19").ravel().astype("U19")
+    parsed = pd.to_datetime(text, format="%Y-%m-%d %H:%M:%S", errors="coerce")
+    return pd.Series(parsed, index=group.index)
+
+
+def cached_formats(source=None, cache=_CACHE):
+    """{(source, column, shape): format} for everything detected so far (optionally one source)."""
+    return {k: v for k, v in cache.items() if source is None or k[0] == source}
+
+
+def clear_cache(cache=_CACHE):
+    cache.clear()
+
+
+# --- benchmark -------------------------------------------------------------
+
+def _sample(rows, seed=0):
+    """Hourly timestamps as strings: Met Éireann layout, ISO layout, and a 50/50 mix of the two."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("1945-01-01", periods=rows, freq="h")
+    met = pd.Series(dates.strftime("%d-%b-%Y %H:%M").str.lower())
+    iso = pd.Series(dates.strftime("%Y-%m-%d %H:%M:%S"))
+    mixed = met.where(rng.random(rows) < 0.5, iso)
+    return dates, {"Met Éireann": met, "ISO": iso, "mixed": mixed}
+
+
+def benchmark(rows=500_000):
+    """rows/sec for the notebooks' pd.to_datetime calls against parse_datetimes (first and cached call)."""
+    dates, columns = _sample(rows)
+    expected = pd.Series(dates.to_numpy())
+
+    def timed(func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        return result, time.perf_counter() - start
+
+    def legacy(series):
+        # clean_weather_data: let pandas guess, then the Met Éireann format if nothing parsed
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            parsed = pd.to_datetime(series, errors="coerce")
+        if parsed.isna().all():
+            parsed = pd.to_datetime(series, format="%d-%b-%Y %H:%M", errors="coerce")
+        return parsed
+
+    def mixed(series):
+        return pd.to_datetime(series, format="mixed", dayfirst=True, errors="coerce")
+
+    print(f"{rows:,} hourly timestamps per column")
+    for name, series in columns.items():
+        clear_cache()
+        old, t_old = timed(legacy, series)
+        flexible, t_flexible = timed(mixed, series)
+        first, t_first = timed(parse_datetimes, series, "benchmark", name)
+        again, t_again = timed(parse_datetimes, series, "benchmark", name)
+        print(f"{name}:")
+        print(f"  {'pd.to_datetime, guessed format':<36}{rows / t_old:12,.0f} rows/s   NaT: {old.isna().sum():,}")
+        print(f"  {'pd.to_datetime, format=mixed':<36}{rows / t_flexible:12,.0f} rows/s   NaT: {flexible.isna().sum():,}")
+        print(f"  {'parse_datetimes, first call':<36}{rows / t_first:12,.0f} rows/s   "
+              f"{len(cached_formats('benchmark'))} format(s) cached")
+        print(f"  {'parse_datetimes, cached formats':<36}{rows / t_again:12,.0f} rows/s   "
+              f"same values: {again.equals(expected) and first.equals(expected)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shape-grouped datetime parsing with a per-column format cache.")
+    parser.add_argument("--benchmark", action="store_true")
+    parser.add_argument("--rows", type=int, default=500_000)
+    args = parser.parse_args(argv)
+    if args.benchmark:
+        benchmark(args.rows)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print("Error:", e)
+        sys.exit(1)
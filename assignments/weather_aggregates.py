@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+weather_aggregates.py
+Author: Edward Cronin
+
+Daily, monthly and seasonal weather summaries kept up to date next to a
+weather_store.py store, so the notebooks stop recomputing them from the
+full hourly frame.
+
+assignment06-weather.ipynb and project/project.ipynb group or resample the
+hourly rows every time they need daily min/mean/max temperature, daily rain
+totals, a 7-day rolling temperature, daily max wind speed (and the hour it
+happened) or a 24-hour rolling wind speed, and save each result as its own
+CSV. Here instead:
+
+- ``update_aggregates`` keeps one row per day in
+  ``<store>/_aggregates/daily/year=YYYY.parquet``. A day holds counts, sums,
+  sums of squares, minima and maxima, which can be combined into any
+  longer period without going back to the hourly rows. The 24-hour rolling
+  wind speed is kept per hour in ``_aggregates/wdsp_24h/year=YYYY/month=MM.parquet``.
+- ``_aggregates/_state.json`` records the last hour folded in. An update
+  reads only the hours after it, plus the rest of the day it is in (that
+  day is rebuilt, not added to) and the 23 hours before it that the rolling
+  window needs. Only the year and month files those hours fall in are
+  rewritten. Running an update twice, or after an interrupted run, gives
+  the same result.
+- ``daily_summary``, ``monthly_summary``, ``seasonal_summary`` and
+  ``rolling_windspeed`` read these files and derive means, standard
+  deviations, totals and the 7-day rolling temperature from the day rows.
+
+Run from `assignments` like:
+    python weather_aggregates.py data/met_eireann/hly4935
+    python weather_aggregates.py --benchmark --years 30
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from weather_store import _write_atomic, ingest, load_hourly, read_manifest, write_sample
+
+AGGREGATES_DIR = "_aggregates"
+STATE = "_state.json"
+AGGREGATES_VERSION = 1
+HOURLY_COLUMNS = ["temp", "rain", "wdsp"]
+WIND_WINDOW = "24h"
+TEMP_WINDOW_DAYS = 7
+
+
+# --- day buckets -----------------------------------------------------------
+
+def day_buckets(hourly):
+    """One row per day of ``hourly`` (date, temp, rain, wdsp) with counts, sums, minima and maxima.
+
+    These combine exactly over any number of days: add the counts and sums,
+    take the min of the minima and the max of the maxima.
+    """
+    hourly = hourly.assign(day=hourly["date"].dt.floor("D"))
+    temp = hourly["temp"]
+    grouped = hourly.assign(temp_sq=temp * temp).groupby("day", sort=True)
+    days = pd.DataFrame({
+        "hours": grouped.size(),
+        "temp_n": grouped["temp"].count(),
+        "temp_sum": grouped["temp"].sum(),
+        "temp_sq": grouped["temp_sq"].sum(),
+        "temp_min": grouped["temp"].min(),
+        "temp_max": grouped["temp"].max(),
+        "rain_n": grouped["rain"].count(),
+        "rain_sum": grouped["rain"].sum(),
+        "wdsp_n": grouped["wdsp"].count(),
+        "wdsp_sum": grouped["wdsp"].sum(),
+        "wdsp_max": grouped["wdsp"].max(),
+    })
+    # the first hour of each day with the day's highest wind speed
+    peaks = (hourly.dropna(subset=["wdsp"])
+             .sort_values(["day", "wdsp"], ascending=[True, False], kind="stable")
+             .drop_duplicates("day"))
+    days["wdsp_max_at"] = peaks.set_index("day")["date"].reindex(days.index)
+    return days.rename_axis("day").reset_index()
+
+
+def rolling_wind(hourly, window=WIND_WINDOW):
+    """Mean wind speed over the ``window`` ending at each hour (blank hours are skipped)."""
+    wdsp = hourly.set_index("date")["wdsp"]
+    return wdsp.rolling(window, min_periods=1).mean().rename("wdsp_24h").reset_index()
+
+
+# --- files -----------------------------------------------------------------
+
+def _aggregates_dir(store_dir):
+    return Path(store_dir) / AGGREGATES_DIR
+
+
+def _daily_path(store_dir, year):
+    return _aggregates_dir(store_dir) / "daily" / f"year={year}.parquet"
+
+
+def _wind_path(store_dir, month):
+    year, mm = month.split("-")
+    return _aggregates_dir(store_dir) / "wdsp_24h" / f"year={year}" / f"month={mm}.parquet"
+
+
+def read_state(store_dir):
+    """The aggregates' state (last hour folded in), or None before the first update."""
+    path = _aggregates_dir(store_dir) / STATE
+    if not path.exists():
+        return None
+    state = json.loads(path.read_text(encoding="utf-8"))
+    if state.get("version") != AGGREGATES_VERSION:
+        raise ValueError(f"{path} was written by an incompatible version of weather_aggregates.py")
+    return state
+
+
+def _save_state(store_dir, state):
+    _write_atomic(_aggregates_dir(store_dir) / STATE,
+                  lambda tmp: Path(tmp).write_text(json.dumps(state, indent=1), encoding="utf-8"))
+
+
+def _replace_from(path, table, key, first):
+    """Rewrite ``path`` keeping its rows before ``first`` and appending the Arrow ``table``."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    if path.exists():
+        old = pq.read_table(path)
+        old = old.filter(pc.less(old.column(key), pa.scalar(first.as_unit("ns").to_datetime64())))
+        table = pa.concat_tables([old, table])
+    _write_atomic(path, lambda tmp: pq.write_table(table, tmp))
+
+
+def _runs(values):
+    """(value, start, stop) for each run of equal values in the sorted array ``values``."""
+    cuts = [0, *(np.flatnonzero(values[1:] != values[:-1]) + 1), len(values)]
+    return [(values[lo], lo, hi) for lo, hi in zip(cuts[:-1], cuts[1:])]
+
+
+def _read_parts(paths):
+    import pyarrow.dataset as ds
+
+    paths = [str(p) for p in paths if p.exists()]
+    if not paths:
+        return None
+    return ds.dataset(paths, format="parquet").to_table().to_pandas()
+
+
+# --- update ----------------------------------------------------------------
+
+def update_aggregates(store_dir, rebuild=False):
+    """Fold the hours added to the store since the last update into the aggregates.
+
+    Returns a summary dict: hourly rows read, days rewritten and the last
+    hour now folded in. ``rebuild=True`` starts again from the whole history
+    (needed only if hours before the last update were changed).
+    """
+    store_dir = Path(store_dir)
+    manifest = read_manifest(store_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No weather store at {store_dir}; run ingest() first")
+    state = None if rebuild else read_state(store_dir)
+    if state is not None and state["last"] == manifest["last"]:
+        return {"hours_read": 0, "days_updated": 0, "last": state["last"]}
+
+    # rebuild the day the last update stopped in; the rolling window also needs the hours before it
+    first = pd.Timestamp(state["last"]).floor("D") if state else None
+    read_from = first - pd.Timedelta(WIND_WINDOW) + pd.Timedelta(hours=1) if first is not None else None
+    hourly = load_hourly(store_dir, start=read_from, columns=HOURLY_COLUMNS)
+    if hourly.empty:
+        return {"hours_read": 0, "days_updated": 0, "last": state["last"] if state else None}
+    if first is None:
+        first = hourly["date"].iloc[0].floor("D")
+
+    days = day_buckets(hourly[(hourly["date"] >= first).to_numpy()])
+    wind = rolling_wind(hourly)
+    wind = wind[(wind["date"] >= first).to_numpy()]
+
+    if rebuild:
+        import shutil
+        shutil.rmtree(_aggregates_dir(store_dir), ignore_errors=True)
+    import pyarrow as pa
+
+    # convert once; each year's / month's rows are then a zero-copy slice
+    table = pa.Table.from_pandas(days, preserve_index=False)
+    for year, lo, hi in _runs(days["day"].to_numpy().astype("datetime64[Y]")):
+        _replace_from(_daily_path(store_dir, year.astype(object).year), table.slice(lo, hi - lo), "day", first)
+    table = pa.Table.from_pandas(wind, preserve_index=False)
+    for month, lo, hi in _runs(wind["date"].to_numpy().astype("datetime64[M]")):
+        _replace_from(_wind_path(store_dir, str(month)), table.slice(lo, hi - lo), "date", first)
+
+    last = hourly["date"].iloc[-1].isoformat()
+    _save_state(store_dir, {"version": AGGREGATES_VERSION, "last": last})
+    return {"hours_read": len(hourly), "days_updated": len(days), "last": last}
+
+
+# --- summaries -------------------------------------------------------------
+
+def load_days(store_dir, start=None, end=None):
+    """The raw day rows between ``start`` and ``end`` (inclusive, by day)."""
+    start = pd.Timestamp(start).floor("D") if start is not None else None
+    end = pd.Timestamp(end).floor("D") if end is not None else None
+    folder = _aggregates_dir(store_dir) / "daily"
+    paths = sorted(folder.glob("year=*.parquet"))
+    if start is not None or end is not None:
+        lo = start.year if start is not None else 0
+        hi = end.year if end is not None else 9999
+        paths = [p for p in paths if lo <= int(p.stem.split("=")[1]) <= hi]
+    days = _read_parts(paths)
+    if days is None:
+        raise FileNotFoundError(f"No aggregates in {folder}; run update_aggregates() first")
+    if start is not None:
+        days = days[days["day"] >= start]
+    if end is not None:
+        days = days[days["day"] <= end]
+    return days.sort_values("day", ignore_index=True)
+
+
+def _summarise(days, by):
+    """Combine day rows grouped by ``by`` into min/mean/std/max temperature, rain and wind."""
+    grouped = days.groupby(by, sort=True)
+    sums = grouped[["hours", "temp_n", "temp_sum", "temp_sq", "rain_n", "rain_sum", "wdsp_n", "wdsp_sum"]].sum()
+    n = sums["temp_n"].where(sums["temp_n"] > 0)
+    mean = sums["temp_sum"] / n
+    var = (sums["temp_sq"] - n * mean * mean) / (n - 1)
+    out = pd.DataFrame({
+        "days": grouped.size(),
+        "hours": sums["hours"],
+        "temp_count": sums["temp_n"],
+        "temp_min": grouped["temp_min"].min(),
+        "temp_mean": mean,
+        "temp_std": np.sqrt(var.clip(lower=0)),
+        "temp_max": grouped["temp_max"].max(),
+        "rain_total": sums["rain_sum"],
+        "wdsp_mean": sums["wdsp_sum"] / sums["wdsp_n"].where(sums["wdsp_n"] > 0),
+        "wdsp_max": grouped["wdsp_max"].max(),
+        "wdsp_mean_daily_max": grouped["wdsp_max"].mean(),
+    })
+    peaks = (days.dropna(subset=["wdsp_max"])
+             .sort_values([by, "wdsp_max"], ascending=[True, False], kind="stable")
+             .drop_duplicates(by))
+    out["wdsp_max_at"] = peaks.set_index(by)["wdsp_max_at"].reindex(out.index)
+    return out.reset_index()
+
+
+def daily_summary(store_dir, start=None, end=None):
+    """One row per day: temperature count/min/mean/std/max, rain total, wind mean/max (and its hour),
+    and the mean temperature of the ``TEMP_WINDOW_DAYS`` days ending that day."""
+    lead = pd.Timedelta(days=TEMP_WINDOW_DAYS - 1)
+    days = load_days(store_dir, pd.Timestamp(start) - lead if start is not None else None, end)
+    out = _summarise(days, "day").drop(columns=["days", "wdsp_mean_daily_max"])
+    window = days.set_index("day")[["temp_sum", "temp_n"]].rolling(f"{TEMP_WINDOW_DAYS}D").sum()
+    out[f"temp_mean_{TEMP_WINDOW_DAYS}d"] = (window["temp_sum"] / window["temp_n"].where(window["temp_n"] > 0)).to_numpy()
+    if start is not None:
+        out = out[out["day"] >= pd.Timestamp(start).floor("D")].reset_index(drop=True)
+    return out
+
+
+def monthly_summary(store_dir, start=None, end=None):
+    """One row per calendar month (``month`` is its first day), combined from the day rows."""
+    days = load_days(store_dir, start, end)
+    days["month"] = days["day"].dt.to_period("M").dt.to_timestamp()
+    return _summarise(days, "month")
+
+
+def seasonal_summary(store_dir, seasons):
+    """One row per season; ``seasons`` has season/start/end columns like define_irish_seasons()."""
+    rows = []
+    for season in seasons.itertuples(index=False):
+        days = load_days(store_dir, season.start, season.end)
+        if days.empty:
+            continue
+        rows.append(_summarise(days.assign(season=season.season), "season")
+                    .assign(start=pd.Timestamp(season.start), end=pd.Timestamp(season.end)))
+    if not rows:
+        return pd.DataFrame(columns=["season", "start", "end"])
+    out = pd.concat(rows, ignore_index=True)
+    return out[["season", "start", "end", *[c for c in out.columns if c not in ("season", "start", "end")]]]
+
+
+def rolling_windspeed(store_dir, start=None, end=None):
+    """Hourly 24-hour rolling mean wind speed (date, wdsp_24h) for ``start``..``end``."""
+    folder = _aggregates_dir(store_dir) / "wdsp_24h"
+    paths = sorted(folder.glob("year=*/month=*.parquet"))
+    if start is not None or end is not None:
+        lo = pd.Timestamp(start).strftime("%Y-%m") if start is not None else ""
+        hi = pd.Timestamp(end).strftime("%Y-%m") if end is not None else "9999"
+        paths = [p for p in paths if lo <= f"{p.parent.name[5:]}-{p.stem[6:]}" <= hi]
+    wind = _read_parts(paths)
+    if wind is None:
+        raise FileNotFoundError(f"No aggregates in {folder}; run update_aggregates() first")
+    if start is not None:
+        wind = wind[wind["date"] >= pd.Timestamp(start)]
+    if end is not None:
+        wind = wind[wind["date"] <= pd.Timestamp(end)]
+    return wind.sort_values("date", ignore_index=True)
+
+
+# --- benchmark -------------------------------------------------------------
+
+def _recompute(store_dir):
+    """The notebooks' path: all hourly rows -> resample/rolling for each summary."""
+    df = load_hourly(store_dir, columns=HOURLY_COLUMNS)
+    daily_temp = df.resample("D", on="date")["temp"].agg(["min", "mean", "max"])
+    daily_rain = df.resample("D", on="date")["rain"].sum()
+    rolling_temp = df.set_index("date")["temp"].rolling("7D").mean()
+    daily_wind = df.dropna(subset=["wdsp"]).resample("D", on="date")["wdsp"].max()
+    wind_24h = df.set_index("date")["wdsp"].rolling(WIND_WINDOW, min_periods=1).mean()
+    monthly_temp = df.resample("MS", on="date")["temp"].agg(["count", "mean", "std"])
+    return daily_temp, daily_rain, rolling_temp, daily_wind, wind_24h, monthly_temp
+
+
+def benchmark(years=30, new_hours=24):
+    """Time a full recompute against an incremental update after ``new_hours`` new hours arrive."""
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        full = tmp / "hly.csv"
+        write_sample(full, start=f"{2026 - years}-01-01", hours=24 * 365 * years)
+        lines = full.read_text(encoding="utf-8").splitlines(keepends=True)
+        older = tmp / "hly_older.csv"
+        older.write_text("".join(lines[:-new_hours]), encoding="utf-8")
+
+        store = tmp / "store"
+        ingest(older, store)
+
+        def timed(func, *args, **kwargs):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            return result, time.perf_counter() - start
+
+        _, t_first = timed(update_aggregates, store)
+        ingest(full, store)
+        summary, t_update = timed(update_aggregates, store)
+        _, t_noop = timed(update_aggregates, store)
+        old, t_recompute = timed(_recompute, store)
+
+        days = daily_summary(store)
+        wind = rolling_windspeed(store)
+        months = monthly_summary(store)
+        daily_temp, daily_rain, _, daily_wind, wind_24h, monthly_temp = old
+        same = (np.allclose(days["temp_mean"], daily_temp["mean"], equal_nan=True)
+                and np.allclose(days["temp_max"], daily_temp["max"], equal_nan=True)
+                and np.allclose(days["rain_total"], daily_rain, equal_nan=True)
+                and np.allclose(days["wdsp_max"], daily_wind, equal_nan=True)
+                and np.allclose(wind["wdsp_24h"], wind_24h, equal_nan=True)
+                and np.allclose(months["temp_std"], monthly_temp["std"], equal_nan=True))
+        print(f"{years} years, {len(wind):,} hourly rows, {len(days):,} days; {new_hours} new hours")
+        print(f"{'first build (whole history)':<36}{t_first * 1e3:8.1f} ms")
+        print(f"{'recompute from hourly (notebooks)':<36}{t_recompute * 1e3:8.1f} ms")
+        print(f"{'incremental update':<36}{t_update * 1e3:8.1f} ms   "
+              f"({t_recompute / t_update:.0f}x), read {summary['hours_read']} hours, "
+              f"rewrote {summary['days_updated']} days; same values: {same}")
+        print(f"{'update with nothing new':<36}{t_noop * 1e3:8.1f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Update the daily and rolling aggregates of a weather store.")
+    parser.add_argument("store", nargs="?", help="store folder written by weather_store.py")
+    parser.add_argument("--rebuild", action="store_true", help="recompute from the whole history")
+    parser.add_argument("--benchmark", action="store_true")
+    parser.add_argument("--years", type=int, default=30, help="synthetic history length for --benchmark")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        benchmark(args.years)
+        return
+    if not args.store:
+        parser.error("a store folder is required")
+    summary = update_aggregates(args.store, rebuild=args.rebuild)
+    print(f"{args.store}: read {summary['hours_read']:,} hourly rows, "
+          f"rewrote {summary['days_updated']} days, last hour {summary['last']}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print("Error:", e)
+        sys.exit(1)
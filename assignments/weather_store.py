@@ -0,0 +1,615 @@
+#!/usr/bin/env python3
+"""
+weather_store.py
+Author: Edward Cronin
+
+Streaming ingest of Met Éireann hourly climate CSVs (hly4935.csv for Knock
+Airport, hly532.csv for Dublin Airport) into a partitioned columnar store.
+
+assignment06-weather.ipynb and project/project.ipynb used to download the
+whole file with requests.get, split response.text into lines, search the
+lines for the header, write every line back to disk (or join them into a
+StringIO) and only then let pandas parse it, guessing the datetime format
+afterwards. For a station history going back to the 1940s that holds the
+text several times over in memory. Here instead:
+
+- the source (URL or local file) is read as a byte stream; the preamble
+  lines are skipped until the header row (``find_header``), and the same
+  stream is handed to pandas;
+- rows are parsed in chunks with explicit dtypes (indicator columns Int8,
+  measurements float64, blanks as NaN) and the fixed Met Éireann datetime
+  format '%d-%b-%Y %H:%M', so nothing is guessed;
+- every chunk goes into a store with one Parquet (or Feather) file per
+  month, ``<store>/year=YYYY/month=MM/part.parquet``, next to a
+  ``_manifest.json`` holding the columns, the last hour stored and each
+  partition's row count and first/last hour;
+- a re-run reads the manifest and keeps only hours after the last one
+  stored: only the month it left off in is rewritten and later months are
+  added, so a daily refresh writes a day, not 80 years.
+
+Duplicate header names are numbered like pandas does (ind, ind.1, ...), so
+the cleaning code in the notebooks sees the same columns as before.
+
+Queries (``load_hourly``) read only what they need. Rows are stored in date
+order, one week per Parquet row group, and the manifest also keeps each
+month's min/max per column. A date window (a custom week, a
+define_irish_seasons season) or a value filter such as wdsp >= 34 first
+drops the month files whose statistics rule it out; pyarrow then skips
+row groups from the Parquet statistics and decodes only the requested
+columns. ``scan_plan`` reports how many files and row groups a query
+touches.
+
+Run from `assignments` like:
+    python weather_store.py https://cli.fusio.net/cli/climate_data/webdata/hly4935.csv data/met_eireann/hly4935
+    python weather_store.py --benchmark
+    python weather_store.py --benchmark-queries --years 30
+"""
+
+import argparse
+import io
+import json
+import operator
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+STATION_URL = "https://cli.fusio.net/cli/climate_data/webdata/hly{station}.csv"
+DATE_FORMAT = "%d-%b-%Y %H:%M"
+CHUNK_ROWS = 200_000
+MAX_PREAMBLE_LINES = 200
+MANIFEST = "_manifest.json"
+STORE_VERSION = 1
+FORMATS = {"parquet": ".parquet", "feather": ".feather"}
+ROW_GROUP_ROWS = 24 * 7
+INDICATOR_DTYPE = "Int8"
+VALUE_DTYPE = "float64"
+FILTER_OPS = {"==": operator.eq, "!=": operator.ne, "<": operator.lt, "<=": operator.le,
+              ">": operator.gt, ">=": operator.ge}
+
+
+def station_url(station):
+    """Download URL for a station number, e.g. 532 (Dublin Airport)."""
+    return STATION_URL.format(station=station)
+
+
+@contextmanager
+def open_source(source, timeout=60):
+    """Binary stream over a URL (streamed with requests) or a local file."""
+    if str(source).startswith(("http://", "https://")):
+        import requests
+
+        with requests.get(str(source), stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            response.raw.auto_close = False   # pandas' reader still holds it at EOF
+            yield io.BufferedReader(response.raw, buffer_size=1 << 16)
+    else:
+        with open(source, "rb") as f:
+            yield f
+
+
+def find_header(stream, max_lines=MAX_PREAMBLE_LINES):
+    """Read ``stream`` up to and including the header row; return its column names.
+
+    The header is the first line starting with 'date' or 'station' that has
+    more than five comma-separated fields (the notebooks' detect_header
+    rule). The stream is left at the first data row.
+    """
+    for _ in range(max_lines):
+        raw = stream.readline()
+        if not raw:
+            break
+        line = raw.decode("latin-1").strip()
+        if line.lower().startswith(("date", "station")) and line.count(",") >= 5:
+            return dedupe_columns(c.strip() for c in line.split(","))
+    raise ValueError(f"Header row not found in the first {max_lines} lines")
+
+
+def dedupe_columns(names):
+    """Number repeated names the way pd.read_csv does: ind, ind.1, ind.2, ..."""
+    seen = {}
+    out = []
+    for name in names:
+        if name in seen:
+            seen[name] += 1
+            out.append(f"{name}.{seen[name]}")
+        else:
+            seen[name] = 0
+            out.append(name)
+    return out
+
+
+def column_dtypes(columns):
+    """Explicit read_csv dtypes: text date/station, Int8 indicators, float64 values."""
+    dtypes = {}
+    for col in columns:
+        if col in ("date", "station"):
+            dtypes[col] = "string"
+        elif col == "ind" or col.startswith("ind."):
+            dtypes[col] = INDICATOR_DTYPE
+        else:
+            dtypes[col] = VALUE_DTYPE
+    return dtypes
+
+
+def iter_hourly_chunks(source, chunk_rows=CHUNK_ROWS, date_format=DATE_FORMAT, after=None):
+    """Yield the hourly rows of ``source`` as DataFrames of up to ``chunk_rows`` rows.
+
+    'date' is parsed with ``date_format`` (an unexpected value raises rather
+    than being guessed at); all other columns get ``column_dtypes``. With
+    ``after``, only rows later than that hour are yielded; the history is in
+    time order, so a chunk whose last row is not later is skipped without
+    parsing its dates.
+    """
+    with open_source(source) as stream:
+        columns = find_header(stream)
+        if "date" not in columns:
+            raise ValueError(f"No 'date' column in header: {columns}")
+        dtypes = column_dtypes(columns)
+        # the C parser is slow at nullable ints; read indicators as floats and cast after
+        indicators = [c for c, t in dtypes.items() if t == INDICATOR_DTYPE]
+        read_dtypes = {c: VALUE_DTYPE if t == INDICATOR_DTYPE else t for c, t in dtypes.items()}
+        reader = pd.read_csv(stream, header=None, names=columns, dtype=read_dtypes,
+                             na_values=[" "], encoding="latin-1", chunksize=chunk_rows)
+        with reader:
+            for chunk in reader:
+                if after is not None and pd.to_datetime(chunk["date"].iloc[-1], format=date_format) <= after:
+                    continue
+                chunk["date"] = pd.to_datetime(chunk["date"], format=date_format)
+                chunk[indicators] = chunk[indicators].astype(INDICATOR_DTYPE)
+                if after is not None:
+                    chunk = chunk[(chunk["date"] > after).to_numpy()]
+                yield chunk
+
+
+# --- store -----------------------------------------------------------------
+
+def read_manifest(store_dir):
+    """The store's manifest, or None when the store does not exist yet."""
+    path = Path(store_dir) / MANIFEST
+    if not path.exists():
+        return None
+    manifest = json.loads(path.read_text(encoding="utf-8"))
+    if manifest.get("version") != STORE_VERSION:
+        raise ValueError(f"{path} was written by an incompatible version of weather_store.py")
+    return manifest
+
+
+def _write_atomic(path, write):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def _save_manifest(store_dir, manifest):
+    _write_atomic(Path(store_dir) / MANIFEST,
+                  lambda tmp: Path(tmp).write_text(json.dumps(manifest, indent=1), encoding="utf-8"))
+
+
+def partition_path(store_dir, month, fmt="parquet"):
+    """File holding ``month`` ('YYYY-MM')."""
+    year, mm = month.split("-")
+    return Path(store_dir) / f"year={year}" / f"month={mm}" / f"part{FORMATS[fmt]}"
+
+
+def _dataset(paths, fmt):
+    import pyarrow.dataset as ds
+
+    return ds.dataset([str(p) for p in paths], format="ipc" if fmt == "feather" else fmt)
+
+
+def _read_files(paths, fmt, columns=None, where=None):
+    """Read several partition files in one pyarrow pass and convert to pandas once.
+
+    ``where`` is a pyarrow expression; for Parquet it is checked against each
+    row group's statistics first, so row groups that cannot match are not read.
+    """
+    return _dataset(paths, fmt).to_table(columns=columns, filter=where).to_pandas()
+
+
+def _write_table(path, table, fmt):
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    if fmt == "parquet":
+        _write_atomic(path, lambda tmp: pq.write_table(table, tmp, row_group_size=ROW_GROUP_ROWS))
+    else:
+        _write_atomic(path, lambda tmp: feather.write_feather(table, tmp))
+
+
+def _column_stats(table):
+    """{column: [min, max]} for the numeric columns (None when a column is all blank)."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    stats = {}
+    for field in table.schema:
+        if pa.types.is_integer(field.type) or pa.types.is_floating(field.type):
+            mm = pc.min_max(table.column(field.name)).as_py()
+            stats[field.name] = [mm["min"], mm["max"]]
+    return stats
+
+
+def _write_partition(store_dir, manifest, month, tables):
+    """Write (or extend) one month's file from Arrow ``tables`` and record it in ``manifest``.
+
+    The manifest is saved by the caller.
+    """
+    import pyarrow as pa
+
+    fmt = manifest["format"]
+    path = partition_path(store_dir, month, fmt)
+    table = pa.concat_tables(tables)
+    if month in manifest["partitions"] and path.exists():
+        frame = pd.concat([_read_files([path], fmt), table.to_pandas()], ignore_index=True)
+        # an interrupted run may already have written some of these hours
+        frame = frame.drop_duplicates(subset="date", keep="last").sort_values("date", kind="stable")
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+    _write_table(path, table, fmt)
+    dates = table.column("date")
+    manifest["partitions"][month] = {
+        "file": path.relative_to(store_dir).as_posix(),
+        "rows": table.num_rows,
+        "min": pd.Timestamp(dates[0].as_py()).isoformat(),
+        "max": pd.Timestamp(dates[-1].as_py()).isoformat(),
+        "stats": _column_stats(table),
+    }
+    last = manifest["last"]
+    manifest["last"] = max(last, manifest["partitions"][month]["max"]) if last else manifest["partitions"][month]["max"]
+
+
+def ingest(source, store_dir, fmt="parquet", chunk_rows=CHUNK_ROWS):
+    """Stream ``source`` into the store at ``store_dir``, appending only new hours.
+
+    Returns a summary dict: rows added, months written and the last hour
+    now stored. Rows at or before the manifest's last hour are taken as
+    already stored and skipped. The manifest is saved after every chunk;
+    if a run is interrupted, the next one rewrites the months it left half
+    done.
+    """
+    store_dir = Path(store_dir)
+    manifest = read_manifest(store_dir)
+    if manifest is None:
+        manifest = {"version": STORE_VERSION, "format": fmt, "source": str(source),
+                    "columns": None, "last": None, "partitions": {}}
+    elif manifest["format"] != fmt:
+        raise ValueError(f"{store_dir} is a {manifest['format']} store (asked for {fmt})")
+    last = np.datetime64(manifest["last"]) if manifest["last"] else None
+
+    import pyarrow as pa
+
+    rows_added = 0
+    written = []
+    pending = {}          # month -> Arrow slices of new rows not yet on disk
+    for chunk in iter_hourly_chunks(source, chunk_rows, after=last):
+        if manifest["columns"] is None:
+            manifest["columns"] = list(chunk.columns)
+        elif list(chunk.columns) != manifest["columns"]:
+            raise ValueError(f"Columns changed since the store was created: {list(chunk.columns)}")
+        if chunk.empty:
+            continue
+        rows_added += len(chunk)
+        if not chunk["date"].is_monotonic_increasing:
+            chunk = chunk.sort_values("date", kind="stable")
+        # convert once per chunk; each month is then a zero-copy slice
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        months = chunk["date"].to_numpy().astype("datetime64[M]")
+        cuts = [0, *(np.flatnonzero(months[1:] != months[:-1]) + 1), len(months)]
+        for lo, hi in zip(cuts[:-1], cuts[1:]):
+            pending.setdefault(str(months[lo]), []).append(table.slice(lo, hi - lo))
+        # months before this chunk's last one are complete: flush them
+        newest = str(months[-1])
+        for month in sorted(m for m in pending if m < newest):
+            _write_partition(store_dir, manifest, month, pending.pop(month))
+            written.append(month)
+        _save_manifest(store_dir, manifest)
+    for month in sorted(pending):
+        _write_partition(store_dir, manifest, month, pending.pop(month))
+        written.append(month)
+    _save_manifest(store_dir, manifest)
+    return {"rows_added": rows_added, "months_written": written, "last": manifest["last"]}
+
+
+def _may_match(stats, filters):
+    """False when a partition's min/max show no row can pass ``filters``."""
+    for col, op, value in filters:
+        if col not in stats:
+            continue  # no statistics (e.g. a store written before they were kept)
+        lo, hi = stats[col]
+        if lo is None:
+            return False  # all blank: a comparison never passes
+        if (op == "==" and not lo <= value <= hi) or (op == ">" and hi <= value) or \
+                (op == ">=" and hi < value) or (op == "<" and lo >= value) or (op == "<=" and lo > value):
+            return False
+    return True
+
+
+def _plan(store_dir, start=None, end=None, filters=()):
+    """(manifest, partition files to read, pyarrow filter expression) for a query."""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    store_dir = Path(store_dir)
+    manifest = read_manifest(store_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No weather store at {store_dir}; run ingest() first")
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    for col, op, _ in filters:
+        if op not in FILTER_OPS:
+            raise ValueError(f"Unknown filter operator {op!r} for {col!r} (expected one of {list(FILTER_OPS)})")
+
+    paths = []
+    for month in sorted(manifest["partitions"]):
+        part = manifest["partitions"][month]
+        if (start is not None and pd.Timestamp(part["max"]) < start) or \
+                (end is not None and pd.Timestamp(part["min"]) > end):
+            continue
+        if filters and not _may_match(part.get("stats", {}), filters):
+            continue
+        paths.append(store_dir / part["file"])
+
+    where = []
+    if start is not None:
+        where.append(ds.field("date") >= pa.scalar(start.as_unit("ns").to_datetime64()))
+    if end is not None:
+        where.append(ds.field("date") <= pa.scalar(end.as_unit("ns").to_datetime64()))
+    where += [FILTER_OPS[op](ds.field(col), value) for col, op, value in filters]
+    expr = None
+    for e in where:
+        expr = e if expr is None else expr & e
+    return manifest, paths, expr
+
+
+def load_hourly(store_dir, start=None, end=None, columns=None, filters=()):
+    """Hourly rows from the store, sorted by date, for ``start``..``end`` (inclusive).
+
+    ``columns`` limits the columns read ('date' is always included) and
+    ``filters`` is a list of ``(column, op, value)`` conditions, e.g.
+    ``[("wdsp", ">=", 34)]`` for gale-force hours. Month files are skipped
+    when the manifest's first/last hour or column min/max rule them out;
+    inside a Parquet file, row groups (one week each) are skipped the same
+    way from the file's own statistics, and only the named columns are
+    decoded.
+    """
+    manifest, paths, where = _plan(store_dir, start, end, filters)
+    if columns is not None and "date" not in columns:
+        columns = ["date", *columns]
+    if not paths:
+        dtypes = column_dtypes(manifest["columns"] or ["date"])
+        empty = pd.DataFrame({c: pd.Series(dtype=t) for c, t in dtypes.items()})
+        empty["date"] = pd.Series(dtype="datetime64[ns]")
+        return empty[columns] if columns else empty
+    df = _read_files(paths, manifest["format"], columns, where)
+    if not df["date"].is_monotonic_increasing:
+        df = df.sort_values("date", kind="stable", ignore_index=True)
+    return df
+
+
+def scan_plan(store_dir, start=None, end=None, filters=()):
+    """How much of the store a query reads: month files and Parquet row groups, each (read, total)."""
+    manifest, paths, where = _plan(store_dir, start, end, filters)
+    store_dir = Path(store_dir)
+    plan = {"partitions": (len(paths), len(manifest["partitions"]))}
+    if manifest["format"] == "parquet":
+        everything = [store_dir / part["file"] for part in manifest["partitions"].values()]
+        total = sum(f.metadata.num_row_groups for f in _dataset(everything, "parquet").get_fragments())
+        read = sum(len(f.split_by_row_group(where)) for f in _dataset(paths, "parquet").get_fragments()) if paths else 0
+        plan["row_groups"] = (read, total)
+    return plan
+
+
+# --- benchmark -------------------------------------------------------------
+
+PREAMBLE = """Station Name: SAMPLE AIRPORT
+Station Height: 71 M
+Latitude:53.428  ,Longitude: -6.241
+
+
+date:  -  Date and Time (utc)
+rain:  -  Precipitation Amount (mm)
+temp:  -  Air Temperature (C)
+wetb:  -  Wet Bulb Air Temperature (C)
+dewpt: -  Dew Point Air Temperature (C)
+vappr: -  Vapour Pressure (hpa)
+rhum:  -  Relative Humidity (%)
+msl:   -  Mean Sea Level Pressure (hPa)
+wdsp:  -  Mean Hourly Wind Speed (kt)
+wddir: -  Predominant Hourly wind Direction (deg)
+ww:    -  Synop code for Present Weather
+w:     -  Synop code for Past Weather
+sun:   -  Sunshine duration (hours)
+vis:   -  Visibility (m)
+clht:  -  Cloud height (100's of ft) - 999 if none
+clamt: -  Cloud amount
+ind:   -  Indicator
+
+"""
+HEADER = "date,ind,rain,ind,temp,ind,wetb,dewpt,vappr,rhum,msl,ind,wdsp,ind,wddir,ww,w,sun,vis,clht,clamt"
+
+
+def write_sample(path, start="1945-01-01", hours=24 * 365 * 80, seed=0):
+    """Write a synthetic file in the Met Éireann hourly layout (preamble, header, rows)."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, periods=hours, freq="h")
+    temp = np.round(10 + 6 * np.sin(2 * np.pi * (dates.dayofyear.to_numpy() - 110) / 365)
+                    + rng.normal(0, 2.5, hours), 1)
+    ww = rng.integers(0, 100, hours).astype(str).astype(object)
+    ww[rng.random(hours) < 0.3] = " "
+    df = pd.DataFrame({
+        "date": dates.strftime("%d-%b-%Y %H:%M").str.lower(),
+        "ind": 0, "rain": np.round(rng.exponential(0.1, hours), 1), "ind.1": 0, "temp": temp, "ind.2": 0,
+        "wetb": temp - 0.5, "dewpt": temp - 1.0, "vappr": 11.2, "rhum": rng.integers(50, 101, hours),
+        "msl": np.round(rng.normal(1013, 10, hours), 1), "ind.3": 2, "wdsp": rng.integers(0, 40, hours),
+        "ind.4": 2, "wddir": rng.integers(0, 36, hours) * 10, "ww": ww, "w": ww, "sun": 0.0,
+        "vis": 25000, "clht": rng.integers(1, 999, hours), "clamt": rng.integers(0, 9, hours),
+    })
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        f.write(PREAMBLE + HEADER + "\n")
+        df.to_csv(f, header=False, index=False)
+
+
+def _legacy_load(path, out_csv):
+    """The notebooks' path: text -> lines -> header search -> rewrite -> read_csv -> guess format."""
+    lines = Path(path).read_text(encoding="latin-1").splitlines()
+    header_index = next(i for i, line in enumerate(lines)
+                        if line.strip().lower().startswith(("station", "date")) and len(line.split(",")) > 5)
+    with open(out_csv, "w", encoding="utf-8") as f:
+        for line in lines[header_index:]:
+            f.write(line + "\n")
+    df = pd.read_csv(out_csv, low_memory=False)
+    samples = df["date"].dropna().astype(str).head(80).tolist()
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", DATE_FORMAT):
+        if pd.to_datetime(samples, format=fmt, errors="coerce").notna().sum() >= 56:
+            break
+    df["date"] = pd.to_datetime(df["date"], format=fmt, errors="coerce")
+    return df
+
+
+def _peak_mb(func, *args):
+    """Peak Python heap use of ``func(*args)`` in MB (tracemalloc; slows the call down)."""
+    import tracemalloc
+
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark(source=None, years=80, fmt="parquet", memory=False):
+    """Time the legacy load against a first ingest, a no-op re-run and a store reload."""
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        if source is None:
+            source = tmp / "hly_sample.csv"
+            write_sample(source, hours=24 * 365 * years)
+        size = os.path.getsize(source) / 1e6
+
+        def timed(func, *args):
+            start = time.perf_counter()
+            result = func(*args)
+            return result, time.perf_counter() - start
+
+        old, t_old = timed(_legacy_load, source, tmp / "legacy.csv")
+        store = tmp / "store"
+        summary, t_ingest = timed(ingest, source, store, fmt)
+        again, t_again = timed(ingest, source, store, fmt)
+        new, t_load = timed(load_hourly, store)
+
+        same = (len(old) == len(new)
+                and old["date"].equals(new["date"])
+                and np.allclose(old["temp"].to_numpy(float), new["temp"].to_numpy(float), equal_nan=True))
+        print(f"{size:.0f} MB, {len(new):,} hourly rows")
+        print(f"{'legacy text/lines/rewrite/read_csv':<36}{t_old:6.2f} s")
+        print(f"{f'streaming ingest ({fmt})':<36}{t_ingest:6.2f} s   {len(summary['months_written'])} months")
+        print(f"{'re-run, nothing new':<36}{t_again:6.2f} s   added {again['rows_added']} rows")
+        print(f"{'reload from the store':<36}{t_load:6.2f} s   same rows and values: {same}")
+        if memory:
+            del old, new
+            m_old = _peak_mb(_legacy_load, source, tmp / "legacy.csv")
+            m_new = _peak_mb(ingest, source, tmp / "store2", fmt)
+            print(f"peak memory: legacy {m_old:.0f} MB, streaming ingest {m_new:.0f} MB")
+
+
+def _legacy_window(csv_path, start, end):
+    """assignment06's windspeed cells: re-read the CSV, parse 'datetime', filter the window."""
+    df = pd.read_csv(csv_path)
+    df.columns = df.columns.str.strip()
+    df["datetime"] = pd.to_datetime(df["datetime"], errors="coerce")
+    return df[(df["datetime"] >= start) & (df["datetime"] <= end)].dropna(subset=["windspeed"])
+
+
+def benchmark_queries(years=30, repeat=3):
+    """assignment06's date-window cells: CSV re-reads against store queries with pushdown."""
+    summer = (pd.Timestamp("2025-06-01"), pd.Timestamp("2025-08-31 23:59"))
+    week = (pd.Timestamp("2025-07-10"), pd.Timestamp("2025-07-16 23:59"))
+    july = (pd.Timestamp("2025-07-01"), pd.Timestamp("2025-07-31 23:59"))
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        write_sample(tmp / "hly.csv", start=f"{2026 - years}-01-01", hours=24 * 365 * years)
+        store = tmp / "store"
+        ingest(tmp / "hly.csv", store)
+        climate_csv = tmp / "climate.csv"
+        load_hourly(store).to_csv(climate_csv, index=False, date_format=DATE_FORMAT)
+
+        def legacy():
+            # Step 18 reads the whole climate CSV for the summer windspeed file ...
+            df = pd.read_csv(climate_csv, low_memory=False)
+            df["datetime"] = pd.to_datetime(df["date"], format=DATE_FORMAT, errors="coerce")
+            df["windspeed"] = pd.to_numeric(df["wdsp"], errors="coerce")
+            df = df[(df["datetime"] >= summer[0]) & (df["datetime"] <= summer[1])].dropna(subset=["windspeed"])
+            df.to_csv(tmp / "summer.csv", index=False)
+            # ... and Steps 19-21 and 23 each re-read that file for their window
+            return [df] + [_legacy_window(tmp / "summer.csv", *w) for w in (week, week, week, july)]
+
+        def from_store():
+            return [load_hourly(store, *w, columns=["wdsp"]).dropna(subset=["wdsp"])
+                    for w in (summer, week, week, week, july)]
+
+        def best(func):
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                result = func()
+                times.append(time.perf_counter() - start)
+            return result, min(times)
+
+        old, t_old = best(legacy)
+        new, t_new = best(from_store)
+        same = all(np.array_equal(o["windspeed"].to_numpy(float), n["wdsp"].to_numpy(float)) for o, n in zip(old, new))
+        plan = scan_plan(store, *week)
+        print(f"{years} years, {os.path.getsize(climate_csv) / 1e6:.0f} MB climate CSV; "
+              f"summer + 3 x week + July windspeed windows")
+        print(f"{'CSV re-reads (Steps 18-23)':<36}{t_old * 1e3:8.1f} ms")
+        print(f"{'store queries (wdsp only)':<36}{t_new * 1e3:8.1f} ms   ({t_old / t_new:.0f}x), same values: {same}")
+        print(f"one week reads {plan['partitions'][0]}/{plan['partitions'][1]} month files and "
+              f"{plan['row_groups'][0]}/{plan['row_groups'][1]} row groups")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream a Met Éireann hourly CSV into a partitioned store.")
+    parser.add_argument("source", nargs="?", help="URL, local CSV or station number (e.g. 532)")
+    parser.add_argument("store", nargs="?", help="store folder (default: data/met_eireann/<file name>)")
+    parser.add_argument("--format", choices=FORMATS, default="parquet")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--benchmark", action="store_true")
+    parser.add_argument("--benchmark-queries", action="store_true", help="time date-window queries against CSV re-reads")
+    parser.add_argument("--years", type=int, default=80, help="synthetic history length for --benchmark")
+    parser.add_argument("--memory", action="store_true", help="also measure peak memory in --benchmark (slow)")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        benchmark(args.source, args.years, args.format, args.memory)
+        return
+    if args.benchmark_queries:
+        benchmark_queries(args.years)
+        return
+    if not args.source:
+        parser.error("a source is required")
+    source = station_url(args.source) if args.source.isdigit() else args.source
+    store = args.store or Path("data") / "met_eireann" / Path(str(source).rsplit("/", 1)[-1]).stem
+    summary = ingest(source, store, args.format, args.chunk_rows)
+    print(f"{store}: added {summary['rows_added']:,} hourly rows "
+          f"({len(summary['months_written'])} months written), last hour {summary['last']}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print("Error:", e)
+        sys.exit(1)
@@ -1,17 +1,17 @@
 # bank_holidays.py
 # Author: Edward Cronin
 
-# Import the requests library to handle HTTP requests
-import requests
+import sys
+from pathlib import Path
 
-# Define the URL of the UK government bank holidays API
-url = "https://www.gov.uk/bank-holidays.json"
+# The shared bank holidays client lives with the assignment02 scripts; it
+# caches the JSON on disk and revalidates it with ETag / If-Modified-Since,
+# so running this again does not download the file every time
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "assignments"))
+from bankholidays_client import URL as url, get_bank_holidays
 
-# Send a GET request to the API and store the response
-response = requests.get(url)
-
-# Parse the response content as JSON and store it in a Python dictionary
-data = response.json()
+# Fetch the UK government bank holidays API (or the cached copy) as a Python dictionary
+data = get_bank_holidays(url)
 
 # Uncomment the line below to inspect the full JSON structure (useful for debugging or exploration)
 # print(data)
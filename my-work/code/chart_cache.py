@@ -0,0 +1,239 @@
+"""Content-addressed cache for generated chart PNGs.
+
+Author: Edward Cronin
+
+The chart scripts used to write a new `<name>_<timestamp>.png` on every
+run, even when nothing had changed. With this cache each chart is keyed by
+a SHA-256 of its input files, its parameters, `RENDER_VERSION` and the
+source of every module that draws it: the script plus helpers such as
+`projection_engine.py` or `cso_population_cube.py`, which `source_files`
+finds without importing them. If a PNG for that key already exists the
+script can return it straight away and skip loading, fitting and plotting
+altogether.
+
+The cache lives in the chart folder itself (`my-work/generated_charts/`):
+PNGs are named `<name>_<key[:16]>.png` and `manifest.json` records every
+cached file plus the latest file per chart name. `evict` removes cached
+charts that have not been used for `MAX_AGE_DAYS`, then the least recently
+used ones until the cache is under `MAX_BYTES`. Files the cache did not
+create (older timestamped PNGs, notebook output) are never touched.
+
+Every chart that becomes "the latest" is also appended to
+`artifacts.jsonl`, an append-only log of published files that
+`update_readme_images.py` reads. `latest_published` reads that log
+backwards, so finding the newest file for a pattern costs a few lines of
+I/O however many charts have piled up in the folder. `register_untracked`
+adds files written by other tools (notebooks) to the log with one
+directory listing.
+"""
+
+import fnmatch
+import hashlib
+import importlib.util
+import json
+import os
+import time
+from pathlib import Path
+
+MANIFEST_NAME = 'manifest.json'
+ARTIFACT_LOG_NAME = 'artifacts.jsonl'
+KEY_CHARS = 16
+MAX_BYTES = 200 * 1024 * 1024
+MAX_AGE_DAYS = 90
+# bump to invalidate every cached chart (e.g. after a matplotlib style change)
+RENDER_VERSION = 1
+
+
+def _hash_file(digest, path) -> None:
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+
+
+def source_files(*modules: str) -> list[Path]:
+    """Source files of the named modules, located without importing them."""
+    paths = []
+    for name in modules:
+        spec = importlib.util.find_spec(name)
+        if spec is None or not spec.has_location:
+            raise ModuleNotFoundError(f'No source file for module {name!r}')
+        paths.append(Path(spec.origin))
+    return paths
+
+
+def cache_key(inputs, params: dict, sources) -> str:
+    """SHA-256 over the input files' bytes, ``params`` (as sorted JSON), the
+    ``sources`` (one path or a list: every module the chart depends on) and
+    ``RENDER_VERSION``."""
+    if isinstance(sources, (str, os.PathLike)):
+        sources = [sources]
+    digest = hashlib.sha256(f'render-v{RENDER_VERSION}'.encode('utf-8'))
+    for path in [*inputs, *sources, __file__]:
+        digest.update(Path(path).name.encode('utf-8') + b'\0')
+        _hash_file(digest, path)
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def artifact_path(out_dir: Path, name: str, key: str) -> Path:
+    return Path(out_dir) / f'{name}_{key[:KEY_CHARS]}.png'
+
+
+def load_manifest(out_dir: Path) -> dict:
+    path = Path(out_dir) / MANIFEST_NAME
+    if path.exists():
+        try:
+            manifest = json.loads(path.read_text(encoding='utf-8'))
+            if isinstance(manifest, dict):
+                manifest.setdefault('entries', {})
+                manifest.setdefault('latest', {})
+                return manifest
+        except (OSError, json.JSONDecodeError):
+            pass
+    return {'entries': {}, 'latest': {}}
+
+
+def save_manifest(out_dir: Path, manifest: dict) -> None:
+    path = Path(out_dir) / MANIFEST_NAME
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def lookup(out_dir: Path, name: str, key: str) -> Path | None:
+    """Path of the cached chart for ``key``, or None if it must be rendered.
+
+    A hit refreshes the entry's last-used time and makes it the latest file
+    for ``name``.
+    """
+    manifest = load_manifest(out_dir)
+    entry = manifest['entries'].get(key)
+    if entry is None:
+        return None
+    path = Path(out_dir) / entry['file']
+    if not path.exists():
+        del manifest['entries'][key]
+        save_manifest(out_dir, manifest)
+        return None
+    now = time.time()
+    entry['last_used'] = now
+    previous = manifest['latest'].get(name, {}).get('file')
+    manifest['latest'][name] = {'file': entry['file'], 'key': key, 'updated': now}
+    save_manifest(out_dir, manifest)
+    if previous != entry['file']:
+        publish(out_dir, name, path)
+    return path
+
+
+def record(out_dir: Path, name: str, key: str, path: Path, params: dict | None = None) -> None:
+    """Register a freshly rendered chart in the manifest."""
+    path = Path(path)
+    manifest = load_manifest(out_dir)
+    now = time.time()
+    manifest['entries'][key] = {
+        'name': name, 'file': path.name, 'bytes': path.stat().st_size,
+        'created': now, 'last_used': now, 'params': params or {},
+    }
+    manifest['latest'][name] = {'file': path.name, 'key': key, 'updated': now}
+    save_manifest(out_dir, manifest)
+    publish(out_dir, name, path)
+
+
+def evict(out_dir: Path, max_bytes: int = MAX_BYTES, max_age_days: float = MAX_AGE_DAYS) -> list[str]:
+    """Delete stale and least recently used cached charts; returns removed file names.
+
+    The latest chart for each name is always kept.
+    """
+    manifest = load_manifest(out_dir)
+    keep = {v['key'] for v in manifest['latest'].values()}
+    cutoff = time.time() - max_age_days * 86400
+    by_age = sorted(manifest['entries'].items(), key=lambda kv: kv[1]['last_used'])
+    total = sum(e['bytes'] for _, e in by_age)
+
+    removed = []
+    for key, entry in by_age:
+        if key in keep:
+            continue
+        if entry['last_used'] >= cutoff and total <= max_bytes:
+            break
+        (Path(out_dir) / entry['file']).unlink(missing_ok=True)
+        total -= entry['bytes']
+        del manifest['entries'][key]
+        removed.append(entry['file'])
+    if removed:
+        save_manifest(out_dir, manifest)
+    return removed
+
+
+def publish(out_dir: Path, name: str, path: Path) -> None:
+    """Append ``path`` to the artifact log as the newest file for ``name``."""
+    line = json.dumps({'name': name, 'file': Path(path).name, 'time': time.time()})
+    with open(Path(out_dir) / ARTIFACT_LOG_NAME, 'a', encoding='utf-8') as f:
+        f.write(line + '\n')
+
+
+def _read_lines_reversed(path: Path, block_size: int = 64 * 1024):
+    """Yield the lines of ``path`` from last to first, reading from the end."""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        tail = b''
+        while pos > 0:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            lines = (f.read(step) + tail).split(b'\n')
+            tail = lines.pop(0)
+            for line in reversed(lines):
+                if line:
+                    yield line.decode('utf-8')
+        if tail:
+            yield tail.decode('utf-8')
+
+
+def latest_published(out_dir: Path, patterns: dict[str, str]) -> dict[str, str | None]:
+    """Newest logged file name matching each glob in ``patterns`` (``{key: glob}``).
+
+    The log is read from the end and reading stops as soon as every pattern
+    has a match whose file still exists. Patterns with no match map to None.
+    """
+    found = {key: None for key in patterns}
+    log = Path(out_dir) / ARTIFACT_LOG_NAME
+    if not log.exists():
+        return found
+    missing = set(patterns)
+    for line in _read_lines_reversed(log):
+        try:
+            filename = json.loads(line)['file']
+        except (ValueError, KeyError):
+            continue
+        hits = [key for key in missing if fnmatch.fnmatchcase(filename, patterns[key])]
+        if hits and (Path(out_dir) / filename).exists():
+            for key in hits:
+                found[key] = filename
+            missing.difference_update(hits)
+            if not missing:
+                break
+    return found
+
+
+def register_untracked(out_dir: Path, pattern: str = '*.png') -> list[str]:
+    """Log files in ``out_dir`` that were never published (oldest first).
+
+    Meant for PNGs written outside the cache, such as notebook output.
+    """
+    log = Path(out_dir) / ARTIFACT_LOG_NAME
+    known = set()
+    if log.exists():
+        with open(log, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    known.add(json.loads(line)['file'])
+                except (ValueError, KeyError):
+                    continue
+    new = [e for e in os.scandir(out_dir)
+           if e.is_file() and e.name not in known and fnmatch.fnmatchcase(e.name, pattern)]
+    new.sort(key=lambda e: e.stat().st_mtime)
+    for entry in new:
+        publish(out_dir, Path(entry.name).stem, Path(entry.path))
+    return [e.name for e in new]
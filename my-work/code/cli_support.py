@@ -0,0 +1,89 @@
+"""Phase timing and headless matplotlib helpers for the chart scripts.
+
+Author: Edward Cronin
+
+Kept free of heavy imports so that importing it costs nothing; pandas and
+matplotlib are only loaded by the scripts once they know they need them.
+
+- ``phase(name)`` marks the start of a phase (import, load, compute,
+  render, save); the previous phase ends there. ``timings()`` returns the
+  seconds spent in each, and ``report()`` prints them. `pfda.py` prints
+  the report after every command.
+- ``pyplot()`` imports matplotlib.pyplot, first switching to the Agg
+  backend when there is no display (cron, SSH, CI) or ``PFDA_HEADLESS=1``;
+  ``pyplot(agg=True)`` always does, for scripts that only save files.
+- ``show()`` calls ``plt.show()`` only for interactive backends, so
+  headless runs never block or warn.
+"""
+
+import json
+import os
+import sys
+import time
+
+NON_INTERACTIVE_BACKENDS = {'agg', 'cairo', 'pdf', 'pgf', 'ps', 'svg', 'template'}
+
+_totals: dict[str, float] = {}
+_current: tuple[str, float] | None = None
+
+
+def phase(name: str | None) -> None:
+    """End the running phase and start ``name`` (None just ends it)."""
+    global _current
+    now = time.perf_counter()
+    if _current is not None:
+        prev, started = _current
+        _totals[prev] = _totals.get(prev, 0.0) + now - started
+    _current = (name, now) if name is not None else None
+
+
+def timings() -> dict[str, float]:
+    """Seconds per phase so far, in the order the phases first ran."""
+    phase(_current[0] if _current else None)
+    return dict(_totals)
+
+
+def reset() -> None:
+    global _current
+    _totals.clear()
+    _current = None
+
+
+def report(label: str = '', stream=None, as_json: bool = False) -> None:
+    """Print the phase timings to ``stream`` (stderr by default)."""
+    stream = stream or sys.stderr
+    times = timings()
+    if as_json:
+        print(json.dumps({'command': label, 'time': time.time(),
+                          'phases': {k: round(v, 4) for k, v in times.items()},
+                          'total': round(sum(times.values()), 4)}), file=stream)
+        return
+    parts = '  '.join(f'{name} {seconds * 1e3:.0f} ms' for name, seconds in times.items())
+    print(f'[timing] {label + ": " if label else ""}{parts}  (total {sum(times.values()) * 1e3:.0f} ms)',
+          file=stream)
+
+
+def headless() -> bool:
+    """True when no display is available or PFDA_HEADLESS=1 is set."""
+    if os.environ.get('PFDA_HEADLESS') == '1':
+        return True
+    if sys.platform.startswith('linux'):
+        return not (os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY'))
+    return False
+
+
+def pyplot(agg: bool = False):
+    """Import and return matplotlib.pyplot, using Agg when headless (or always if ``agg``)."""
+    import matplotlib
+    if (agg or headless()) and 'MPLBACKEND' not in os.environ:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def show() -> None:
+    """plt.show() for interactive backends; a no-op for Agg and friends."""
+    import matplotlib
+    import matplotlib.pyplot as plt
+    if matplotlib.get_backend().lower() not in NON_INTERACTIVE_BACKENDS:
+        plt.show()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""Render the population-by-age chart for every county and census year.
+
+Author: Edward Cronin
+
+`cso_populationbyage_galway.py` draws one chart (the two Galway councils)
+and blocks on `plt.show()`. This script loads `cso-populationbyage.csv`
+once, does a single group-by over (council, census year, age) for all
+pairs, and renders every chart headlessly with the Agg backend across a
+process pool.
+
+Each worker builds one figure template when it starts (bars, colorbar,
+ledger box, value labels, trend line) and for each chart only updates the
+bar heights, texts, trend line and limits before saving, instead of
+creating a new figure, colorbar and ledger every time.
+
+Charts go to `my-work/generated_charts/cso_batch/` as
+`cso-populationbyage_<council>_<year>.png`. Under `python pfda.py --timings
+cso-batch` the load, compute and render phases are timed like the other
+commands.
+
+Run from `my-work/code` like:
+    python cso_population_batch.py --workers 4
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from cli_support import phase, pyplot
+from cso_populationbyage_galway import (
+    COUNTY_COL, FNAME, SEARCH_LEVELS, _category_codes, build_ledger_lines,
+    find_data_file, load_population, resolve_out_dir,
+)
+
+BATCH_DIR_NAME = 'cso_batch'
+
+# per-process figure template, built once by _init_worker
+_TEMPLATE = None
+
+
+def slugify(name: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')
+
+
+def build_profiles(df, sex: str = 'Both sexes') -> dict[tuple[str, int], tuple[np.ndarray, np.ndarray]]:
+    """Population by age for every (council, census year), in one group-by.
+
+    Returns ``{(council, year): (values, observed)}`` where ``values[i]`` is
+    the population at age ``i`` and ``observed[i]`` says whether the CSV has
+    a value for that age (a real population of 0 is observed; a missing
+    age is not, and has ``values[i] == 0``).
+    """
+    mask = df['AgeNum'].to_numpy() >= 0
+    mask &= np.isin(df['Sex'].cat.codes.to_numpy(), _category_codes(df['Sex'], [sex]))
+    mask &= df['VALUE'].notna().to_numpy()
+    grouped = df[mask].groupby([COUNTY_COL, 'CensusYear', 'AgeNum'], observed=True)['VALUE'].sum()
+    n_ages = int(df['AgeNum'].max()) + 1
+    profiles = {}
+    for (county, year), series in grouped.groupby(level=[0, 1], observed=True):
+        ages = series.index.get_level_values('AgeNum').to_numpy()
+        values, observed = np.zeros(n_ages), np.zeros(n_ages, dtype=bool)
+        values[ages] = series.to_numpy()
+        observed[ages] = True
+        profiles[(str(county), int(year))] = (values, observed)
+    return profiles
+
+
+def _init_worker(n_ages: int) -> None:
+    """Build the reusable figure for this process."""
+    global _TEMPLATE
+    plt = pyplot(agg=True)  # charts are only saved, never shown
+    ages = np.arange(n_ages)
+    fig, ax = plt.subplots(figsize=(12, 6))
+    cmap = plt.get_cmap('viridis')
+    norm = plt.Normalize(vmin=ages.min(), vmax=ages.max())
+    bars = ax.bar(ages, np.zeros(n_ages), color=cmap(norm(ages)), width=0.8)
+    ax.set_xlabel('Age (years)')
+    ax.set_ylabel('Population')
+    ax.grid(axis='y', linestyle='--', alpha=0.4)
+    sm = plt.cm.ScalarMappable(cmap=cmap, norm=norm)
+    sm.set_array([])
+    cbar = fig.colorbar(sm, ax=ax, orientation='vertical', pad=0.02)
+    cbar.set_label('Age (years)')
+    ledger = ax.text(0.98, 0.98, '', transform=ax.transAxes, fontsize=9, va='top', ha='right',
+                     bbox=dict(boxstyle='round', facecolor='white', alpha=0.85))
+    labels = {age: ax.text(age, 0, '', ha='center', va='bottom', fontsize=8)
+              for age in ages if age % 10 == 0}
+    (trend,) = ax.plot(ages, np.zeros(n_ages), color='red', linestyle='--', linewidth=2)
+    ax.set_xlim(-1, n_ages)
+    _TEMPLATE = {'fig': fig, 'ax': ax, 'ages': ages, 'bars': bars, 'ledger': ledger,
+                 'labels': labels, 'trend': trend}
+
+
+def render_profile(task: tuple[str, int, np.ndarray, np.ndarray, str]) -> str:
+    """Draw one (council, year) profile on the worker's template and save it."""
+    county, year, values, present, outfile = task
+    t = _TEMPLATE
+    ax, ages = t['ax'], t['ages']
+
+    for bar, val in zip(t['bars'], values):
+        bar.set_height(val)
+    ax.set_title(f'{county} — population by single year of age ({year})')
+    y_max = float(values.max()) * 1.05 if values.any() else 1.0
+    ax.set_ylim(0, y_max)
+
+    t['ledger'].set_text('\n'.join(build_ledger_lines(ages[present], values[present])))
+    y_offset = y_max * 0.01
+    for age, label in t['labels'].items():
+        label.set_position((age, values[age] + y_offset))
+        label.set_text(f'{int(values[age]):,}' if present[age] else '')
+
+    if present.sum() >= 2:
+        coeffs = np.polyfit(ages[present], values[present], 1)
+        t['trend'].set_data(ages[present], np.polyval(coeffs, ages[present]))
+        t['trend'].set_label(f'Trend (slope={coeffs[0]:.1f} pop/yr)')
+        t['trend'].set_visible(True)
+        ax.legend(handles=[t['trend']], loc='upper right')
+    else:
+        t['trend'].set_visible(False)
+
+    t['fig'].savefig(outfile, dpi=150, bbox_inches='tight')
+    return outfile
+
+
+def render_all(csv_path: Path, out_dir: Path, workers: int = os.cpu_count() or 1,
+               sex: str = 'Both sexes') -> tuple[int, float]:
+    """Render every (council, year) chart; returns ``(charts, seconds)``."""
+    start = time.perf_counter()
+    phase('load')
+    df = load_population(csv_path)
+    phase('compute')
+    profiles = build_profiles(df, sex)
+    if not profiles:
+        raise RuntimeError(f'No rows found for sex={sex!r}')
+    n_ages = len(next(iter(profiles.values()))[0])
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tasks = [(county, year, values, observed,
+              str(out_dir / f'cso-populationbyage_{slugify(county)}_{year}.png'))
+             for (county, year), (values, observed) in sorted(profiles.items())]
+
+    # workers draw and save each chart, so saving is timed as part of render
+    phase('render')
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(n_ages,)) as pool:
+            for _ in pool.map(render_profile, tasks, chunksize=max(1, len(tasks) // (4 * workers))):
+                pass
+    else:
+        _init_worker(n_ages)
+        for task in tasks:
+            render_profile(task)
+    phase(None)
+    return len(tasks), time.perf_counter() - start
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description='Render population-by-age charts for every council and year.')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--sex', default='Both sexes')
+    args = parser.parse_args(argv)
+
+    here = Path(__file__).resolve().parent
+    csv_path = find_data_file(here, FNAME) or find_data_file(Path.cwd(), FNAME)
+    if csv_path is None:
+        raise FileNotFoundError(f"Put '{FNAME}' in a nearby data/ folder (tried up to {SEARCH_LEVELS} parents).")
+    out_dir = resolve_out_dir(csv_path, here) / BATCH_DIR_NAME
+    charts, seconds = render_all(csv_path, out_dir, args.workers, args.sex)
+    print(f'Rendered {charts} charts in {seconds:.2f} s ({charts / seconds:.1f} charts/s, '
+          f'{args.workers} worker(s)) to {out_dir.resolve()}')
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print('Error:', e)
+        sys.exit(1)
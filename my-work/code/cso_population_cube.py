@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""Dense NumPy cube of CSO population by census year, county, sex and age.
+
+Author: Edward Cronin
+
+The CSO FY006A population CSVs (`cso-populationbyage.csv`,
+`assignment05_population_for_analysis.csv`) are long tables with one row
+per (CensusYear, Administrative Counties, Sex, Single Year of Age). The
+scripts and the assignment05 notebook re-read them and filter with boolean
+masks or rebuild a pivot table every time. `build_cube` reads the CSV once
+(through `load_population`) and scatters VALUE into a dense float64 array of
+shape (years, counties, sexes, ages):
+
+- `<name>.cube.npy` holds the array and is opened memory-mapped, so loading
+  it costs almost nothing and only the slices you touch are read;
+- `<name>.cube.json` holds the labels of each dimension and the size and
+  mtime of the CSV it was built from. `load_cube` rebuilds only when the
+  CSV has changed.
+
+Both live in `my-work/.cache/` (`CACHE_DIR`, or `$PFDA_CACHE_DIR`), not in
+the data folder; `<name>` is the CSV's file name plus a hash of its full
+path, so CSVs with the same name in different folders get their own cube.
+
+Cells with no row in the CSV are NaN, so "missing" and "zero" stay apart.
+'All ages' rows are left out (sum over the age axis instead). After that a
+slice, regional sum or male/female difference is an array reduction, e.g.
+`PopulationCube.band_sex_difference` for the notebook's "region winner".
+With ``year=None`` the query methods pool every census year, as the
+frame-based code they replace did.
+
+Run from `my-work/code` like:
+    python cso_population_cube.py ../../assignments/data/assignment05_population_for_analysis.csv
+    python cso_population_cube.py --benchmark
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from cso_populationbyage_galway import (
+    AGE_COL, COUNTY_COL, FNAME, SEARCH_LEVELS, county_age_profile, find_data_file, load_population,
+)
+
+CUBE_VERSION = 1
+DIMS = ('year', 'county', 'sex', 'age')
+CACHE_DIR = Path(os.environ.get('PFDA_CACHE_DIR') or Path(__file__).resolve().parents[1] / '.cache')
+
+
+def cube_paths(csv_path, cache_dir=None) -> tuple[Path, Path]:
+    """(array file, labels file) of the cube for ``csv_path`` in ``cache_dir`` (default CACHE_DIR)."""
+    csv_path = Path(csv_path)
+    tag = hashlib.sha256(str(csv_path.resolve()).encode('utf-8')).hexdigest()[:12]
+    base = Path(cache_dir or CACHE_DIR) / f'{csv_path.name}-{tag}'
+    return base.with_name(base.name + '.cube.npy'), base.with_name(base.name + '.cube.json')
+
+
+def _source_stamp(csv_path) -> dict:
+    st = os.stat(csv_path)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def build_cube(csv_path, cache_dir=None) -> 'PopulationCube':
+    """Read ``csv_path`` once and write its cube and dimension labels to ``cache_dir``."""
+    df = load_population(csv_path)
+    df = df[(df['AgeNum'].to_numpy() >= 0) & df['VALUE'].notna().to_numpy()]
+    if 'CensusYear' not in df.columns:
+        df = df.assign(CensusYear=0)
+    if 'Sex' not in df.columns:
+        df = df.assign(Sex=pd.Categorical(['Both sexes'] * len(df)))
+
+    years = np.sort(df['CensusYear'].dropna().unique()).astype(int)
+    counties = df[COUNTY_COL].cat.remove_unused_categories()
+    sexes = df['Sex'].cat.remove_unused_categories()
+    n_ages = int(df['AgeNum'].max()) + 1 if len(df) else 0
+
+    cube = np.full((len(years), len(counties.cat.categories), len(sexes.cat.categories), n_ages), np.nan)
+    idx = (np.searchsorted(years, df['CensusYear'].to_numpy()),
+           counties.cat.codes.to_numpy(), sexes.cat.codes.to_numpy(), df['AgeNum'].to_numpy())
+    # duplicate rows for a cell are summed, like a groupby-sum would
+    filled = np.zeros(cube.shape, dtype=bool)
+    filled[idx] = True
+    totals = np.zeros(cube.shape)
+    np.add.at(totals, idx, df['VALUE'].to_numpy(dtype=float))
+    cube[filled] = totals[filled]
+
+    npy_path, meta_path = cube_paths(csv_path, cache_dir)
+    npy_path.parent.mkdir(parents=True, exist_ok=True)
+    np.save(npy_path, cube)
+    meta = {
+        'version': CUBE_VERSION,
+        'source': _source_stamp(csv_path),
+        'dims': {
+            'year': years.tolist(),
+            'county': [str(c) for c in counties.cat.categories],
+            'sex': [str(s) for s in sexes.cat.categories],
+            'age': list(range(n_ages)),
+        },
+    }
+    tmp = meta_path.with_name(meta_path.name + '.tmp')
+    tmp.write_text(json.dumps(meta, indent=1), encoding='utf-8')
+    os.replace(tmp, meta_path)
+    return PopulationCube(np.load(npy_path, mmap_mode='r'), meta['dims'])
+
+
+def load_cube(csv_path, rebuild: bool = False, cache_dir=None) -> 'PopulationCube':
+    """The cube for ``csv_path``, memory-mapped; rebuilt only if the CSV changed."""
+    npy_path, meta_path = cube_paths(csv_path, cache_dir)
+    if not rebuild and npy_path.exists() and meta_path.exists():
+        try:
+            meta = json.loads(meta_path.read_text(encoding='utf-8'))
+            if meta.get('version') == CUBE_VERSION and meta.get('source') == _source_stamp(csv_path):
+                return PopulationCube(np.load(npy_path, mmap_mode='r'), meta['dims'])
+        except (OSError, ValueError, KeyError):
+            pass
+    return build_cube(csv_path, cache_dir)
+
+
+class PopulationCube:
+    """A (year, county, sex, age) population array with label lookups per dimension."""
+
+    def __init__(self, data: np.ndarray, dims: dict):
+        self.data = data
+        self.labels = {d: list(dims[d]) for d in DIMS}
+        self._pos = {d: {label: i for i, label in enumerate(self.labels[d])} for d in DIMS}
+
+    @property
+    def ages(self) -> np.ndarray:
+        return np.asarray(self.labels['age'])
+
+    def index(self, dim: str, labels):
+        """Positions of ``labels`` along ``dim``: an int for one label, an array for a list."""
+        pos = self._pos[dim]
+        try:
+            if isinstance(labels, (list, tuple, np.ndarray, pd.Index)):
+                return np.array([pos[label] for label in labels], dtype=np.intp)
+            return pos[labels]
+        except KeyError as e:
+            raise KeyError(f'{e.args[0]!r} is not a {dim} in the cube') from None
+
+    def sel(self, year=None, county=None, sex=None, age=None) -> np.ndarray:
+        """Slice by labels. None keeps a whole axis, a scalar drops it, a list keeps it.
+
+        Ages are integers, so ``age=slice(30, 41)`` selects ages 30-40.
+        """
+        out = self.data
+        for axis, (dim, want) in reversed(list(enumerate(zip(DIMS, (year, county, sex, age))))):
+            if want is None:
+                continue
+            if isinstance(want, slice):
+                # ages are 0..n-1, so labels and positions coincide
+                out = out[(slice(None),) * axis + (want,)]
+            else:
+                out = np.take(out, self.index(dim, want), axis=axis)
+        return out
+
+    def _years(self, year) -> list:
+        """``year`` as a list for ``sel``, so the year axis is kept; None is every year."""
+        return list(self.labels['year']) if year is None else [year]
+
+    def profile(self, counties, year=None, sex='Both sexes') -> tuple[np.ndarray, np.ndarray]:
+        """(ages, population) summed over ``counties`` for ages that have data.
+
+        Same numbers as ``county_age_profile``; ``year`` None sums every
+        census year.
+        """
+        block = self.sel(year=self._years(year), county=list(counties), sex=sex)
+        present = ~np.isnan(block).all(axis=(0, 1))
+        return self.ages[present], np.nansum(block, axis=(0, 1))[present]
+
+    def age_by_sex(self, year=None, sexes=('Female', 'Male'), counties=None, how: str = 'sum') -> pd.DataFrame:
+        """Age x sex table reduced over ``counties`` (all by default) with ``how`` ('sum' or 'mean').
+
+        ``year`` None pools every census year. ``how='mean'`` matches
+        ``pd.pivot_table``'s default aggregation over the rows.
+        """
+        block = self.sel(year=self._years(year), county=None if counties is None else list(counties),
+                         sex=list(sexes))
+        block = block.reshape(-1, *block.shape[2:])     # (year x county, sex, age)
+        reduce = {'sum': np.nansum, 'mean': np.nanmean}[how]
+        with warnings.catch_warnings():
+            # all-NaN cells stay NaN without a 'Mean of empty slice' warning
+            warnings.simplefilter('ignore', RuntimeWarning)
+            values = reduce(block, axis=0)
+        frame = pd.DataFrame(values.T, index=pd.Index(self.ages, name=AGE_COL), columns=list(sexes))
+        frame.columns.name = 'Sex'
+        return frame[~np.isnan(block).all(axis=(0, 1))]
+
+    def band_sex_difference(self, min_age: int, max_age: int, year=None,
+                            exclude=('Ireland',)) -> pd.DataFrame:
+        """Male and female totals per county for ages ``min_age``..``max_age``.
+
+        Returns male, female, difference (male - female) and abs_difference,
+        indexed by county, with the national total rows in ``exclude`` left out.
+        ``year`` None sums every census year.
+        """
+        block = self.sel(year=self._years(year), sex=['Male', 'Female'], age=slice(min_age, max_age + 1))
+        male, female = np.nansum(block, axis=(0, 3)).T
+        frame = pd.DataFrame({'male': male, 'female': female},
+                             index=pd.Index(self.labels['county'], name=COUNTY_COL)).astype(int)
+        excluded = {e.strip().lower() for e in exclude}
+        frame = frame[[c.strip().lower() not in excluded for c in frame.index]]
+        frame['difference'] = frame['male'] - frame['female']
+        frame['abs_difference'] = frame['difference'].abs()
+        return frame
+
+
+def benchmark(csv_path, queries: int = 200, seed: int = 0) -> None:
+    """Time random county-profile queries: mask filtering on the frame vs the cube."""
+    start = time.perf_counter()
+    cube = load_cube(csv_path, rebuild=True)
+    t_build = time.perf_counter() - start
+    start = time.perf_counter()
+    cube = load_cube(csv_path)
+    t_load = time.perf_counter() - start
+    start = time.perf_counter()
+    df = load_population(csv_path)
+    t_csv = time.perf_counter() - start
+
+    rng = np.random.default_rng(seed)
+    counties = cube.labels['county']
+    sex = 'Both sexes' if 'Both sexes' in cube.labels['sex'] else cube.labels['sex'][0]
+    picks = [list(rng.choice(counties, size=rng.integers(1, 4), replace=False)) for _ in range(queries)]
+
+    start = time.perf_counter()
+    old = [county_age_profile(df, p, year=None, sex=sex) for p in picks]
+    t_mask = (time.perf_counter() - start) / queries
+    start = time.perf_counter()
+    new = [cube.profile(p, sex=sex) for p in picks]
+    t_cube = (time.perf_counter() - start) / queries
+
+    same = all(np.array_equal(o['AgeNum'].to_numpy(), a) and np.allclose(o['VALUE'].to_numpy(), v)
+               for o, (a, v) in zip(old, new))
+    print(f'cube {cube.data.shape}, built in {t_build * 1e3:.1f} ms, reopened in {t_load * 1e3:.2f} ms '
+          f'(reading the CSV: {t_csv * 1e3:.1f} ms)')
+    print(f'county profile: masks {t_mask * 1e3:8.3f} ms   cube {t_cube * 1e3:8.3f} ms   '
+          f'({t_mask / t_cube:.0f}x), same results: {same}')
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description='Build or query the CSO population cube.')
+    parser.add_argument('csvfile', nargs='?', help=f'CSO population CSV (default: nearby {FNAME})')
+    parser.add_argument('--rebuild', action='store_true')
+    parser.add_argument('--benchmark', action='store_true')
+    args = parser.parse_args(argv)
+
+    if args.csvfile:
+        csv_path = Path(args.csvfile)
+    else:
+        here = Path(__file__).resolve().parent
+        csv_path = find_data_file(here, FNAME) or find_data_file(Path.cwd(), FNAME)
+        if csv_path is None:
+            raise FileNotFoundError(f"Put '{FNAME}' in a nearby data/ folder (tried up to {SEARCH_LEVELS} parents).")
+
+    if args.benchmark:
+        benchmark(csv_path)
+        return
+    cube = load_cube(csv_path, rebuild=args.rebuild)
+    print(f'{cube_paths(csv_path)[0]}: shape {cube.data.shape}')
+    for dim in DIMS:
+        labels = cube.labels[dim]
+        shown = ', '.join(map(str, labels[:4])) + (', ...' if len(labels) > 4 else '')
+        print(f'  {dim:<7}{len(labels):4d}  {shown}')
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print('Error:', e)
+        sys.exit(1)
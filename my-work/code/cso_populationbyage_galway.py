@@ -1,26 +1,59 @@
 #!/usr/bin/env python3
-"""Plot Galway population by single-year age and save a timestamped PNG.
+"""Plot Galway population by single-year age and save it as a cached PNG.
 
 Author: Edward Cronin
 
 Filters `cso-populationbyage.csv` for CensusYear 2022 and the two Galway
 councils (Galway City Council and Galway County Council), aggregates their
 populations by single-year age, plots a bar chart (Age vs Population), adds
-a small ledger box with summary stats, and saves a timestamped PNG to
-`my-work/generated_charts/`.
+a small ledger box with summary stats, and saves a PNG to
+`my-work/generated_charts/`. The PNG is cached by a hash of the CSV, the
+parameters and the source of this script and every module it draws with
+(`RENDER_MODULES`, see `chart_cache.py`), so an unchanged re-run returns
+the existing chart without loading or plotting anything.
+
+The CSV is loaded once through `load_population`: only the needed columns
+are read, the label columns become categoricals, and each distinct age
+label is parsed once and mapped onto the rows through its category code.
+`county_age_profile` then filters any set of councils with integer code
+comparisons, so the same ingest serves every county, not just Galway.
+The chart itself is drawn from the population cube built on top of that
+ingest (`cso_population_cube.py`), which is only rebuilt when the CSV changes.
+Run with `--benchmark` to time this against the old row-by-row path.
+
+pandas and matplotlib are only imported once the cache misses, and without
+a display the chart is saved with the Agg backend and not shown; run it as
+`python pfda.py --timings galway` to see the time spent in each phase.
 """
 
+from __future__ import annotations
+
+import argparse
 import re
-import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
 from pathlib import Path
-from datetime import datetime
 import sys
+import time
+from typing import TYPE_CHECKING
+
+import chart_cache
+from cli_support import phase, pyplot, show
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 FNAME = 'cso-populationbyage.csv'
 OUT_DIR_NAME = 'generated_charts'
 SEARCH_LEVELS = 4
+CHART_NAME = 'cso-populationbyage_galway'
+GALWAY_COUNCILS = ['Galway City Council', 'Galway County Council']
+
+AGE_COL = 'Single Year of Age'
+COUNTY_COL = 'Administrative Counties'
+USECOLS = ['CensusYear', 'Sex', AGE_COL, COUNTY_COL, 'VALUE']
+CATEGORY_COLS = ['Sex', AGE_COL, COUNTY_COL]
+# modules the chart is drawn with; their source is part of the cache key
+RENDER_MODULES = ['cso_population_cube', 'cli_support']
 
 
 def find_data_file(start: Path, name: str, levels: int = SEARCH_LEVELS) -> Path | None:
@@ -46,6 +79,120 @@ def parse_age_label(label: str) -> int | None:
     return int(m.group(1)) if m else None
 
 
+def load_population(csv_path: Path) -> pd.DataFrame:
+    """Read the CSO population-by-age CSV into a compact, typed frame.
+
+    Label columns are categoricals; ``AgeNum`` is filled by parsing each
+    distinct age label once (``parse_age_label``) and indexing that lookup
+    with the category codes. 'All ages' and unparseable labels get -1.
+    """
+    import pandas as pd
+
+    df = pd.read_csv(csv_path, usecols=lambda c: c in USECOLS,
+                     dtype={c: 'category' for c in CATEGORY_COLS})
+    if 'CensusYear' in df.columns:
+        df['CensusYear'] = pd.to_numeric(df['CensusYear'], errors='coerce')
+    df['VALUE'] = pd.to_numeric(df['VALUE'], errors='coerce')
+
+    labels = df[AGE_COL].cat.categories
+    lookup = np.array([parse_age_label(lbl) for lbl in labels] + [None], dtype=float)
+    lookup = np.nan_to_num(lookup, nan=-1).astype(np.int16)
+    # code -1 (missing label) indexes the trailing -1 sentinel
+    df['AgeNum'] = lookup[df[AGE_COL].cat.codes.to_numpy()]
+    return df
+
+
+def _category_codes(col: pd.Series, labels) -> np.ndarray:
+    cats = col.cat.categories
+    return np.array([cats.get_loc(lbl) for lbl in labels if lbl in cats], dtype=np.int64)
+
+
+def county_age_profile(df: pd.DataFrame, counties, year: int | None = 2022,
+                       sex: str | None = 'Both sexes') -> pd.DataFrame:
+    """Population by single-year age summed over ``counties``.
+
+    ``df`` comes from ``load_population``. Filters are integer comparisons on
+    category codes; ``year`` or ``sex`` of None skips that filter. Returns a
+    frame with ``AgeNum`` and ``VALUE`` sorted by age.
+    """
+    mask = df['AgeNum'].to_numpy() >= 0
+    if COUNTY_COL in df.columns:
+        mask &= np.isin(df[COUNTY_COL].cat.codes.to_numpy(), _category_codes(df[COUNTY_COL], counties))
+    if sex is not None and 'Sex' in df.columns:
+        mask &= np.isin(df['Sex'].cat.codes.to_numpy(), _category_codes(df['Sex'], [sex]))
+    if year is not None and 'CensusYear' in df.columns:
+        mask &= df['CensusYear'].to_numpy() == year
+    mask &= df['VALUE'].notna().to_numpy()
+
+    sub = df.loc[mask, ['AgeNum', 'VALUE']]
+    return sub.groupby('AgeNum', sort=True)['VALUE'].sum().reset_index()
+
+
+def build_ledger_lines(ages: np.ndarray, vals: np.ndarray, top: int = 5) -> list[str]:
+    """Ledger text: total, approximate median age and the ``top`` most populous ages."""
+    total_pop = int(vals.sum())
+    median_age = float(ages[np.cumsum(vals) >= total_pop / 2][0]) if len(ages) else None
+    lines = [f'Total pop: {total_pop:,}',
+             f'Median age (approx): {median_age:.1f}' if median_age is not None else 'Median age: N/A',
+             '', 'Top ages:']
+    # stable sort keeps the first of equal values, like DataFrame.nlargest
+    order = np.argsort(-vals, kind='stable')[:top]
+    lines += [f'{int(ages[i])}: {int(vals[i]):,}' for i in order]
+    return lines
+
+
+def _legacy_age_profile(csv_path: Path, counties, year: int = 2022) -> pd.DataFrame:
+    """The previous ingest (full read, string masks, row-wise apply), for timing."""
+    import pandas as pd
+
+    df = pd.read_csv(csv_path)
+    df['CensusYear'] = pd.to_numeric(df['CensusYear'], errors='coerce')
+    mask = (pd.to_numeric(df['CensusYear'], errors='coerce') == year)
+    mask = mask & df[COUNTY_COL].isin(counties)
+    mask = mask & (df['Sex'].astype(str) == 'Both sexes')
+    sub = df[mask].copy()
+    sub['AgeNum'] = sub[AGE_COL].apply(parse_age_label)
+    sub = sub.dropna(subset=['AgeNum']).copy()
+    sub['AgeNum'] = sub['AgeNum'].astype(int)
+    sub['VALUE'] = pd.to_numeric(sub['VALUE'], errors='coerce')
+    sub = sub.dropna(subset=['VALUE'])
+    return sub.groupby('AgeNum', sort=True)['VALUE'].sum().reset_index()
+
+
+def benchmark_ingest(csv_path: Path, repeat: int = 5) -> None:
+    """Print best-of-``repeat`` timings for the old and new ingest paths.
+
+    The old path re-reads and re-parses per county group, so both are timed
+    for one group (Galway) and for every county in the file.
+    """
+    import pandas as pd
+
+    counties = list(pd.read_csv(csv_path, usecols=[COUNTY_COL])[COUNTY_COL].unique())
+
+    def best(func):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    def new_all():
+        df = load_population(csv_path)
+        for c in counties:
+            county_age_profile(df, [c])
+
+    t_old = best(lambda: _legacy_age_profile(csv_path, GALWAY_COUNCILS))
+    t_new = best(lambda: county_age_profile(load_population(csv_path), GALWAY_COUNCILS))
+    t_old_all = best(lambda: [_legacy_age_profile(csv_path, [c]) for c in counties])
+    t_new_all = best(new_all)
+    same = _legacy_age_profile(csv_path, GALWAY_COUNCILS).astype(float).equals(
+        county_age_profile(load_population(csv_path), GALWAY_COUNCILS).astype(float))
+    print(f'Galway:       before {t_old * 1e3:8.1f} ms   after {t_new * 1e3:8.1f} ms')
+    print(f'{len(counties)} counties:  before {t_old_all * 1e3:8.1f} ms   after {t_new_all * 1e3:8.1f} ms')
+    print('Same Galway totals:', same)
+
+
 def resolve_out_dir(csv_path: Path, here: Path) -> Path:
     p = Path(csv_path)
     for anc in p.parents:
@@ -56,45 +203,51 @@ def resolve_out_dir(csv_path: Path, here: Path) -> Path:
     return here.parent / OUT_DIR_NAME
 
 
-def main() -> None:
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description='Plot Galway population by single-year age as a cached PNG.')
+    parser.add_argument('--benchmark', action='store_true', help='time the old and new CSV ingest paths')
+    args = parser.parse_args(argv)
+
+    phase('load')
     HERE = Path(__file__).resolve().parent
     csv_path = find_data_file(HERE, FNAME) or find_data_file(Path.cwd(), FNAME)
     if csv_path is None:
         raise FileNotFoundError(f"Put '{FNAME}' in a nearby data/ folder (tried up to {SEARCH_LEVELS} parents).")
 
-    df = pd.read_csv(csv_path)
+    if args.benchmark:
+        benchmark_ingest(csv_path)
+        return
 
-    # Filter for CensusYear 2022 and Galway councils
-    df['CensusYear'] = pd.to_numeric(df['CensusYear'], errors='coerce') if 'CensusYear' in df.columns else None
-    mask = pd.Series(True, index=df.index)
-    if 'CensusYear' in df.columns:
-        mask = mask & (pd.to_numeric(df['CensusYear'], errors='coerce') == 2022)
-    # Keep only Galway City and Galway County councils
-    galway_names = ['Galway City Council', 'Galway County Council']
-    if 'Administrative Counties' in df.columns:
-        mask = mask & df['Administrative Counties'].isin(galway_names)
-    # Also prefer both sexes
-    if 'Sex' in df.columns:
-        mask = mask & (df['Sex'].astype(str) == 'Both sexes')
-
-    df_gal = df[mask].copy()
-    if df_gal.empty:
-        raise RuntimeError('No Galway rows found for CensusYear 2022')
+    out_dir = resolve_out_dir(csv_path, HERE)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    # Same CSV, parameters and drawing code -> same chart: reuse it
+    params = {'counties': GALWAY_COUNCILS, 'year': 2022, 'sex': 'Both sexes', 'dpi': 150}
+    sources = [Path(__file__), *chart_cache.source_files(*RENDER_MODULES)]
+    key = chart_cache.cache_key([csv_path], params, sources)
+    cached = chart_cache.lookup(out_dir, CHART_NAME, key)
+    if cached is not None:
+        print('Up to date (cached):', cached.resolve())
+        return
+    outfile = chart_cache.artifact_path(out_dir, CHART_NAME, key)
 
-    # Parse ages
-    df_gal['AgeNum'] = df_gal['Single Year of Age'].apply(parse_age_label)
-    df_gal = df_gal.dropna(subset=['AgeNum']).copy()
-    df_gal['AgeNum'] = df_gal['AgeNum'].astype(int)
-    df_gal['VALUE'] = pd.to_numeric(df_gal['VALUE'], errors='coerce')
-    df_gal = df_gal.dropna(subset=['VALUE'])
+    # Heavy imports only once we know the chart has to be drawn
+    phase('import')
+    from cso_population_cube import load_cube
+    plt = pyplot()
 
-    # Aggregate Galway City + County by age
-    agg = df_gal.groupby('AgeNum', sort=True)['VALUE'].sum().reset_index()
+    # Select CensusYear 2022, Both sexes and the two Galway councils from the
+    # population cube (built from the CSV once), summing City + County by age
+    phase('load')
+    cube = load_cube(csv_path)
+    phase('compute')
+    ages, vals = cube.profile(GALWAY_COUNCILS, year=2022, sex='Both sexes')
+    if not len(ages):
+        raise RuntimeError('No Galway rows found for CensusYear 2022')
 
     # Plot: color each age using a colormap
+    phase('render')
     fig, ax = plt.subplots(figsize=(12,6))
-    ages = agg['AgeNum'].to_numpy()
-    vals = agg['VALUE'].to_numpy()
     # Use a continuous colormap so each age has its own color
     cmap = plt.get_cmap('viridis')
     norm = plt.Normalize(vmin=ages.min(), vmax=ages.max())
@@ -111,11 +264,7 @@ def main() -> None:
     cbar.set_label('Age (years)')
 
     # Ledger: simple box with totals and a few stats
-    total_pop = int(agg['VALUE'].sum())
-    median_age = float(agg.loc[agg['VALUE'].cumsum() >= total_pop/2, 'AgeNum'].iloc[0]) if not agg.empty else None
-    top_ages = agg.nlargest(5, 'VALUE')
-    ledger_lines = [f'Total pop: {total_pop:,}', f'Median age (approx): {median_age:.1f}' if median_age is not None else 'Median age: N/A', '', 'Top ages:']
-    ledger_lines += [f"{int(r['AgeNum'])}: {int(r['VALUE']):,}" for _, r in top_ages.iterrows()]
+    ledger_lines = build_ledger_lines(ages, vals)
     # Draw ledger box on the plot
     props = dict(boxstyle='round', facecolor='white', alpha=0.85)
     ax.text(0.98, 0.98, '\n'.join(ledger_lines), transform=ax.transAxes, fontsize=9,
@@ -136,14 +285,14 @@ def main() -> None:
         ax.plot(ages, fitted, color='red', linestyle='--', linewidth=2, label=f'Trend (slope={coeffs[0]:.1f} pop/yr)')
         ax.legend(loc='upper right')
 
-    # Save
-    out_dir = resolve_out_dir(csv_path, HERE)
-    out_dir.mkdir(parents=True, exist_ok=True)
-    ts = datetime.now().strftime('%Y-%m-%d_%H%M%S')
-    outfile = out_dir / f'cso-populationbyage_galway_{ts}.png'
+    # Save under a content-addressed name so the next unchanged run can reuse it
+    phase('save')
     fig.savefig(outfile, dpi=150, bbox_inches='tight')
+    chart_cache.record(out_dir, CHART_NAME, key, outfile, params)
+    chart_cache.evict(out_dir)
+    phase(None)
     print('Saved:', outfile.resolve())
-    plt.show()
+    show()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""Streaming column statistics for CSV files.
+
+Author: Edward Cronin
+
+`lab02_read_csv.py` works out an average age by looping over `csv.reader` /
+`csv.DictReader`, building a list or dict for every row and printing each
+one. That is fine for the three-row `data.csv` but far too slow for big
+files. This module reads the CSV in large blocks with pandas' C parser,
+parses only the requested columns straight into float64 NumPy buffers, and
+folds each block into running totals, so memory is bounded by the block
+size rather than the file size.
+
+For each column it returns count, sum, mean, min, max, variance and std in
+a single pass. Blocks are merged with Chan et al.'s pairwise update of the
+sum of squared deviations, which stays numerically stable on long files.
+Missing or non-numeric values are left out of the statistics.
+
+Run from `my-work/code` like:
+    python lab02_csv_stats.py ../data/data.csv age
+    python lab02_csv_stats.py --benchmark 5000000
+"""
+
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+BLOCK_ROWS = 1_000_000
+
+
+def _empty_stats() -> dict:
+    return {'count': 0, 'sum': 0.0, 'mean': 0.0, 'm2': 0.0, 'min': np.inf, 'max': -np.inf}
+
+
+def _merge_block(acc: dict, values: np.ndarray) -> None:
+    """Fold one block of values into the running statistics ``acc``."""
+    values = values[~np.isnan(values)]
+    n_b = values.size
+    if not n_b:
+        return
+    mean_b = values.mean()
+    m2_b = np.square(values - mean_b).sum()
+    n_a = acc['count']
+    n = n_a + n_b
+    delta = mean_b - acc['mean']
+    acc['mean'] += delta * n_b / n
+    acc['m2'] += m2_b + delta * delta * n_a * n_b / n
+    acc['count'] = n
+    acc['sum'] += values.sum()
+    acc['min'] = min(acc['min'], values.min())
+    acc['max'] = max(acc['max'], values.max())
+
+
+def _finish(acc: dict, ddof: int) -> dict:
+    n = acc['count']
+    if not n:
+        return {'count': 0, 'sum': 0.0, 'mean': None, 'min': None, 'max': None,
+                'variance': None, 'std': None}
+    variance = acc['m2'] / (n - ddof) if n > ddof else None
+    return {
+        'count': n,
+        'sum': float(acc['sum']),
+        'mean': float(acc['mean']),
+        'min': float(acc['min']),
+        'max': float(acc['max']),
+        'variance': float(variance) if variance is not None else None,
+        'std': float(np.sqrt(variance)) if variance is not None else None,
+    }
+
+
+def aggregate_csv(filepath, columns, block_rows: int = BLOCK_ROWS, ddof: int = 1,
+                  **read_csv_kwargs) -> dict[str, dict]:
+    """Single-pass statistics for ``columns`` of the CSV at ``filepath``.
+
+    Only the named columns are parsed. ``ddof`` works as in NumPy: 1 (the
+    default) gives the sample variance, 0 the population variance. Extra
+    keyword arguments go to ``pandas.read_csv`` (for example ``sep``).
+    Returns ``{column: {'count', 'sum', 'mean', 'min', 'max', 'variance', 'std'}}``.
+    """
+    columns = [columns] if isinstance(columns, str) else list(columns)
+    acc = {c: _empty_stats() for c in columns}
+    # header names in lab CSVs are quoted and sometimes padded with spaces
+    reader = pd.read_csv(filepath, usecols=lambda name: name.strip() in columns,
+                         chunksize=block_rows, skipinitialspace=True, **read_csv_kwargs)
+    with reader:
+        for block in reader:
+            block.columns = [name.strip() for name in block.columns]
+            for c in columns:
+                values = pd.to_numeric(block[c], errors='coerce').to_numpy(dtype=np.float64)
+                _merge_block(acc[c], values)
+    return {c: _finish(acc[c], ddof) for c in columns}
+
+
+def dictreader_mean(filepath, column: str = 'age') -> tuple[int, float]:
+    """The lab02 DictReader loop (without the per-row printing), for benchmarks."""
+    total, count = 0, 0
+    with open(filepath, 'rt') as fp:
+        reader = csv.DictReader(fp, delimiter=',', quoting=csv.QUOTE_NONNUMERIC)
+        for row in reader:
+            total += row[column]
+            count += 1
+    return count, total / count if count else 0.0
+
+
+def write_sample_csv(filepath, rows: int, seed: int = 0) -> None:
+    """Write an id,age,name CSV shaped like data.csv with ``rows`` rows."""
+    rng = np.random.default_rng(seed)
+    with open(filepath, 'w', encoding='utf-8') as fp:
+        fp.write('"id","age","name"\n')
+        for start in range(0, rows, BLOCK_ROWS):
+            ids = np.arange(start, min(start + BLOCK_ROWS, rows)) + 1
+            ages = rng.integers(0, 100, ids.size)
+            fp.writelines(f'{i},{a},"Name{i % 1000}"\n' for i, a in zip(ids.tolist(), ages.tolist()))
+
+
+def benchmark(rows: int) -> None:
+    """Time the DictReader loop against ``aggregate_csv`` on a generated file."""
+    fd, path = tempfile.mkstemp(suffix='.csv')
+    os.close(fd)
+    try:
+        write_sample_csv(path, rows)
+        size_mb = os.path.getsize(path) / 1e6
+        print(f'{rows:,} rows, {size_mb:,.1f} MB')
+
+        start = time.perf_counter()
+        count, mean = dictreader_mean(path)
+        t_old = time.perf_counter() - start
+        print(f'DictReader loop   {t_old:8.3f} s  mean={mean:.4f}')
+
+        start = time.perf_counter()
+        stats = aggregate_csv(path, ['age'])['age']
+        t_new = time.perf_counter() - start
+        print(f'aggregate_csv     {t_new:8.3f} s  mean={stats["mean"]:.4f}')
+
+        print(f'Speedup: {t_old / t_new:.1f}x, same count: {count == stats["count"]}')
+    finally:
+        os.remove(path)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description='One-pass statistics for CSV columns.')
+    parser.add_argument('csvfile', nargs='?', default=os.path.join('..', 'data', 'data.csv'))
+    parser.add_argument('columns', nargs='*', default=['age'])
+    parser.add_argument('--block-rows', type=int, default=BLOCK_ROWS)
+    parser.add_argument('--benchmark', type=int, metavar='ROWS',
+                        help='generate a CSV with ROWS rows and compare with the DictReader loop')
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        benchmark(args.benchmark)
+        return
+    for column, stats in aggregate_csv(args.csvfile, args.columns, args.block_rows).items():
+        print(column, stats)
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print('Error:', e)
+        sys.exit(1)
@@ -85,11 +85,35 @@ if __name__ == "__main__":
 import csv
 import os
 
+from lab02_csv_stats import aggregate_csv
+
 FILENAME = "data.csv"
 DATADIR = "../data/"
 FILEPATH = os.path.join(DATADIR, FILENAME)
 
-def read_and_analyze_csv_dict(filepath):
+# Quiet, streaming version: only the requested columns are parsed, in large
+# blocks, and count/sum/mean/min/max/variance come back from a single pass
+# (see lab02_csv_stats.py). Use this for anything bigger than a lab file.
+def read_and_analyze_csv(filepath, columns=("age",)):
+    try:
+        return aggregate_csv(filepath, columns)
+    except FileNotFoundError:
+        print(f"File not found: {filepath}")
+        return None
+
+def read_and_analyze_csv_dict(filepath, verbose=False):
+    # Without verbose the row-by-row DictReader walk (and its printing) is
+    # skipped and the average comes from the streaming aggregation instead
+    if not verbose:
+        stats = read_and_analyze_csv(filepath)
+        if stats is None:
+            return None
+        if stats["age"]["count"]:
+            print(f"Average age: {stats['age']['mean']:.2f}")
+        else:
+            print("No data rows found.")
+        return stats
+
     try:
         with open(filepath, "rt") as fp:
             # DictReader uses the first row as fieldnames automatically
@@ -1,5 +1,7 @@
 import os
 
+from lab04_log_index import refresh_index, line_count, head
+
 filename = "../data/access.log.txt"
 
 if not os.path.exists(filename):
@@ -8,16 +10,13 @@ else:
     print(f"File exists: {os.path.exists(filename)}")
     print(f"File size: {os.path.getsize(filename)} bytes")
 
-    # Try reading with different methods
-    print("\n--- Using read() ---")
-    with open(filename, 'r', encoding='utf-8') as f:
-        content = f.read()
-        print(f"Content length: {len(content)}")
-        print(f"First 200 chars: {repr(content[:200])}")
-
-    print("\n--- Using readlines() ---")
-    with open(filename, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-        print(f"Number of lines: {len(lines)}")
-        if lines:
-            print(f"First line: {lines[0]}")
+    # The line-offset index (lab04_log_index.py) is built once and stored next
+    # to the log, so this no longer reads the whole file with read() and then
+    # again with readlines() just to count lines and show the first one.
+    print("\n--- Using the line index ---")
+    bounds = refresh_index(filename)
+    print(f"Number of lines: {line_count(bounds)}")
+    first = head(filename, bounds, 1)
+    if first:
+        print(f"First 200 chars: {repr(first[0][:200])}")
+        print(f"First line: {first[0]}")
@@ -4,13 +4,13 @@
 # this code will find the dates and time in a file, this will return the date/time in 
 # this format [15/Feb/2021:18:44:39]
 
-import re 
-regex = r"\[.*\]"
+# The timestamps now come from the parsed column cache (lab04_log_columns.py):
+# the log is parsed once into int64 epoch seconds and later runs only parse
+# lines appended since the last run, instead of running r"\[.*\]" over every line.
+
+from lab04_log_columns import refresh_columns, ts_to_str
+
 filename = "../data/access.log.txt" 
-with open(filename) as inputFile: 
-	for line in inputFile: 
-		foundTextList = re.findall(regex, line) 
-		if (len(foundTextList)!= 0): 
-			#print(foundTextList) 
-			foundText = foundTextList[0] 
-			print(foundText)
\ No newline at end of file
+columns = refresh_columns(filename)
+for foundText in ts_to_str(columns["ts"]):
+	print(f"[{foundText}]")
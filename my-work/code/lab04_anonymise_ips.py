@@ -3,19 +3,206 @@
 # This program anonymises the octets of IP addresses in access.log.txt
 # It Xs out the last two triplets of each IP address and writes the result to a new file
 # Author: Edward Cronin
+#
+# With no arguments it behaves as before (one line at a time, one process).
+# For big rotated logs it can split the input into line-aligned byte ranges
+# and anonymise them in a process pool, writing the results in the original
+# order, e.g.
+#     python lab04_anonymise_ips.py access.log.gz out.log.gz --workers 4 --verify
+# Gzip input is detected from the file header; output is gzipped when the
+# output name ends in .gz. --verify re-runs the serial path and checks the two
+# outputs are byte-identical.
 
-import re
+import argparse
+import gzip
+import hashlib
 import os
+import re
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 regex = r"(\d{1,3}\.\d{1,3}\.)\d{1,3}\.\d{1,3}"
 replacementText = r"\1XXX.XXX"
 filename = "../data/access.log.txt"
 outputFileName = "../data/lab04_anonymisedIPs.txt"
 
-with open(filename, encoding="utf-8") as inputFile:
-    with open(outputFileName, 'w', encoding="utf-8") as outputFile:
-        for line in inputFile:
-            newLine = re.sub(regex, replacementText, line)
-            outputFile.write(newLine)
+# compiled once; every code path below uses this object
+IP_REGEX = re.compile(regex)
+
+CHUNK_BYTES = 16 * 1024 * 1024
+
+
+def is_gzip(path):
+    with open(path, "rb") as f:
+        return f.read(2) == b"\x1f\x8b"
+
+
+def open_output(path):
+    """Binary writer for ``path``; gzipped (with a fixed mtime) if it ends in .gz."""
+    if str(path).endswith(".gz"):
+        return gzip.GzipFile(path, "wb", mtime=0)
+    return open(path, "wb")
+
+
+def anonymise_text(text):
+    return IP_REGEX.sub(replacementText, text)
+
+
+def anonymise_block(data):
+    """Anonymise a block of whole lines given as UTF-8 bytes.
+
+    Line endings are normalised the same way text mode does when reading
+    (``\\r\\n`` and ``\\r`` become ``\\n``), so the result matches the serial
+    path byte for byte.
+    """
+    text = data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+    return anonymise_text(text).encode("utf-8")
+
+
+def anonymise_serial(inputPath, outputPath):
+    """The original line-by-line loop (reads gzip input transparently)."""
+    opener = gzip.open if is_gzip(inputPath) else open
+    with opener(inputPath, "rt", encoding="utf-8") as inputFile:
+        with open_output(outputPath) as rawOutput:
+            for line in inputFile:
+                rawOutput.write(anonymise_text(line).encode("utf-8"))
+
+
+def find_chunk_ranges(path, chunkBytes=CHUNK_BYTES):
+    """Split ``path`` into ``(start, end)`` byte ranges that end on a newline."""
+    size = os.path.getsize(path)
+    ranges = []
+    with open(path, "rb") as f:
+        start = 0
+        while start < size:
+            f.seek(min(start + chunkBytes, size))
+            f.readline()              # move on to the end of the current line
+            end = min(f.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def _anonymise_range(path, start, end):
+    with open(path, "rb") as f:
+        f.seek(start)
+        return anonymise_block(f.read(end - start))
+
+
+def iter_gzip_blocks(path, chunkBytes=CHUNK_BYTES):
+    """Yield line-aligned blocks of decompressed bytes from a gzip file."""
+    carry = b""
+    with gzip.open(path, "rb") as f:
+        while True:
+            block = f.read(chunkBytes)
+            if not block:
+                break
+            block = carry + block
+            cut = block.rfind(b"\n") + 1
+            carry, block = block[cut:], block[:cut]
+            if block:
+                yield block
+    if carry:
+        yield carry
+
+
+def anonymise_parallel(inputPath, outputPath, workers=os.cpu_count(), chunkBytes=CHUNK_BYTES,
+                       progress=True):
+    """Anonymise ``inputPath`` in a process pool and write chunks in order.
+
+    Plain files are split into byte ranges which each worker reads itself.
+    Gzip input cannot be seeked cheaply, so it is decompressed here and
+    line-aligned blocks are handed to the workers instead. At most
+    ``2 * workers`` chunks are in flight, so memory stays bounded.
+    Returns ``(bytes_read, seconds)``.
+    """
+    compressed = is_gzip(inputPath)
+    total = os.path.getsize(inputPath)
+    started = time.perf_counter()
+    done = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as pool, open_output(outputPath) as out:
+        if compressed:
+            jobs = ((len(block), pool.submit(anonymise_block, block))
+                    for block in iter_gzip_blocks(inputPath, chunkBytes))
+        else:
+            jobs = ((end - start, pool.submit(_anonymise_range, inputPath, start, end))
+                    for start, end in find_chunk_ranges(inputPath, chunkBytes))
+
+        pending = deque()
+
+        def write_next():
+            nonlocal done
+            nbytes, future = pending.popleft()
+            out.write(future.result())
+            done += nbytes
+            if progress:
+                elapsed = time.perf_counter() - started
+                where = f"{done / 1e6:,.1f} MB" if compressed else f"{100 * done / max(total, 1):5.1f}%"
+                print(f"\r{where}  {done / 1e6 / max(elapsed, 1e-9):,.1f} MB/s", end="", file=sys.stderr)
+
+        for job in jobs:
+            pending.append(job)
+            if len(pending) >= 2 * workers:
+                write_next()
+        while pending:
+            write_next()
+
+    elapsed = time.perf_counter() - started
+    if progress:
+        print(file=sys.stderr)
+    return done, elapsed
+
+
+def file_digest(path):
+    """SHA-256 of the (decompressed) contents of ``path``."""
+    opener = gzip.open if is_gzip(path) else open
+    digest = hashlib.sha256()
+    with opener(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def verify_against_serial(inputPath, outputPath):
+    """Run the serial path into a temp file and compare the outputs."""
+    suffix = ".gz" if str(outputPath).endswith(".gz") else ".txt"
+    fd, serialPath = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    try:
+        anonymise_serial(inputPath, serialPath)
+        return file_digest(serialPath) == file_digest(outputPath)
+    finally:
+        os.remove(serialPath)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="X out the last two octets of every IP address.")
+    parser.add_argument("input", nargs="?", default=filename)
+    parser.add_argument("output", nargs="?", default=outputFileName)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes to use; 1 keeps the original line-by-line loop")
+    parser.add_argument("--chunk-mb", type=int, default=CHUNK_BYTES // (1024 * 1024))
+    parser.add_argument("--quiet", action="store_true", help="no progress output")
+    parser.add_argument("--verify", action="store_true",
+                        help="check the output is byte-identical to the serial path")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        nbytes, seconds = anonymise_parallel(args.input, args.output, args.workers,
+                                             args.chunk_mb * 1024 * 1024, not args.quiet)
+        print(f"Processed {nbytes / 1e6:,.1f} MB in {seconds:.2f} s "
+              f"({nbytes / 1e6 / max(seconds, 1e-9):,.1f} MB/s, {args.workers} workers)")
+    else:
+        anonymise_serial(args.input, args.output)
+
+    print(f"Anonymised IPs written to {os.path.abspath(args.output)}")
 
-print(f"Anonymised IPs written to {os.path.abspath(outputFileName)}")
+    if args.verify:
+        identical = verify_against_serial(args.input, args.output)
+        print("Byte-identical to serial output:", identical)
+        if not identical:
+            sys.exit(1)
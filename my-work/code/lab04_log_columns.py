@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""Parse access.log.txt once into typed columns, cached on disk.
+
+Author: Edward Cronin
+
+Every lab04 script used to run its own regex over the raw log text. This
+module parses each line once and keeps the fields as NumPy columns:
+
+- ``ts``       int64 seconds since 1970-01-01 (the log has no zone; read as UTC)
+- ``ip``       uint32 packed IPv4 address
+- ``method``, ``url``  int32 codes into the ``method_vocab`` / ``url_vocab`` arrays
+- ``status``   int16 HTTP status, ``size`` int64 bytes (-1 for "-")
+- ``trailing`` int64 digits at the end of the line (-1 if none)
+- query variables as a ragged list: row ``i`` owns
+  ``qvar_name[qvar_offsets[i]:qvar_offsets[i + 1]]`` (and the matching
+  ``qvar_value``), both codes into ``qname_vocab`` / ``qvalue_vocab``.
+
+The columns are saved as `<log>.columns.npz`, together with the log size
+and mtime they were built from and a hash of the first and last bytes that
+were parsed. When the log has only grown, the lines after the last parsed
+byte are parsed and appended; if it shrank, or those bytes changed (the log
+was rotated or rewritten), the cache is rebuilt. Each block's arrays are
+collected and concatenated once at the end, and vocabulary codes are handed
+out incrementally in first-seen order, so a refresh costs O(new bytes).
+Queries then run vectorised over the arrays instead of re-reading the text.
+
+Run from `my-work/code` like:
+    python lab04_log_columns.py ../data/access.log.txt
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from pathlib import Path
+
+import numpy as np
+
+FILENAME = '../data/access.log.txt'
+CHUNK_BYTES = 8 * 1024 * 1024
+FINGERPRINT_BYTES = 4096
+CACHE_VERSION = 2
+
+MONTHS = {m: i for i, m in enumerate(
+    ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], 1)}
+
+# 199.15.1.2 - - [15/Feb/2021:18:24:31] "GET /cart.do?action=view HTTP 1.1" 200 3033 "..." "..." 177
+LINE_REGEX = re.compile(
+    r'^(\d{1,3})\.(\d{1,3})\.(\d{1,3})\.(\d{1,3}) \S+ \S+ '
+    r'\[(\d{2})/(\w{3})/(\d{4}):(\d{2}):(\d{2}):(\d{2})[^\]]*\] '
+    r'"(\S+) ([^ "?]*)(?:\?([^ "]*))?[^"]*" (\d{3}) (\d+|-)'
+    r'.*?(\d*)$', re.MULTILINE)
+
+ROW_KEYS = ('ts', 'ip', 'status', 'size', 'trailing')
+VOCABS = {'method': 'method_vocab', 'url': 'url_vocab',
+          'qvar_name': 'qname_vocab', 'qvar_value': 'qvalue_vocab'}
+
+
+def cache_path(logpath) -> Path:
+    return Path(str(logpath) + '.columns.npz')
+
+
+def _encode(values: list[str], vocab: dict[str, int]) -> np.ndarray:
+    """Codes for ``values``; unseen values are added to ``vocab`` with the next code."""
+    return np.fromiter((vocab.setdefault(v, len(vocab)) for v in values), np.int32, len(values))
+
+
+def _fingerprint(logpath, parsed_bytes: int) -> str:
+    """Hash of the first and last bytes parsed, used to spot a rotated or rewritten log."""
+    digest = hashlib.sha256()
+    with open(logpath, 'rb') as f:
+        digest.update(f.read(min(parsed_bytes, FINGERPRINT_BYTES)))
+        f.seek(max(parsed_bytes - FINGERPRINT_BYTES, 0))
+        digest.update(f.read(min(parsed_bytes, FINGERPRINT_BYTES)))
+    return digest.hexdigest()
+
+
+def empty_columns() -> dict[str, np.ndarray]:
+    return {
+        'ts': np.empty(0, np.int64), 'ip': np.empty(0, np.uint32),
+        'method': np.empty(0, np.int32), 'url': np.empty(0, np.int32),
+        'status': np.empty(0, np.int16), 'size': np.empty(0, np.int64),
+        'trailing': np.empty(0, np.int64),
+        'qvar_offsets': np.zeros(1, np.int64),
+        'qvar_name': np.empty(0, np.int32), 'qvar_value': np.empty(0, np.int32),
+        'method_vocab': np.empty(0, str), 'url_vocab': np.empty(0, str),
+        'qname_vocab': np.empty(0, str), 'qvalue_vocab': np.empty(0, str),
+    }
+
+
+def parse_text(text: str) -> dict:
+    """Parse whole lines of log text into raw columns (codes not assigned yet).
+
+    Lines that do not look like access-log lines are skipped and counted
+    under ``skipped``.
+    """
+    rows = LINE_REGEX.findall(text)
+    n = len(rows)
+    out = {'skipped': text.count('\n') - n}   # blocks always hold whole lines
+    if not n:
+        out.update(ts=np.empty(0, np.int64), ip=np.empty(0, np.uint32), method=[], url=[],
+                   status=np.empty(0, np.int16), size=np.empty(0, np.int64),
+                   trailing=np.empty(0, np.int64), qvar_counts=np.empty(0, np.int64),
+                   qvar_name=[], qvar_value=[])
+        return out
+
+    (a, b, c, d, day, mon, year, hh, mm, ss,
+     method, url, query, status, size, trailing) = zip(*rows)
+
+    octets = [np.array(x, dtype=np.uint32) for x in (a, b, c, d)]
+    out['ip'] = (octets[0] << 24) | (octets[1] << 16) | (octets[2] << 8) | octets[3]
+
+    months = np.array([MONTHS.get(m, 1) for m in mon], dtype=np.int64)
+    years = np.array(year, dtype=np.int64)
+    month_index = ((years - 1970) * 12 + months - 1).astype('datetime64[M]')
+    days = month_index.astype('datetime64[D]') + (np.array(day, dtype=np.int64) - 1)
+    out['ts'] = (days.astype(np.int64) * 86400
+                 + np.array(hh, dtype=np.int64) * 3600
+                 + np.array(mm, dtype=np.int64) * 60
+                 + np.array(ss, dtype=np.int64))
+
+    out['method'] = list(method)
+    out['url'] = list(url)
+    out['status'] = np.array(status, dtype=np.int16)
+    out['size'] = np.array([-1 if s == '-' else int(s) for s in size], dtype=np.int64)
+    out['trailing'] = np.array([int(t) if t else -1 for t in trailing], dtype=np.int64)
+
+    names, values, counts = [], [], []
+    for q in query:
+        pairs = [p.partition('=') for p in q.split('&') if p] if q else []
+        counts.append(len(pairs))
+        for name, _, value in pairs:
+            names.append(name)
+            values.append(value)
+    out['qvar_counts'] = np.array(counts, dtype=np.int64)
+    out['qvar_name'] = names
+    out['qvar_value'] = values
+    return out
+
+
+class ColumnBuilder:
+    """Accumulates ``parse_text`` blocks onto existing columns.
+
+    Blocks are kept as lists of arrays and joined once by ``columns()``;
+    vocabularies are dicts, so existing codes never change and a new block
+    only encodes its own values.
+    """
+
+    def __init__(self, columns: dict):
+        self.parts = {key: [columns[key]] for key in (*ROW_KEYS, *VOCABS)}
+        self.vocabs = {key: {v: i for i, v in enumerate(columns[vocab_key].tolist())}
+                       for key, vocab_key in VOCABS.items()}
+        self.qvar_offsets = columns['qvar_offsets']
+        self.qvar_counts = []
+
+    def append(self, parsed: dict) -> None:
+        for key in ROW_KEYS:
+            self.parts[key].append(parsed[key])
+        for key in VOCABS:
+            self.parts[key].append(_encode(parsed[key], self.vocabs[key]))
+        self.qvar_counts.append(parsed['qvar_counts'])
+
+    def columns(self) -> dict[str, np.ndarray]:
+        empty = empty_columns()
+        cols = {key: np.concatenate(parts).astype(empty[key].dtype, copy=False)
+                for key, parts in self.parts.items()}
+        for key, vocab_key in VOCABS.items():
+            cols[vocab_key] = np.array(list(self.vocabs[key]), dtype=str)
+        counts = np.concatenate([np.empty(0, np.int64), *self.qvar_counts])
+        offsets = self.qvar_offsets
+        cols['qvar_offsets'] = np.concatenate([offsets, offsets[-1] + np.cumsum(counts)])
+        return cols
+
+
+def _iter_blocks(logpath, start: int, chunk_bytes: int = CHUNK_BYTES):
+    """Yield ``(text, end_offset)`` for whole lines from byte ``start`` on.
+
+    A final line without a newline is left for the next refresh.
+    """
+    with open(logpath, 'rb') as f:
+        f.seek(start)
+        pos, carry = start, b''
+        while True:
+            block = f.read(chunk_bytes)
+            if not block:
+                break
+            block = carry + block
+            cut = block.rfind(b'\n') + 1
+            carry, block = block[cut:], block[:cut]
+            if block:
+                pos += len(block)
+                yield block.decode('utf-8', errors='replace'), pos
+
+
+def load_columns(logpath):
+    """Return ``(meta, columns)`` from the cache file, or None."""
+    path = cache_path(logpath)
+    if not path.exists():
+        return None
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data['meta']))
+        if meta.get('version') != CACHE_VERSION:
+            return None
+        return meta, {k: data[k] for k in data.files if k != 'meta'}
+
+
+def save_columns(logpath, meta: dict, columns: dict) -> None:
+    path = cache_path(logpath)
+    tmp = path.with_name(path.name + '.tmp.npz')
+    np.savez(tmp, meta=np.array(json.dumps(meta)), **columns)
+    os.replace(tmp, path)
+
+
+def refresh_columns(logpath, chunk_bytes: int = CHUNK_BYTES) -> dict[str, np.ndarray]:
+    """Load the cached columns, parsing only what changed since last time.
+
+    The cache is a hit when the log size and mtime match. If the log grew,
+    only the bytes after the last parsed line are parsed; if it shrank or
+    the bytes already parsed changed, everything is parsed again.
+    """
+    st = os.stat(logpath)
+    cached = load_columns(logpath)
+    if cached is not None:
+        meta, columns = cached
+        if meta['size'] == st.st_size and meta['mtime_ns'] == st.st_mtime_ns:
+            return columns
+        if (meta['parsed_bytes'] > st.st_size
+                or meta['fingerprint'] != _fingerprint(logpath, meta['parsed_bytes'])):
+            cached = None
+    if cached is None:
+        meta = {'version': CACHE_VERSION, 'parsed_bytes': 0, 'skipped': 0}
+        columns = empty_columns()
+
+    builder = ColumnBuilder(columns)
+    for text, end in _iter_blocks(logpath, meta['parsed_bytes'], chunk_bytes):
+        parsed = parse_text(text)
+        builder.append(parsed)
+        meta['parsed_bytes'] = end
+        meta['skipped'] += parsed['skipped']
+    columns = builder.columns()
+
+    meta.update(size=st.st_size, mtime_ns=st.st_mtime_ns,
+                fingerprint=_fingerprint(logpath, meta['parsed_bytes']))
+    save_columns(logpath, meta, columns)
+    return columns
+
+
+# ---- vectorised queries over the columns ----------------------------------
+
+def ip_to_str(packed) -> list[str]:
+    packed = np.asarray(packed, dtype=np.uint32)
+    octets = [(packed >> s) & 255 for s in (24, 16, 8, 0)]
+    return ['.'.join(map(str, o)) for o in zip(*(x.tolist() for x in octets))]
+
+
+def ts_to_str(ts) -> list[str]:
+    """Format epoch seconds the way the log does: 15/Feb/2021:18:24:31."""
+    stamps = np.asarray(ts, dtype='datetime64[s]').astype(object)
+    return [t.strftime('%d/%b/%Y:%H:%M:%S') for t in stamps]
+
+
+def time_mask(columns: dict, start: str, end: str) -> np.ndarray:
+    """Rows with ``start <= ts < end`` (ISO strings such as '2021-02-15T18:00')."""
+    lo = np.datetime64(start, 's').astype(np.int64)
+    hi = np.datetime64(end, 's').astype(np.int64)
+    return (columns['ts'] >= lo) & (columns['ts'] < hi)
+
+
+def requests_per_ip(columns: dict, top: int = 10) -> list[tuple[str, int]]:
+    ips, counts = np.unique(columns['ip'], return_counts=True)
+    order = np.argsort(counts)[::-1][:top]
+    return list(zip(ip_to_str(ips[order]), counts[order].tolist()))
+
+
+def requests_per_url(columns: dict, top: int = 10) -> list[tuple[str, int]]:
+    counts = np.bincount(columns['url'], minlength=len(columns['url_vocab']))
+    order = np.argsort(counts)[::-1][:top]
+    return list(zip(columns['url_vocab'][order].tolist(), counts[order].tolist()))
+
+
+def query_var_counts(columns: dict) -> dict[str, int]:
+    counts = np.bincount(columns['qvar_name'], minlength=len(columns['qname_vocab']))
+    return dict(zip(columns['qname_vocab'].tolist(), counts.tolist()))
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description='Parse an access log once and summarise it.')
+    parser.add_argument('logfile', nargs='?', default=FILENAME)
+    parser.add_argument('--top', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if not Path(args.logfile).exists():
+        raise FileNotFoundError(f'File not found: {args.logfile}')
+    cols = refresh_columns(args.logfile)
+    n = len(cols['ts'])
+    print(f'Parsed rows: {n}')
+    if not n:
+        return
+    first, last = ts_to_str([cols['ts'].min(), cols['ts'].max()])
+    print(f'Time span: [{first}] .. [{last}]')
+    print(f'Distinct IPs: {len(np.unique(cols["ip"]))}')
+    print(f'Lines ending in digits: {int((cols["trailing"] >= 0).sum())}')
+    print('Top IPs:', requests_per_ip(cols, args.top))
+    print('Top URLs:', requests_per_url(cols, args.top))
+    print('Query variables:', query_var_counts(cols))
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print('Error:', e)
+        sys.exit(1)
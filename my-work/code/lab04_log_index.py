@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""Persistent line-offset index for access.log.txt.
+
+Author: Edward Cronin
+
+The inspection scripts used to read the whole log with `read()` and again
+with `readlines()` just to report its size, line count and first line. This
+module scans the log once, block by block with NumPy, and stores the byte
+offset at which every line ends as little-endian uint64 next to the log as
+`<log>.idx`. Later runs only `stat()` the log: if it has grown, just the
+appended bytes are scanned and their offsets appended to the index; if it
+was truncated or rotated (the first bytes changed) the index is rebuilt.
+The index itself is memory-mapped, so line count, head, tail and "line N"
+are O(1): they read only the offsets and the bytes of the lines asked for.
+Lines are split on `\n` bytes only (a lone `\r` is not a line break here).
+
+Run from `my-work/code` like:
+    python lab04_log_index.py ../data/access.log.txt --head 3 --tail 3 --line 100
+"""
+
+import argparse
+import hashlib
+import os
+import struct
+import sys
+from pathlib import Path
+
+import numpy as np
+
+FILENAME = '../data/access.log.txt'
+MAGIC = b'LOGIDX01'
+HEADER = struct.Struct('<8sQQ32s')   # magic, indexed bytes, line count, prefix hash
+OFFSET = np.dtype('<u8')
+PREFIX_BYTES = 4096
+BLOCK_BYTES = 64 * 1024 * 1024
+
+
+def index_path(logpath) -> Path:
+    return Path(str(logpath) + '.idx')
+
+
+def _prefix_hash(log: np.ndarray, indexed: int) -> bytes:
+    """Hash of the first bytes of the log, used to spot truncation or rotation."""
+    return hashlib.sha256(log[:min(indexed, PREFIX_BYTES)].tobytes()).digest()
+
+
+def _scan_line_ends(log: np.ndarray, start: int, out) -> tuple[int, int]:
+    """Write the offset just past every newline from ``start`` to ``out``; return (last offset, count)."""
+    last, count = start, 0
+    for pos in range(start, len(log), BLOCK_BYTES):
+        ends = np.flatnonzero(log[pos:pos + BLOCK_BYTES] == 10).astype(OFFSET)
+        if len(ends):
+            ends += pos + 1
+            out.write(ends.tobytes())
+            last, count = int(ends[-1]), count + len(ends)
+    return last, count
+
+
+def _read_header(idx: Path) -> tuple[int, int, bytes] | None:
+    """``(indexed_bytes, line_count, prefix_hash)`` of a complete index file, or None."""
+    if not idx.exists():
+        return None
+    with open(idx, 'rb') as f:
+        raw = f.read(HEADER.size)
+    if len(raw) < HEADER.size:
+        return None
+    magic, indexed, count, prefix = HEADER.unpack(raw)
+    if magic != MAGIC or idx.stat().st_size < HEADER.size + count * OFFSET.itemsize:
+        return None
+    return indexed, count, prefix
+
+
+def load_index(logpath) -> tuple[int, bytes, np.ndarray] | None:
+    """Open ``<log>.idx``; returns ``(indexed_bytes, prefix_hash, line_ends)`` or None.
+
+    ``line_ends`` is a read-only memory map of the stored offsets, so only
+    the entries actually indexed are read from disk.
+    """
+    idx = index_path(logpath)
+    header = _read_header(idx)
+    if header is None:
+        return None
+    indexed, count, prefix = header
+    if not count:
+        return indexed, prefix, np.empty(0, dtype=OFFSET)
+    return indexed, prefix, np.memmap(idx, dtype=OFFSET, mode='r', offset=HEADER.size, shape=(count,))
+
+
+class LineBounds:
+    """Line boundaries over a memory-mapped index.
+
+    ``bounds[0] == 0`` and ``bounds[i + 1]`` is the end offset of line ``i``,
+    so line ``i`` is ``bounds[i]:bounds[i + 1]``. A final line without a
+    trailing newline ends at ``size``.
+    """
+
+    def __init__(self, ends: np.ndarray, size: int):
+        self.ends = ends
+        self.size = size
+        last = int(ends[-1]) if len(ends) else 0
+        self.partial = last < size
+
+    def __len__(self) -> int:
+        return len(self.ends) + 1 + self.partial
+
+    def __getitem__(self, i: int) -> int:
+        if i == 0:
+            return 0
+        if i <= len(self.ends):
+            return int(self.ends[i - 1])
+        if self.partial and i == len(self.ends) + 1:
+            return self.size
+        raise IndexError(i)
+
+
+def refresh_index(logpath) -> LineBounds:
+    """Bring the index up to date and return the line boundaries.
+
+    Only bytes past the indexed end are scanned; their offsets are appended
+    to ``<log>.idx`` and the header rewritten last, so an interrupted update
+    leaves the previous index valid. A final line without a trailing
+    newline is included but not persisted, because it may still be growing.
+    """
+    size = os.path.getsize(logpath)
+    if size == 0:
+        return LineBounds(np.empty(0, dtype=OFFSET), 0)
+
+    idx = index_path(logpath)
+    log = np.memmap(logpath, dtype=np.uint8, mode='r')
+    header = _read_header(idx)
+    # keep the stored offsets unless the log was truncated or rotated
+    if header is not None and header[0] <= size and _prefix_hash(log, header[0]) == header[2]:
+        indexed, count, _ = header
+        if indexed < size:
+            with open(idx, 'r+b') as f:
+                f.truncate(HEADER.size + count * OFFSET.itemsize)
+                f.seek(0, os.SEEK_END)
+                new_indexed, added = _scan_line_ends(log, indexed, f)
+                if new_indexed != indexed:
+                    f.seek(0)
+                    f.write(HEADER.pack(MAGIC, new_indexed, count + added, _prefix_hash(log, new_indexed)))
+    else:
+        tmp = idx.with_name(idx.name + '.tmp')
+        with open(tmp, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, 0, 0, bytes(32)))
+            indexed, count = _scan_line_ends(log, 0, f)
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, indexed, count, _prefix_hash(log, indexed)))
+        os.replace(tmp, idx)
+    del log
+
+    _, _, ends = load_index(logpath)
+    return LineBounds(ends, size)
+
+
+def line_count(bounds: LineBounds) -> int:
+    return len(bounds) - 1
+
+
+def get_lines(logpath, bounds: LineBounds, start: int, stop: int | None = None,
+              encoding: str = 'utf-8') -> list[str]:
+    """Lines ``start:stop`` (Python slice rules, negatives allowed) as text."""
+    lines = range(line_count(bounds))[start:stop]
+    if not lines:
+        return []
+    offsets = [bounds[i] for i in range(lines[0], lines[-1] + 2)]
+    with open(logpath, 'rb') as f:
+        f.seek(offsets[0])
+        data = f.read(offsets[-1] - offsets[0])
+    base = offsets[0]
+    return [data[a - base:b - base].decode(encoding) for a, b in zip(offsets, offsets[1:])]
+
+
+def get_line(logpath, bounds: LineBounds, n: int, encoding: str = 'utf-8') -> str:
+    """Line ``n`` (0-based, negatives count from the end)."""
+    total = line_count(bounds)
+    if not -total <= n < total:
+        raise IndexError(f'line {n} out of range (file has {total} lines)')
+    n %= total
+    return get_lines(logpath, bounds, n, n + 1, encoding)[0]
+
+
+def head(logpath, bounds: LineBounds, k: int = 10) -> list[str]:
+    return get_lines(logpath, bounds, 0, k)
+
+
+def tail(logpath, bounds: LineBounds, k: int = 10) -> list[str]:
+    return get_lines(logpath, bounds, -k) if k else []
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description='Inspect a log through its line-offset index.')
+    parser.add_argument('logfile', nargs='?', default=FILENAME)
+    parser.add_argument('--head', type=int, default=1, help='print the first K lines')
+    parser.add_argument('--tail', type=int, default=0, help='print the last K lines')
+    parser.add_argument('--line', type=int, action='append', default=[], help='print line N (0-based)')
+    args = parser.parse_args(argv)
+
+    if not Path(args.logfile).exists():
+        raise FileNotFoundError(f'File not found: {args.logfile}')
+    bounds = refresh_index(args.logfile)
+    print(f'File size: {os.path.getsize(args.logfile)} bytes')
+    print(f'Number of lines: {line_count(bounds)}')
+    for i, line in enumerate(head(args.logfile, bounds, args.head)):
+        print(f'head[{i}]: {line!r}')
+    for line in tail(args.logfile, bounds, args.tail):
+        print(f'tail: {line!r}')
+    for n in args.line:
+        print(f'line {n}: {get_line(args.logfile, bounds, n)!r}')
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print('Error:', e)
+        sys.exit(1)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""Single-pass multi-pattern scanner for access.log.txt.
+
+Author: Edward Cronin
+
+`lab04_regex_tests.py` used to read the whole log with `readlines()` and then
+loop over every line once per pattern. This module compiles all the patterns
+once, streams the file a single time in large chunks (cut on line
+boundaries) and runs each compiled pattern over the whole chunk. It returns,
+per pattern, the total number of matches and a bounded sample of the first
+matches, so memory stays constant however big the log is.
+
+Patterns are compiled with re.MULTILINE so that `^` and `$` still behave as
+they did on single lines. Patterns that can match a newline themselves
+(for example `\\s` or a negated class such as `[^x]`) may span two lines.
+
+Run from `my-work/code` like:
+    python lab04_log_scanner.py ../data/access.log.txt
+    python lab04_log_scanner.py ../data/access.log.txt --benchmark
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+FILENAME = '../data/access.log.txt'
+CHUNK_SIZE = 4 * 1024 * 1024   # characters per read
+SAMPLE_SIZE = 10
+
+
+def compile_patterns(patterns: list[tuple[str, str]]) -> list[tuple[str, re.Pattern]]:
+    """Compile ``(label, regex)`` pairs once, in multiline mode."""
+    return [(label, re.compile(regex, re.MULTILINE)) for label, regex in patterns]
+
+
+def iter_line_chunks(filepath, chunk_size: int = CHUNK_SIZE, encoding: str = 'utf-8'):
+    """Yield blocks of text from ``filepath`` that always end on a line break.
+
+    The trailing partial line of each read is carried over to the next block,
+    so no line is ever split between two chunks. The last block is yielded as
+    is, even if the file does not end with a newline.
+    """
+    carry = ''
+    with open(filepath, encoding=encoding) as fp:
+        while True:
+            block = fp.read(chunk_size)
+            if not block:
+                break
+            block = carry + block
+            cut = block.rfind('\n') + 1
+            if cut == 0:
+                # no newline yet: keep reading until the line is complete
+                carry = block
+                continue
+            carry = block[cut:]
+            yield block[:cut]
+    if carry:
+        yield carry
+
+
+def _scan_chunk(chunk: str, compiled, sample_size: int) -> list[tuple[int, list]]:
+    """Match every compiled pattern against one chunk: (count, samples) each."""
+    out = []
+    for _, rx in compiled:
+        found = rx.findall(chunk)
+        out.append((len(found), found[:sample_size]))
+    return out
+
+
+def _scan_chunks_parallel(chunks, compiled, sample_size: int, workers: int):
+    """Yield ``_scan_chunk`` results in file order from a process pool.
+
+    At most ``2 * workers`` chunks are in flight at once so memory stays
+    bounded by the chunk size rather than the file size.
+    """
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_scan_chunk, chunk, compiled, sample_size))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def scan_log(filepath, patterns, sample_size: int = SAMPLE_SIZE,
+             chunk_size: int = CHUNK_SIZE, workers: int = 1) -> dict[str, dict]:
+    """Scan ``filepath`` once and match every pattern against it.
+
+    ``patterns`` is a list of ``(label, regex)`` pairs, either as strings or
+    already compiled by ``compile_patterns``. Returns a dict keyed by label
+    with ``pattern``, ``count`` (all matches in the file) and ``samples``
+    (the first ``sample_size`` matches, as ``re.findall`` would return them).
+
+    Python's regex engine is usually the bottleneck rather than the disk, so
+    ``workers > 1`` spreads the chunks over a process pool; results are
+    merged in file order and are identical to the serial scan.
+    """
+    compiled = [(label, rx if isinstance(rx, re.Pattern) else re.compile(rx, re.MULTILINE))
+                for label, rx in patterns]
+    results = {label: {'pattern': rx.pattern, 'count': 0, 'samples': []}
+               for label, rx in compiled}
+
+    chunks = iter_line_chunks(filepath, chunk_size)
+    if workers > 1:
+        per_chunk = _scan_chunks_parallel(chunks, compiled, sample_size, workers)
+    else:
+        per_chunk = (_scan_chunk(chunk, compiled, sample_size) for chunk in chunks)
+
+    for chunk_result in per_chunk:
+        for (label, _), (count, found) in zip(compiled, chunk_result):
+            res = results[label]
+            res['count'] += count
+            missing = sample_size - len(res['samples'])
+            if missing > 0 and found:
+                res['samples'].extend(found[:missing])
+    return results
+
+
+def legacy_scan(filepath, patterns) -> dict[str, int]:
+    """The old approach: readlines() then one full pass per pattern.
+
+    Kept only as the baseline for ``benchmark``; it counts every match so the
+    two approaches do the same amount of work.
+    """
+    with open(filepath, encoding='utf-8') as f:
+        lines = f.readlines()
+    counts = {}
+    for label, regex in patterns:
+        compiled = re.compile(regex)
+        counts[label] = sum(len(compiled.findall(line)) for line in lines)
+    return counts
+
+
+def benchmark(filepath, patterns, repeat: int = 3, workers: int = 1) -> None:
+    """Time ``legacy_scan`` against ``scan_log`` and print MB/s for each."""
+    size_mb = Path(filepath).stat().st_size / 1e6
+    timings = {}
+    for name, func in (('per-pattern loops', lambda: legacy_scan(filepath, patterns)),
+                       ('single-pass scan', lambda: scan_log(filepath, patterns, workers=workers))):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+        print(f'{name:<20} {best:8.3f} s  {size_mb / best:8.1f} MB/s')
+
+    legacy = legacy_scan(filepath, patterns)
+    single = {label: r['count'] for label, r in scan_log(filepath, patterns, workers=workers).items()}
+    print('Counts identical:', legacy == single)
+    print(f"Speedup: {timings['per-pattern loops'] / timings['single-pass scan']:.1f}x")
+
+
+def print_results(results: dict[str, dict]) -> None:
+    for label, res in results.items():
+        print(f"\n{label}\nPattern: {res['pattern']}")
+        print('-' * 60)
+        if res['samples']:
+            for m in res['samples']:
+                print(m)
+            if res['count'] > len(res['samples']):
+                print(f"...and {res['count'] - len(res['samples'])} more matches")
+        else:
+            print('(No matches)')
+
+
+def main(argv=None) -> None:
+    # imported here so the pattern list lives in one place
+    from lab04_regex_tests import patterns
+
+    parser = argparse.ArgumentParser(description='Scan an access log once for all lab04 patterns.')
+    parser.add_argument('logfile', nargs='?', default=FILENAME)
+    parser.add_argument('--samples', type=int, default=SAMPLE_SIZE, help='matches to keep per pattern')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='characters per read')
+    parser.add_argument('--workers', type=int, default=1, help='processes to scan chunks with')
+    parser.add_argument('--benchmark', action='store_true', help='compare with the per-pattern loops')
+    args = parser.parse_args(argv)
+
+    if not Path(args.logfile).exists():
+        raise FileNotFoundError(f'File not found: {args.logfile}')
+    if args.benchmark:
+        benchmark(args.logfile, patterns, workers=args.workers)
+    else:
+        print_results(scan_log(args.logfile, patterns, args.samples, args.chunk_size, args.workers))
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print('Error:', e)
+        sys.exit(1)
@@ -1,7 +1,7 @@
 # Test various regex patterns on access.log.txt
 # Author: Edward Cronin (adapted)
 
-import re
+from lab04_log_scanner import scan_log, print_results
 
 filename = "../data/access.log.txt"
 
@@ -26,27 +26,11 @@ patterns = [
     ("i. All IP addresses", r"\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}"),
 ]
 
-try:
-    with open(filename, encoding="utf-8") as f:
-        lines = f.readlines()
-
-    for label, regex in patterns:
-        print(f"\n{label}\nPattern: {regex}")
-        print("-" * 60)
-        compiled = re.compile(regex)
-        matches = []
-        for line in lines:
-            found = compiled.findall(line)
-            if found:
-                matches.extend(found)
-            if len(matches) >= 10:
-                break
-        if matches:
-            for m in matches[:10]:
-                print(m)
-            if len(matches) > 10:
-                print(f"...and {len(matches)-10} more matches")
-        else:
-            print("(No matches)")
-except Exception as e:
-    print(f"Error: {e}")
+if __name__ == "__main__":
+    # All patterns are matched in one streaming pass over the file
+    # (see lab04_log_scanner.py) instead of one pass per pattern.
+    try:
+        results = scan_log(filename, patterns, sample_size=10)
+        print_results(results)
+    except Exception as e:
+        print(f"Error: {e}")
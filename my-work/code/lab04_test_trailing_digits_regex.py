@@ -7,6 +7,9 @@
 import re
 import os
 
+from lab04_log_index import refresh_index, line_count, head
+from lab04_log_scanner import iter_line_chunks
+
 # Test the regex
 regex = r"\d+$"
 filename = "../data/access.log.txt"
@@ -14,25 +17,27 @@ filename = "../data/access.log.txt"
 if not os.path.exists(filename):
     print(f"File not found: {filename}")
 else:
-    with open(filename, encoding='utf-8') as inputFile:
-        lines = inputFile.readlines()
-        print(f"Total lines: {len(lines)}")
-        if not lines:
-            print("File is empty.")
-        else:
-            # Check first line
-            first_line = lines[0]
-            print(f"\nFirst line: {repr(first_line)}")
-            print(f"First line ends with: {repr(first_line[-20:])}")
-            # Test regex
-            result = re.findall(regex, first_line)
-            print(f"Regex match on first line: {result}")
-            # Try without newline
-            result2 = re.findall(regex, first_line.strip())
-            print(f"Regex match on stripped line: {result2}")
-            # Count matches
-            count = 0
-            for line in lines:
-                if re.findall(regex, line.strip()):
-                    count += 1
-            print(f"\nTotal matches with strip(): {count}")
+    # line count and first line come from the line-offset index, so the file
+    # is not loaded into memory; only the final count streams through it
+    bounds = refresh_index(filename)
+    print(f"Total lines: {line_count(bounds)}")
+    if not line_count(bounds):
+        print("File is empty.")
+    else:
+        # Check first line
+        first_line = head(filename, bounds, 1)[0]
+        print(f"\nFirst line: {repr(first_line)}")
+        print(f"First line ends with: {repr(first_line[-20:])}")
+        # Test regex
+        result = re.findall(regex, first_line)
+        print(f"Regex match on first line: {result}")
+        # Try without newline
+        result2 = re.findall(regex, first_line.strip())
+        print(f"Regex match on stripped line: {result2}")
+        # Count matches: a digit followed only by whitespace up to the end of
+        # the line is the same test as findall(regex, line.strip())
+        stripped_regex = re.compile(r"\d[^\S\n]*$", re.MULTILINE)
+        count = 0
+        for chunk in iter_line_chunks(filename):
+            count += len(stripped_regex.findall(chunk))
+        print(f"\nTotal matches with strip(): {count}")
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""Data access layer for the lab08 `book` table.
+
+Author: Edward Cronin
+
+The lab08 scripts each open their own `sqlite3.connect("pfda.db")` with the
+default rollback journal, insert one row per transaction and then
+`SELECT *` the whole table to show the result. This module is the one place
+they go through instead:
+
+- connections come from a small per-database pool, are opened once with WAL
+  journaling and tuned pragmas, and are handed back after use;
+- `insert_books` loads any iterable of rows with `executemany` in batches,
+  all inside one transaction, and `import_file` feeds it straight from a
+  CSV or JSONL file without reading the file into memory;
+- `iter_books` streams rows with `fetchmany`, so callers print or process
+  the table a block at a time instead of materialising it.
+
+Run from `my-work/code` like:
+    python lab08_book_repo.py --import books.csv
+    python lab08_book_repo.py --benchmark 10000000
+"""
+
+import argparse
+import csv
+import json
+import os
+import queue
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+DB_PATH = 'pfda.db'
+BATCH_ROWS = 50_000
+FETCH_ROWS = 10_000
+POOL_SIZE = 4
+COLUMNS = ('title', 'author', 'ISBN')
+
+PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',     # safe with WAL, fsync only at checkpoints
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA cache_size = -65536',      # 64 MiB page cache
+    'PRAGMA mmap_size = 268435456',    # 256 MiB memory-mapped reads
+    'PRAGMA busy_timeout = 5000',
+    'PRAGMA recursive_triggers = ON',  # so INSERT OR REPLACE fires delete triggers
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS book (
+    title TEXT,
+    author TEXT,
+    ISBN TEXT PRIMARY KEY
+)
+"""
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    # autocommit mode: transactions are opened explicitly by transaction()
+    con = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+    for pragma in PRAGMAS:
+        con.execute(pragma)
+    return con
+
+
+class ConnectionPool:
+    """A fixed-size pool of configured connections to one database file."""
+
+    def __init__(self, db_path: str, size: int = POOL_SIZE):
+        self.db_path = db_path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._opened < self.size:
+                self._opened += 1
+                return _connect(self.db_path)
+        return self._idle.get()
+
+    def release(self, con: sqlite3.Connection) -> None:
+        if con.in_transaction:
+            con.rollback()
+        self._idle.put(con)
+
+    def close(self) -> None:
+        with self._lock:
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+            self._opened = 0
+
+
+_pools: dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path=DB_PATH) -> ConnectionPool:
+    """The shared pool for ``db_path``; the schema is created on first use."""
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(key)
+            con = pool.acquire()
+            try:
+                create_schema(con)
+            finally:
+                pool.release(con)
+    return pool
+
+
+def close_pools() -> None:
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+@contextmanager
+def connection(db_path=DB_PATH):
+    """Borrow a pooled connection for the duration of a ``with`` block."""
+    pool = get_pool(db_path)
+    con = pool.acquire()
+    try:
+        yield con
+    finally:
+        pool.release(con)
+
+
+@contextmanager
+def transaction(db_path=DB_PATH):
+    """A pooled connection inside BEGIN ... COMMIT (rolled back on error)."""
+    with connection(db_path) as con:
+        con.execute('BEGIN IMMEDIATE')
+        try:
+            yield con
+        except BaseException:
+            con.rollback()
+            raise
+        con.commit()
+
+
+def create_schema(con: sqlite3.Connection) -> None:
+    """Create the book table if needed.
+
+    Tables made by the original lab08_createbooktable.py have no primary key,
+    so they get a unique index on ISBN (a plain one if duplicates are already
+    stored) to keep lookups from scanning.
+    """
+    con.execute(SCHEMA)
+    columns = con.execute('PRAGMA table_info(book)').fetchall()
+    if not any(col[1] == 'ISBN' and col[5] for col in columns):
+        try:
+            con.execute('CREATE UNIQUE INDEX IF NOT EXISTS book_isbn ON book(ISBN)')
+        except sqlite3.IntegrityError:
+            con.execute('CREATE INDEX IF NOT EXISTS book_isbn ON book(ISBN)')
+
+
+def _as_tuple(row) -> tuple:
+    if isinstance(row, dict):
+        return tuple(row.get(c) for c in COLUMNS)
+    return tuple(row)
+
+
+def insert_books(rows, db_path=DB_PATH, batch_rows: int = BATCH_ROWS, replace: bool = False) -> int:
+    """Insert ``rows`` ((title, author, ISBN) tuples or dicts) in one transaction.
+
+    Rows are sent to ``executemany`` ``batch_rows`` at a time, so any iterable
+    (including a generator over a huge file) can be loaded with bounded
+    memory. Existing ISBNs are skipped, or overwritten if ``replace``.
+    Returns the number of rows actually written (from each batch's
+    ``rowcount``, which unlike ``total_changes`` leaves out rows written by
+    triggers such as the search index ones).
+    """
+    verb = 'INSERT OR REPLACE' if replace else 'INSERT OR IGNORE'
+    sql = f'{verb} INTO book (title, author, ISBN) VALUES (?, ?, ?)'
+    written = 0
+    with transaction(db_path) as con:
+        batch = []
+        for row in rows:
+            batch.append(_as_tuple(row))
+            if len(batch) >= batch_rows:
+                written += con.executemany(sql, batch).rowcount
+                batch.clear()
+        if batch:
+            written += con.executemany(sql, batch).rowcount
+    return written
+
+
+def insert_book(title: str, author: str, isbn: str, db_path=DB_PATH) -> bool:
+    """Insert one book; False if the ISBN is already present."""
+    return insert_books([(title, author, isbn)], db_path) == 1
+
+
+def iter_csv(filepath):
+    """Rows of a CSV with title, author and ISBN columns (header required)."""
+    with open(filepath, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            yield tuple(row.get(c) for c in COLUMNS)
+
+
+def iter_jsonl(filepath):
+    """Rows of a JSON Lines file with one {"title", "author", "ISBN"} object per line."""
+    with open(filepath, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield _as_tuple(json.loads(line))
+
+
+def import_file(filepath, db_path=DB_PATH, batch_rows: int = BATCH_ROWS, replace: bool = False) -> int:
+    """Stream a .csv or .jsonl file into the book table; returns rows written."""
+    suffix = Path(filepath).suffix.lower()
+    if suffix == '.csv':
+        rows = iter_csv(filepath)
+    elif suffix in ('.jsonl', '.ndjson'):
+        rows = iter_jsonl(filepath)
+    else:
+        raise ValueError(f'Unsupported file type {suffix!r} (expected .csv or .jsonl)')
+    return insert_books(rows, db_path, batch_rows, replace)
+
+
+def iter_books(db_path=DB_PATH, fetch_rows: int = FETCH_ROWS):
+    """Yield every (title, author, ISBN) row, fetching ``fetch_rows`` at a time."""
+    with connection(db_path) as con:
+        cur = con.execute('SELECT title, author, ISBN FROM book')
+        try:
+            while True:
+                rows = cur.fetchmany(fetch_rows)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cur.close()
+
+
+def get_book(isbn: str, db_path=DB_PATH) -> tuple | None:
+    with connection(db_path) as con:
+        return con.execute('SELECT title, author, ISBN FROM book WHERE ISBN = ?', (isbn,)).fetchone()
+
+
+def count_books(db_path=DB_PATH) -> int:
+    with connection(db_path) as con:
+        return con.execute('SELECT count(*) FROM book').fetchone()[0]
+
+
+def _synthetic_books(rows: int):
+    for i in range(rows):
+        yield (f'Book {i}', f'Author {i % 50_000}', f'{978_000_000_000 + i}')
+
+
+def benchmark(rows: int = 10_000_000, lookups: int = 100_000, seed: int = 0) -> None:
+    """Bulk-load ``rows`` synthetic books into a temporary database and time
+    the load (inserts/s) and random ISBN lookups (lookups/s)."""
+    import random
+
+    tmpdir = tempfile.mkdtemp()
+    db_path = os.path.join(tmpdir, 'bench.db')
+    try:
+        start = time.perf_counter()
+        written = insert_books(_synthetic_books(rows), db_path)
+        t_insert = time.perf_counter() - start
+        print(f'insert_books      {written:,} rows in {t_insert:.2f} s  ({written / t_insert:,.0f} inserts/s)')
+
+        rng = random.Random(seed)
+        keys = [f'{978_000_000_000 + rng.randrange(rows)}' for _ in range(lookups)]
+        with connection(db_path) as con:
+            cur = con.cursor()
+            start = time.perf_counter()
+            for isbn in keys:
+                cur.execute('SELECT title, author, ISBN FROM book WHERE ISBN = ?', (isbn,)).fetchone()
+            t_lookup = time.perf_counter() - start
+        print(f'ISBN lookups      {lookups:,} in {t_lookup:.2f} s  ({lookups / t_lookup:,.0f} lookups/s)')
+
+        start = time.perf_counter()
+        streamed = sum(1 for _ in iter_books(db_path))
+        t_scan = time.perf_counter() - start
+        print(f'iter_books        {streamed:,} rows in {t_scan:.2f} s  ({streamed / t_scan:,.0f} rows/s)')
+    finally:
+        close_pools()
+        for name in os.listdir(tmpdir):
+            os.remove(os.path.join(tmpdir, name))
+        os.rmdir(tmpdir)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description='Bulk import and stream the lab08 book table.')
+    parser.add_argument('--db', default=DB_PATH)
+    parser.add_argument('--import', dest='import_path', metavar='FILE',
+                        help='load a .csv or .jsonl file of books')
+    parser.add_argument('--replace', action='store_true', help='overwrite books whose ISBN already exists')
+    parser.add_argument('--benchmark', type=int, nargs='?', const=10_000_000, metavar='ROWS',
+                        help='time bulk inserts and lookups on ROWS synthetic books (default 10M)')
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        benchmark(args.benchmark)
+        return
+    print('Database path:', os.path.abspath(args.db))
+    if args.import_path:
+        start = time.perf_counter()
+        written = import_file(args.import_path, args.db, replace=args.replace)
+        print(f'Imported {written:,} books in {time.perf_counter() - start:.2f} s')
+    print(f'{count_books(args.db):,} books in table')
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print('Error:', e)
+        sys.exit(1)
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""Indexed and full-text search over the lab08 `book` table.
+
+Author: Edward Cronin
+
+`lab08_getallbooks.py` can only list the whole table. `enable_search` adds,
+once per database:
+
+- secondary indexes on (author, title) and (title), so an author lookup or
+  a title prefix is a B-tree range scan;
+- an FTS5 table `book_fts` over title and author for ranked (BM25) word
+  search, and a trigram FTS5 table `book_trigram` over title for substring
+  search;
+- triggers on `book` that keep both FTS tables in sync with every insert,
+  update and delete (including those made through lab08_book_repo.py).
+
+Every query returns one page of `(title, author, ISBN)` rows plus a cursor
+for the next page (None on the last page). Pages use keyset pagination on
+the sort key and rowid, so page 1000 costs the same as page 1.
+
+Run from `my-work/code` like:
+    python lab08_book_search.py --author "JK Rowling"
+    python lab08_book_search.py --text "harry potter"
+    python lab08_book_search.py --benchmark 2000000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from lab08_book_repo import DB_PATH, close_pools, connection, insert_books
+
+PAGE_ROWS = 20
+
+SEARCH_SCHEMA = """
+CREATE INDEX IF NOT EXISTS book_author_title ON book(author, title);
+CREATE INDEX IF NOT EXISTS book_title ON book(title);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS book_fts USING fts5(
+    title, author, content='book', content_rowid='rowid', prefix='2 3'
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS book_trigram USING fts5(
+    title, content='book', content_rowid='rowid', tokenize='trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS book_search_ai AFTER INSERT ON book BEGIN
+    INSERT INTO book_fts(rowid, title, author) VALUES (new.rowid, new.title, new.author);
+    INSERT INTO book_trigram(rowid, title) VALUES (new.rowid, new.title);
+END;
+CREATE TRIGGER IF NOT EXISTS book_search_ad AFTER DELETE ON book BEGIN
+    INSERT INTO book_fts(book_fts, rowid, title, author) VALUES ('delete', old.rowid, old.title, old.author);
+    INSERT INTO book_trigram(book_trigram, rowid, title) VALUES ('delete', old.rowid, old.title);
+END;
+CREATE TRIGGER IF NOT EXISTS book_search_au AFTER UPDATE ON book BEGIN
+    INSERT INTO book_fts(book_fts, rowid, title, author) VALUES ('delete', old.rowid, old.title, old.author);
+    INSERT INTO book_trigram(book_trigram, rowid, title) VALUES ('delete', old.rowid, old.title);
+    INSERT INTO book_fts(rowid, title, author) VALUES (new.rowid, new.title, new.author);
+    INSERT INTO book_trigram(rowid, title) VALUES (new.rowid, new.title);
+END;
+"""
+
+_enabled: set[str] = set()
+
+
+def enable_search(db_path=DB_PATH) -> None:
+    """Create the search indexes, FTS tables and triggers if missing.
+
+    The FTS tables are filled from the existing rows the first time they
+    are created; after that the triggers keep them current.
+    """
+    key = os.path.abspath(db_path)
+    if key in _enabled:
+        return
+    with connection(db_path) as con:
+        existing = {row[0] for row in con.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        rebuild = ''.join(f"INSERT INTO {t}({t}) VALUES ('rebuild');\n"
+                          for t in ('book_fts', 'book_trigram') if t not in existing)
+        try:
+            con.executescript(f'BEGIN IMMEDIATE;\n{SEARCH_SCHEMA}\n{rebuild}COMMIT;')
+        except BaseException:
+            if con.in_transaction:
+                con.rollback()
+            raise
+    _enabled.add(key)
+
+
+def _page(con, sql: str, params: tuple, cursor_len: int, page_rows: int):
+    """Run a keyset query whose last ``cursor_len`` columns form the cursor."""
+    rows = con.execute(sql, params + (page_rows + 1,)).fetchall()
+    more = len(rows) > page_rows
+    rows = rows[:page_rows]
+    cursor = tuple(rows[-1][-cursor_len:]) if more else None
+    return [row[:3] for row in rows], cursor
+
+
+def by_author(author: str, after=None, page_rows: int = PAGE_ROWS, db_path=DB_PATH):
+    """Books by ``author`` (exact match) in title order: ``(rows, next_cursor)``."""
+    enable_search(db_path)
+    title, rowid = after or ('', 0)
+    sql = """SELECT title, author, ISBN, title, rowid FROM book
+             WHERE author = ? AND (title, rowid) > (?, ?)
+             ORDER BY title, rowid LIMIT ?"""
+    with connection(db_path) as con:
+        return _page(con, sql, (author, title, rowid), 2, page_rows)
+
+
+def _prefix_upper_bound(prefix: str) -> str:
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def by_title_prefix(prefix: str, after=None, page_rows: int = PAGE_ROWS, db_path=DB_PATH):
+    """Books whose title starts with ``prefix`` (case-sensitive), in title order."""
+    enable_search(db_path)
+    if not prefix:
+        raise ValueError('prefix must not be empty')
+    title, rowid = after or ('', 0)
+    sql = """SELECT title, author, ISBN, title, rowid FROM book
+             WHERE title >= ? AND title < ? AND (title, rowid) > (?, ?)
+             ORDER BY title, rowid LIMIT ?"""
+    with connection(db_path) as con:
+        return _page(con, sql, (prefix, _prefix_upper_bound(prefix), title, rowid), 2, page_rows)
+
+
+def by_title_substring(text: str, after=None, page_rows: int = PAGE_ROWS, db_path=DB_PATH):
+    """Books whose title contains ``text`` (case-insensitive), in rowid order.
+
+    Uses the trigram index for ``text`` of three or more characters; ``%``
+    and ``_`` in ``text`` act as LIKE wildcards.
+    """
+    enable_search(db_path)
+    (rowid,) = after or (0,)
+    sql = """SELECT b.title, b.author, b.ISBN, t.rowid FROM book_trigram t
+             JOIN book b ON b.rowid = t.rowid
+             WHERE t.title LIKE ? AND t.rowid > ?
+             ORDER BY t.rowid LIMIT ?"""
+    with connection(db_path) as con:
+        return _page(con, sql, (f'%{text}%', rowid), 1, page_rows)
+
+
+def _match_query(text: str, prefix_last: bool) -> str:
+    words = [w.replace('"', '""') for w in text.split()]
+    if not words:
+        raise ValueError('search text must contain at least one word')
+    terms = [f'"{w}"' for w in words]
+    if prefix_last:
+        terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def search(text: str, after=None, page_rows: int = PAGE_ROWS, prefix_last: bool = True, db_path=DB_PATH):
+    """Ranked (BM25) search for books whose title or author contain every word of ``text``.
+
+    With ``prefix_last`` the final word also matches as a prefix, which suits
+    search-as-you-type. Best matches come first.
+    """
+    enable_search(db_path)
+    match = _match_query(text, prefix_last)
+    rank, rowid = after or (float('-inf'), 0)
+    sql = """SELECT b.title, b.author, b.ISBN, f.rank, f.rowid FROM book_fts f
+             JOIN book b ON b.rowid = f.rowid
+             WHERE book_fts MATCH ? AND (f.rank > ? OR (f.rank = ? AND f.rowid > ?))
+             ORDER BY f.rank, f.rowid LIMIT ?"""
+    with connection(db_path) as con:
+        return _page(con, sql, (match, rank, rank, rowid), 2, page_rows)
+
+
+def like_scan(text: str, column: str = 'title', page_rows: int = PAGE_ROWS, db_path=DB_PATH):
+    """The unindexed ``column LIKE '%text%'`` scan, for comparison."""
+    if column not in ('title', 'author'):
+        raise ValueError(f'Cannot scan column {column!r}')
+    with connection(db_path) as con:
+        return con.execute(f'SELECT title, author, ISBN FROM book WHERE {column} LIKE ? LIMIT ?',
+                           (f'%{text}%', page_rows)).fetchall()
+
+
+WORDS = ('harry', 'potter', 'python', 'fluent', 'data', 'analysis', 'night', 'river', 'garden',
+         'silent', 'winter', 'empire', 'secret', 'history', 'modern', 'ocean', 'stone', 'shadow',
+         'light', 'journey', 'galway', 'island', 'machine', 'learning', 'city', 'storm', 'letters',
+         'house', 'mountain', 'memory', 'atlas', 'kingdom', 'science', 'forest', 'glass', 'fire')
+
+
+def _synthetic_books(rows: int, seed: int = 0):
+    rng = random.Random(seed)
+    for i in range(rows):
+        title = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))).title() + f' {i}'
+        yield (title, f'Author {rng.randrange(rows // 20 + 1)}', f'{978_000_000_000 + i}')
+
+
+def _time(fn, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats
+
+
+def benchmark(rows: int = 2_000_000, repeats: int = 200) -> None:
+    """Load ``rows`` synthetic books, check that insert_books still counts rows
+    with the search triggers in place, then time each query against a LIKE scan."""
+    tmpdir = tempfile.mkdtemp()
+    db_path = os.path.join(tmpdir, 'bench.db')
+    try:
+        start = time.perf_counter()
+        insert_books(_synthetic_books(rows), db_path)
+        enable_search(db_path)
+        print(f'{rows:,} books loaded and indexed in {time.perf_counter() - start:.1f} s')
+
+        # the search triggers must not inflate the row counts insert_books reports
+        extra = [(f'Extra Book {i}', 'Extra Author', f'979{i:010d}') for i in range(3)]
+        counts = (insert_books(extra, db_path), insert_books(extra[:1], db_path),
+                  insert_books(extra[:2], db_path, replace=True))
+        if counts != (3, 0, 2):
+            raise RuntimeError(f'insert_books returned {counts} with search enabled, expected (3, 0, 2)')
+
+        # selective terms, so the LIKE scan cannot stop after the first few rows
+        cases = [
+            ('author lookup', lambda: by_author('Author 4242', db_path=db_path),
+             lambda: like_scan('Author 4242', 'author', db_path=db_path)),
+            ('title prefix', lambda: by_title_prefix('Galway Island Stone', db_path=db_path),
+             lambda: like_scan('Galway Island Stone', db_path=db_path)),
+            ('title substring', lambda: by_title_substring('Shadow 777', db_path=db_path),
+             lambda: like_scan('Shadow 777', db_path=db_path)),
+            ('ranked text', lambda: search('winter garden 1999', db_path=db_path),
+             lambda: like_scan('Winter Garden 1999', db_path=db_path)),
+        ]
+        print(f'{"query":<18}{"indexed":>12}{"LIKE scan":>12}')
+        for label, indexed, scan in cases:
+            t_index = _time(indexed, repeats)
+            t_scan = _time(scan, max(1, repeats // 50))
+            print(f'{label:<18}{t_index * 1e3:10.3f}ms{t_scan * 1e3:10.1f}ms')
+    finally:
+        close_pools()
+        _enabled.discard(os.path.abspath(db_path))
+        for name in os.listdir(tmpdir):
+            os.remove(os.path.join(tmpdir, name))
+        os.rmdir(tmpdir)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description='Search the lab08 book table.')
+    parser.add_argument('--db', default=DB_PATH)
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--author')
+    group.add_argument('--prefix', help='title prefix')
+    group.add_argument('--contains', help='title substring')
+    group.add_argument('--text', help='ranked word search over title and author')
+    group.add_argument('--benchmark', type=int, nargs='?', const=2_000_000, metavar='ROWS')
+    parser.add_argument('--pages', type=int, default=1, help='number of pages to print')
+    parser.add_argument('--page-rows', type=int, default=PAGE_ROWS)
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        benchmark(args.benchmark)
+        return
+    if args.author:
+        query, arg = by_author, args.author
+    elif args.prefix:
+        query, arg = by_title_prefix, args.prefix
+    elif args.contains:
+        query, arg = by_title_substring, args.contains
+    else:
+        query, arg = search, args.text
+
+    cursor = None
+    for page in range(1, args.pages + 1):
+        rows, cursor = query(arg, after=cursor, page_rows=args.page_rows, db_path=args.db)
+        print(f'Page {page}:')
+        for row in rows:
+            print(f'row{row}')
+        if cursor is None:
+            break
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print('Error:', e)
+        sys.exit(1)
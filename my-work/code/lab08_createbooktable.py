@@ -1,18 +1,12 @@
-import sqlite3
 import os
 
-db_path = os.path.abspath("pfda.db")
-print("Database path:", db_path)
-
-con = sqlite3.connect("pfda.db")  # creates file if not present
-cur = con.cursor()
+from lab08_book_repo import DB_PATH, connection
 
-# create table
-cur.execute("CREATE TABLE IF NOT EXISTS book(title TEXT, author TEXT, ISBN TEXT)")
+db_path = os.path.abspath(DB_PATH)
+print("Database path:", db_path)
 
-# commit changes so they persist
-con.commit()
+# the repository creates the book table (with WAL and an ISBN key) on first use
+with connection(DB_PATH) as con:
+    pass
 
 print("Table created successfully")
-
-con.close()
@@ -1,7 +1,4 @@
-import sqlite3
-
-con = sqlite3.connect("pfda.db")
-cur = con.cursor()
+from lab08_book_repo import get_book, insert_book
 
 # Prompt user for book details
 book = {}
@@ -9,15 +6,9 @@ book['title'] = input("Please enter book title: ")
 book['author'] = input("Please enter book author: ")
 book['ISBN'] = input("Please enter book ISBN: ")
 
-# Insert one book safely
-sql = "INSERT INTO book VALUES (:title, :author, :ISBN)"
-cur.execute(sql, book)
-
-# Commit changes
-con.commit()
-
-# Display all books
-for row in cur.execute("SELECT * FROM book"):
-    print(f"row {row}")
+# Insert one book safely (parameterised, committed by the repository)
+if not insert_book(book['title'], book['author'], book['ISBN']):
+    print(f"A book with ISBN {book['ISBN']} is already in the table")
 
-con.close()
+# Display the book just entered rather than the whole table
+print(f"row {get_book(book['ISBN'])}")
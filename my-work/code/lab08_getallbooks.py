@@ -1,9 +1,9 @@
-import sqlite3 
 import os
-print("Database path:", os.path.abspath("pfda.db"))
 
-con = sqlite3.connect("pfda.db") 
-cur = con.cursor() 
- 
-for row in cur.execute("select * from book"): 
-    print (f"row{row}")
\ No newline at end of file
+from lab08_book_repo import DB_PATH, iter_books
+
+print("Database path:", os.path.abspath(DB_PATH))
+
+# rows are streamed from the database a block at a time
+for row in iter_books():
+    print(f"row{row}")
@@ -1,37 +1,21 @@
-import sqlite3
 import os
 
-db_path = os.path.abspath("pfda.db")
-print("Database path:", db_path)
-
-con = sqlite3.connect(db_path)
-cur = con.cursor()
+from lab08_book_repo import DB_PATH, count_books, get_book, insert_books
 
-# Ensure the table exists with a primary key on ISBN
-cur.execute("""
-    CREATE TABLE IF NOT EXISTS book (
-        title TEXT,
-        author TEXT,
-        ISBN TEXT PRIMARY KEY
-    )
-""")
+db_path = os.path.abspath(DB_PATH)
+print("Database path:", db_path)
 
-# Check current contents
-result = cur.execute("SELECT * FROM book")
-print("Before insert:", result.fetchall())
+# Check current size (the table is created with a primary key on ISBN if missing)
+print("Before insert:", count_books(), "books")
 
-# Insert books safely, ignoring duplicates
+# Insert books safely, ignoring duplicates, in a single transaction
 books = [
     ("Harry Pothead", "Just Kidding Really", "112344"),
     ("Harry Potter does something profound", "JK Rowling", "123444")
 ]
-cur.executemany("INSERT OR IGNORE INTO book VALUES (?, ?, ?)", books)
-
-# Commit the transaction so data persists
-con.commit()
+written = insert_books(books)
 
 # Check again
-result = cur.execute("SELECT * FROM book")
-print("After insert:", result.fetchall())
-
-con.close()
+print("After insert:", count_books(), "books", f"({written} new)")
+for _, _, isbn in books:
+    print(get_book(isbn))
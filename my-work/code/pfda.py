@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""One command-line entry point for the my-work/code chart scripts.
+
+Author: Edward Cronin
+
+    python pfda.py births                 # projected_births.py
+    python pfda.py galway [--benchmark]   # cso_populationbyage_galway.py
+    python pfda.py cso-batch --workers 4  # cso_population_batch.py
+    python pfda.py readme                 # update_readme_images.py
+
+Only argparse and the standard library are imported up front: the script
+for the chosen command is imported when it runs, and the scripts import
+pandas and matplotlib only after the chart cache says a chart has to be
+drawn. `--help`, a cached chart or a missing CSV therefore never pay for
+them.
+
+With `--headless` (or automatically when there is no display, e.g. cron)
+matplotlib uses the Agg backend and `plt.show()` is skipped.
+
+Each run records how long it spent importing, loading, computing,
+rendering and saving. `--timings` prints that on stderr, and
+`--timings-json FILE` appends it to FILE as one JSON line for cron logs.
+
+Run from `my-work/code` like:
+    python pfda.py --timings births
+    python pfda.py --headless --timings-json timings.jsonl galway
+"""
+
+import argparse
+import importlib
+import os
+import sys
+
+COMMANDS = {
+    'births': ('projected_births', 'linear projection of annual births'),
+    'galway': ('cso_populationbyage_galway', 'Galway population by single-year age'),
+    'cso-batch': ('cso_population_batch', 'population-by-age charts for every council and year'),
+    'readme': ('update_readme_images', "point the README's images at the latest charts"),
+}
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(
+        description='Run a my-work/code chart script.',
+        epilog='Arguments after the command are passed to the script; try "<command> --help".')
+    parser.add_argument('--headless', action='store_true', help='use the Agg backend and never open windows')
+    parser.add_argument('--timings', action='store_true', help='print per-phase timings on stderr')
+    parser.add_argument('--timings-json', metavar='FILE', help='append per-phase timings to FILE as JSON')
+    parser.add_argument('command', choices=COMMANDS,
+                        help='; '.join(f'{name}: {desc}' for name, (_, desc) in COMMANDS.items()))
+    parser.add_argument('args', nargs=argparse.REMAINDER)
+    args = parser.parse_args(argv)
+
+    if args.headless:
+        os.environ['PFDA_HEADLESS'] = '1'
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    import cli_support
+    cli_support.reset()
+    cli_support.phase('import')
+    module = importlib.import_module(COMMANDS[args.command][0])
+    cli_support.phase(None)
+    try:
+        module.main(args.args)
+    finally:
+        cli_support.phase(None)
+        if args.timings:
+            cli_support.report(args.command)
+        if args.timings_json:
+            with open(args.timings_json, 'a', encoding='utf-8') as f:
+                cli_support.report(args.command, stream=f, as_json=True)
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print('Error:', e)
+        sys.exit(1)
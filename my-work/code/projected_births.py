@@ -1,22 +1,32 @@
 #!/usr/bin/env python3
 """Simple linear projection of births and save as PNG.
 
-Finds a nearby CSV, fits a linear model to annual counts, projects 30
-years forward, and writes a timestamped PNG to `my-work/generated_charts/`.
+Finds a nearby CSV, fits a linear model to annual counts (closed-form
+least squares in `projection_engine.py`, no scikit-learn), projects 30
+years forward, and writes a PNG to `my-work/generated_charts/`. The PNG is
+cached by a hash of the CSV, the parameters and the source of this script
+and the modules it draws with (`RENDER_MODULES`, see `chart_cache.py`), so
+an unchanged re-run returns the existing chart.
+pandas, matplotlib and the projection engine are only imported on a cache
+miss, and without a display the chart is saved with Agg and not shown;
+`python pfda.py --timings births` reports the time spent in each phase.
 Author: Edward Cronin
 """
 
-import pandas as pd
-import matplotlib.pyplot as plt
-import numpy as np
-from sklearn.linear_model import LinearRegression
+import argparse
 from pathlib import Path
-from datetime import datetime
 import sys
 
+import chart_cache
+from cli_support import phase, pyplot, show
+
 FNAME = 'projectedbirths-cso.csv'
 OUT_DIR_NAME = 'generated_charts'
 SEARCH_LEVELS = 4
+CHART_NAME = 'projected_births'
+HORIZON_YEARS = 30
+# modules the chart is drawn with; their source is part of the cache key
+RENDER_MODULES = ['projection_engine', 'cli_support']
 
 
 def find_data_file(start: Path, name: str, levels: int = SEARCH_LEVELS) -> Path | None:
@@ -35,12 +45,46 @@ def find_data_file(start: Path, name: str, levels: int = SEARCH_LEVELS) -> Path
 	return None
 
 
-def main() -> None:
+def main(argv=None) -> None:
+	argparse.ArgumentParser(description='Project annual births 30 years forward and save a cached PNG.').parse_args(argv)
+
+	phase('load')
 	HERE = Path(__file__).resolve().parent
 	csv_path = find_data_file(HERE, FNAME) or find_data_file(Path.cwd(), FNAME)
 	if csv_path is None:
 		raise FileNotFoundError(f"Put '{FNAME}' in a nearby data/ folder (tried up to {SEARCH_LEVELS} parents).")
 
+	# Choose output folder (prefer `my-work/generated_charts`)
+	def resolve_out_dir(csv_path: Path) -> Path:
+		p = Path(csv_path)
+		for anc in p.parents:
+			if anc.name == 'my-work':
+				return anc / OUT_DIR_NAME
+		if len(p.parents) >= 2:
+			return p.parents[1] / OUT_DIR_NAME
+		return HERE.parent.parent / OUT_DIR_NAME
+
+	out_dir = resolve_out_dir(csv_path)
+	out_dir.mkdir(parents=True, exist_ok=True)
+
+	# Same CSV, parameters and drawing code -> same chart: reuse it
+	params = {'horizon_years': HORIZON_YEARS, 'dpi': 150}
+	sources = [Path(__file__), *chart_cache.source_files(*RENDER_MODULES)]
+	key = chart_cache.cache_key([csv_path], params, sources)
+	cached = chart_cache.lookup(out_dir, CHART_NAME, key)
+	if cached is not None:
+		print('Up to date (cached):', cached.resolve())
+		return
+	outfile = chart_cache.artifact_path(out_dir, CHART_NAME, key)
+
+	# Heavy imports only once we know the chart has to be drawn
+	phase('import')
+	import pandas as pd
+	import numpy as np
+	from projection_engine import fit_series, predict
+	plt = pyplot()
+
+	phase('load')
 	df = pd.read_csv(csv_path)
 
 	# Choose y column: prefer 'VALUE', fallback to 'BirthRate' or last numeric
@@ -60,20 +104,15 @@ def main() -> None:
 	df_plot = df.dropna(subset=['Year', y_col]).sort_values('Year')
 
 	# Fit linear model on t = years since first year in data
+	phase('compute')
 	yr0 = int(df_plot['Year'].min())
 	df_plot['t'] = df_plot['Year'] - yr0
-	X = df_plot[['t']].values
 	y_vals = df_plot[y_col].values
-	model = LinearRegression().fit(X, y_vals)
+	fit = fit_series(df_plot['t'].values, y_vals, model='linear')
 
 	# Project 30 future years
-	future_years = np.arange(df_plot['Year'].max() + 1, df_plot['Year'].max() + 31)
-	t_future = (future_years - yr0).reshape(-1, 1)
-	pred_future = model.predict(t_future)
-
-	# Plot historical points and the fitted/projection lines
-	fig, ax = plt.subplots(figsize=(9, 5))
-	ax.plot(df_plot['Year'], df_plot[y_col], 'o', color='C0', label='Historical')
+	future_years = np.arange(df_plot['Year'].max() + 1, df_plot['Year'].max() + HORIZON_YEARS + 1)
+	pred_future, _, _ = predict(fit, future_years - yr0, level=None)
 
 	# Build continuous fitted values across historical + future years and
 	# split into historic vs projected segments for plotting.
@@ -82,8 +121,12 @@ def main() -> None:
 	combined_years = np.concatenate([hist_years, future_years])
 	# Ensure years are unique and sorted
 	combined_years = np.sort(np.unique(combined_years))
-	t_combined = (combined_years - yr0).reshape(-1, 1)
-	pred_combined = model.predict(t_combined)
+	pred_combined, _, _ = predict(fit, combined_years - yr0, level=None)
+
+	# Plot historical points and the fitted/projection lines
+	phase('render')
+	fig, ax = plt.subplots(figsize=(9, 5))
+	ax.plot(df_plot['Year'], df_plot[y_col], 'o', color='C0', label='Historical')
 
 	# Masks to separate historic and projected segments
 	hist_mask = combined_years <= last_hist_year
@@ -107,24 +150,14 @@ def main() -> None:
 	ax.set_xlim(int(df_plot['Year'].min()) - 1, int(future_years.max()) + 1)
 	ax.set_ylim(y_min - y_margin, y_max + y_margin)
 
-	# Choose output folder (prefer `my-work/generated_charts`) and save a
-	# timestamped PNG to avoid overwriting earlier results.
-	def resolve_out_dir(csv_path: Path) -> Path:
-		p = Path(csv_path)
-		for anc in p.parents:
-			if anc.name == 'my-work':
-				return anc / OUT_DIR_NAME
-		if len(p.parents) >= 2:
-			return p.parents[1] / OUT_DIR_NAME
-		return HERE.parent.parent / OUT_DIR_NAME
-
-	out_dir = resolve_out_dir(csv_path)
-	out_dir.mkdir(parents=True, exist_ok=True)
-	ts = datetime.now().strftime('%Y-%m-%d_%H%M%S')
-	outfile = out_dir / f'projected_births_{ts}.png'
+	# Save under a content-addressed name so the next unchanged run can reuse it
+	phase('save')
 	fig.savefig(outfile, dpi=150, bbox_inches='tight')
+	chart_cache.record(out_dir, CHART_NAME, key, outfile, params)
+	chart_cache.evict(out_dir)
+	phase(None)
 	print('Saved:', outfile.resolve())
-	plt.show()
+	show()
  
 
 
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""Closed-form least-squares projections for many series at once.
+
+Author: Edward Cronin
+
+`projected_births.py` imported scikit-learn's LinearRegression to fit one
+straight line, and the sklearn import took most of the script's start-up.
+This module fits the same kind of trend models with plain NumPy:
+
+- ``fit_series(x, Y)`` fits every column of ``Y`` (one series per column,
+  e.g. every county or every CSO statistic) against a shared ``x`` in one
+  batched solve of the normal equations. Missing values (NaN) are left out
+  per series, so series of different lengths can share a call.
+- models: 'linear', 'poly' (any degree) and 'exp' (a linear fit of log y,
+  i.e. constant growth rate);
+- ``predict(fit, x_new, level=0.95)`` returns the projection and a
+  prediction interval for every series, for any horizon.
+
+x is centred and scaled before building the design matrix, which keeps the
+normal equations well conditioned for calendar years and higher degrees.
+Nothing beyond NumPy is imported: Student-t quantiles for the intervals
+are computed in ``_t_quantile``, and scikit-learn is only imported when
+``backend='sklearn'`` is asked for explicitly.
+
+Run from `my-work/code` like:
+    python projection_engine.py --benchmark
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+from statistics import NormalDist
+
+import numpy as np
+
+MODELS = ('linear', 'poly', 'exp')
+
+
+def _design(x, fit) -> np.ndarray:
+    u = (np.asarray(x, dtype=float) - fit['x0']) / fit['scale']
+    return np.vander(u, fit['degree'] + 1, increasing=True)
+
+
+def fit_series(x, Y, model: str = 'linear', degree: int = 2, backend: str = 'numpy') -> dict:
+    """Least-squares trend for every column of ``Y`` against ``x``.
+
+    ``Y`` is (n,) for one series or (n, k) for k series; NaNs are ignored per
+    series. Returns a dict holding the coefficients (k, degree + 1), the
+    residual variance and (X'X)^-1 per series, used by ``predict``.
+    """
+    if model not in MODELS:
+        raise ValueError(f'Unknown model {model!r} (expected one of {MODELS})')
+    x = np.asarray(x, dtype=float)
+    Y = np.asarray(Y, dtype=float)
+    single = Y.ndim == 1
+    Y = Y.reshape(len(x), -1)
+    if model == 'exp':
+        if np.any(Y[~np.isnan(Y)] <= 0):
+            raise ValueError("The 'exp' model needs positive values")
+        Y = np.log(Y)
+    degree = degree if model == 'poly' else 1
+
+    span = np.nanmax(x) - np.nanmin(x)
+    fit = {'model': model, 'degree': degree, 'single': single,
+           'x0': float(np.nanmean(x)), 'scale': float(span / 2) if span > 0 else 1.0}
+    X = _design(x, fit)                       # (n, p)
+    W = ~np.isnan(Y)                          # (n, k) observed mask
+    Yz = np.where(W, Y, 0.0)
+    n_obs = W.sum(axis=0)
+    p = X.shape[1]
+    if np.any(n_obs < p):
+        raise ValueError(f'Every series needs at least {p} observed values for this model')
+
+    if W.all():
+        # no gaps: every series shares X'X, so one solve covers all k columns
+        xtx = np.broadcast_to(X.T @ X, (Y.shape[1], p, p))
+    else:
+        # X' W_k X for every series k (W_k masks out that series' missing values)
+        xtx = np.einsum('nk,np,nq->kpq', W.astype(float), X, X)
+
+    if backend == 'sklearn':
+        coef = _fit_sklearn(X, Y, W)
+    elif backend == 'numpy':
+        # batched normal equations: (X' W_k X) b_k = X' W_k y_k for all k at once
+        xty = X.T @ Yz                        # (p, k)
+        if W.all():
+            coef = np.linalg.solve(xtx[0], xty).T
+        else:
+            coef = np.linalg.solve(xtx, xty.T[..., None])[..., 0]
+    else:
+        raise ValueError(f'Unknown backend {backend!r}')
+
+    resid = np.where(W, Y - X @ coef.T, 0.0)
+    dof = n_obs - p
+    with np.errstate(invalid='ignore', divide='ignore'):
+        resid_var = np.where(dof > 0, (resid ** 2).sum(axis=0) / dof, np.nan)
+    fit.update(coef=coef, resid_var=resid_var, dof=dof,
+               xtx_inv=np.linalg.inv(xtx))
+    return fit
+
+
+def _fit_sklearn(X, Y, W) -> np.ndarray:
+    """Per-series sklearn fits on the same design matrix (imported on demand)."""
+    from sklearn.linear_model import LinearRegression
+
+    coef = np.empty((Y.shape[1], X.shape[1]))
+    for k in range(Y.shape[1]):
+        m = W[:, k]
+        model = LinearRegression(fit_intercept=False).fit(X[m], Y[m, k])
+        coef[k] = model.coef_
+    return coef
+
+
+def _t_quantile(prob: float, dof) -> np.ndarray:
+    """Student-t quantile without SciPy (importing scipy.stats costs seconds).
+
+    Exact for 1 and 2 degrees of freedom, otherwise the Cornish-Fisher
+    expansion around the normal quantile (Abramowitz & Stegun 26.7.5): for
+    a 95% interval within 0.2% at 3 dof and 1e-5 from 10 dof.
+    """
+    nu = np.asarray(dof, dtype=float)
+    z = NormalDist().inv_cdf(prob)
+    g1 = (z ** 3 + z) / 4
+    g2 = (5 * z ** 5 + 16 * z ** 3 + 3 * z) / 96
+    g3 = (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / 384
+    g4 = (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / 92160
+    with np.errstate(divide='ignore', invalid='ignore'):
+        q = z + g1 / nu + g2 / nu ** 2 + g3 / nu ** 3 + g4 / nu ** 4
+    q = np.where(nu == 1, np.tan(np.pi * (prob - 0.5)), q)
+    q = np.where(nu == 2, (2 * prob - 1) / np.sqrt(2 * prob * (1 - prob)), q)
+    return np.where(nu >= 1, q, np.nan)
+
+
+def predict(fit: dict, x_new, level: float | None = 0.95):
+    """Projected values at ``x_new`` for every series, with a prediction interval.
+
+    Returns ``(mean, lower, upper)`` shaped (m,) for a single series or
+    (m, k); ``lower``/``upper`` are None when ``level`` is None. For the
+    'exp' model the interval is computed on the log scale and transformed
+    back, so it is asymmetric.
+    """
+    X = _design(np.atleast_1d(x_new), fit)    # (m, p)
+    mean = X @ fit['coef'].T                  # (m, k)
+    lower = upper = None
+    if level is not None:
+        # se^2 = s^2 (1 + x' (X'X)^-1 x) for every new x and every series
+        lever = np.einsum('mp,kpq,mq->mk', X, fit['xtx_inv'], X)
+        se = np.sqrt(fit['resid_var'] * (1.0 + lever))
+        q = _t_quantile(0.5 + level / 2, fit['dof'])
+        lower, upper = mean - q * se, mean + q * se
+    if fit['model'] == 'exp':
+        mean = np.exp(mean)
+        if lower is not None:
+            lower, upper = np.exp(lower), np.exp(upper)
+    if fit['single']:
+        mean = mean[:, 0]
+        if lower is not None:
+            lower, upper = lower[:, 0], upper[:, 0]
+    return mean, lower, upper
+
+
+def project(x, Y, horizons=(10, 20, 30), model: str = 'linear', degree: int = 2, level: float | None = 0.95):
+    """Fit once and project every series ``horizons`` steps past the last ``x``.
+
+    Returns ``{horizon: (x_future, mean, lower, upper)}``, where ``x_future``
+    runs from last x + 1 to last x + horizon.
+    """
+    fit = fit_series(x, Y, model, degree)
+    last = int(np.nanmax(x))
+    out = {}
+    for h in horizons:
+        x_future = np.arange(last + 1, last + h + 1)
+        out[h] = (x_future, *predict(fit, x_future, level))
+    return out
+
+
+def benchmark(series: int = 10_000, points: int = 35, sklearn_series: int = 500, seed: int = 0) -> None:
+    """Start-up (import) cost and fitting throughput against per-series sklearn fits."""
+    def import_time(stmt):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', stmt], check=True)
+        return time.perf_counter() - start
+
+    t_base = import_time('import numpy')
+    t_engine = import_time('import projection_engine')
+    t_sklearn = import_time('import numpy; from sklearn.linear_model import LinearRegression')
+    print(f'start-up: python+numpy {t_base:.2f} s, projection_engine {t_engine:.2f} s, '
+          f'sklearn LinearRegression {t_sklearn:.2f} s')
+
+    rng = np.random.default_rng(seed)
+    years = np.arange(2023, 2023 + points)
+    Y = 50_000 + (years - years[0])[:, None] * rng.normal(0, 500, series) + rng.normal(0, 800, (points, series))
+
+    start = time.perf_counter()
+    fit = fit_series(years, Y)
+    predict(fit, np.arange(years[-1] + 1, years[-1] + 31))
+    t_np = time.perf_counter() - start
+
+    from sklearn.linear_model import LinearRegression
+    t0 = (years - years[0]).reshape(-1, 1)
+    start = time.perf_counter()
+    for k in range(sklearn_series):
+        model = LinearRegression().fit(t0, Y[:, k])
+        model.predict(np.arange(points, points + 30).reshape(-1, 1))
+    t_sk = (time.perf_counter() - start) / sklearn_series * series
+
+    check = LinearRegression().fit(t0, Y[:, 0]).predict(np.arange(points, points + 30).reshape(-1, 1))
+    same = np.allclose(predict(fit_series(years, Y[:, 0]), years[-1] + 1 + np.arange(30), None)[0], check)
+    print(f'{series:,} series x {points} points, fit + 30-year projection: '
+          f'batched NumPy {t_np:.3f} s ({series / t_np:,.0f} series/s), '
+          f'sklearn loop ~{t_sk:.1f} s ({series / t_sk:,.0f} series/s); same line: {same}')
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description='Closed-form trend projections.')
+    parser.add_argument('--benchmark', action='store_true')
+    parser.add_argument('--series', type=int, default=10_000)
+    args = parser.parse_args(argv)
+    if args.benchmark:
+        benchmark(args.series)
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print('Error:', e)
+        sys.exit(1)
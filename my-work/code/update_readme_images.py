@@ -1,6 +1,6 @@
 """Update README image placeholders with the latest generated PNG filenames.
 
-This script searches `my-work/generated_charts/` for the latest files matching
+This script looks up the latest files in `my-work/generated_charts/` matching
 patterns and replaces placeholders in `my-work/README.md`:
 
 - {{LATEST_CSOPOP}} -> latest cso-populationbyage_galway_*.png
@@ -9,15 +9,34 @@ patterns and replaces placeholders in `my-work/README.md`:
 
 Run from the repository root like:
     python my-work/code/update_readme_images.py
+    python my-work/code/update_readme_images.py --watch      # keep it up to date
+    python my-work/code/update_readme_images.py --backfill   # after running a notebook
 
-It edits README.md in-place (keeps a backup as README.md.bak).
+Latest files come from the append-only artifact log
+`generated_charts/artifacts.jsonl` (see `chart_cache.py`), read from the end,
+so the chart folder is never globbed or stat'ed file by file. PNGs written
+by other tools (the notebooks) are not in the log: `--backfill` adds them
+with one directory listing. That also happens once, automatically, when
+the log does not exist yet.
+
+What each placeholder last resolved to is kept in `README.md.images.json`.
+On later runs that filename is swapped for the newer one inside markdown
+image links (`![...](...)`) only, so the README is updated incrementally
+and the same filename in ordinary text is left alone. README.md and its backup (README.md.bak) are only
+written when a placeholder actually resolves to a new value.
 """
 from pathlib import Path
+import argparse
+import json
 import re
 import sys
+import time
+
+import chart_cache
 
 ROOT = Path(__file__).resolve().parents[1]
 README = ROOT / 'README.md'
+STATE = README.with_suffix('.md.images.json')
 OUT_DIR = ROOT / 'generated_charts'
 
 patterns = {
@@ -27,27 +46,138 @@ patterns = {
 }
 
 
+# ![alt](target "optional title")
+IMAGE_LINK = re.compile(r'(!\[[^\]]*\]\()([^)\s]+)(\s+"[^"]*")?\)')
+
+
 def find_latest(pattern):
-    files = sorted(OUT_DIR.glob(pattern), key=lambda p: p.stat().st_mtime)
-    return files[-1].name if files else None
+    return chart_cache.latest_published(OUT_DIR, {'_': pattern})['_']
+
+
+def load_state():
+    if STATE.exists():
+        try:
+            return json.loads(STATE.read_text(encoding='utf-8'))
+        except json.JSONDecodeError:
+            pass
+    return {}
+
+
+def swap_image_target(content, old, value):
+    """Point markdown image links whose target file is ``old`` at ``value`` (same folder)."""
+    def swap(m):
+        target = m.group(2)
+        if target != old and not target.endswith('/' + old):
+            return m.group(0)
+        return f'{m.group(1)}{target[:len(target) - len(old)]}{value}{m.group(3) or ""})'
+    return IMAGE_LINK.sub(swap, content)
+
+
+def render(content, state, latest):
+    """Substitute new values into ``content``; returns (content, changed keys).
+
+    A key's previous value is only swapped out if no other key also points
+    at that same file, so one chart never overwrites another's link.
+    """
+    changed = []
+    for key, value in latest.items():
+        if not value:
+            continue
+        placeholder = '{{' + key + '}}'
+        old = state.get(key)
+        shared = any(v == old for k, v in state.items() if k != key)
+        hit = False
+        if placeholder in content:
+            content = content.replace(placeholder, value)
+            hit = True
+        if old and old != value and not shared:
+            swapped = swap_image_target(content, old, value)
+            hit = hit or swapped != content
+            content = swapped
+        if hit:
+            state[key] = value
+            changed.append(key)
+    return content, changed
+
 
+def backfill():
+    """Log PNGs that were written outside the chart cache (notebook output)."""
+    added = chart_cache.register_untracked(OUT_DIR)
+    if added:
+        print(f'Registered {len(added)} untracked chart(s):', ', '.join(added))
+    return added
 
-def main():
+
+def update_once(backfill_untracked=False):
     if not README.exists():
         print('README not found at', README)
         sys.exit(1)
-    content = README.read_text(encoding='utf-8')
-    backup = README.with_suffix('.md.bak')
-    backup.write_text(content, encoding='utf-8')
+    # one-off migration for folders that predate the artifact log
+    if backfill_untracked or not (OUT_DIR / chart_cache.ARTIFACT_LOG_NAME).exists():
+        backfill()
+    latest = chart_cache.latest_published(OUT_DIR, patterns)
     for key, pat in patterns.items():
-        latest = find_latest(pat)
-        if latest:
-            content = content.replace('{{' + key + '}}', latest)
-            print(f'Inserted latest for {key}:', latest)
-        else:
+        if not latest[key]:
             print(f'No files found for pattern {pat}; leaving placeholder for {key}.')
-    README.write_text(content, encoding='utf-8')
-    print('README updated (backup saved to', backup.name + ')')
+
+    state = load_state()
+    before = dict(state)
+    content = README.read_text(encoding='utf-8')
+    new_content, changed = render(content, state, latest)
+    if changed:
+        backup = README.with_suffix('.md.bak')
+        backup.write_text(content, encoding='utf-8')
+        README.write_text(new_content, encoding='utf-8')
+        for key in changed:
+            print(f'Inserted latest for {key}:', state[key])
+        print('README updated (backup saved to', backup.name + ')')
+    else:
+        print('README already up to date.')
+    if state != before:
+        STATE.write_text(json.dumps(state, indent=2, sort_keys=True), encoding='utf-8')
+    return changed
+
+
+def _signature():
+    """Cheap change marker: artifact log size and chart folder mtime."""
+    log = OUT_DIR / chart_cache.ARTIFACT_LOG_NAME
+    log_size = log.stat().st_size if log.exists() else 0
+    dir_mtime = OUT_DIR.stat().st_mtime_ns if OUT_DIR.exists() else 0
+    return log_size, dir_mtime
+
+
+def watch(interval, backfill_untracked=False):
+    """Re-run ``update_once`` whenever a new artifact shows up (Ctrl+C to stop).
+
+    With ``backfill_untracked`` the folder is also scanned for untracked
+    PNGs, but only when its mtime changed (a file was added or removed).
+    """
+    print(f'Watching {OUT_DIR} every {interval} s (Ctrl+C to stop)')
+    last = None
+    try:
+        while True:
+            sig = _signature()
+            if sig != last:
+                folder_changed = last is None or sig[1] != last[1]
+                update_once(backfill_untracked and folder_changed)
+                last = _signature()   # our own log appends are not new work
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print('Stopped watching.')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Point README image links at the latest charts.')
+    parser.add_argument('--watch', action='store_true', help='keep running and update on new charts')
+    parser.add_argument('--interval', type=float, default=2.0, help='seconds between checks in --watch')
+    parser.add_argument('--backfill', action='store_true',
+                        help='first add PNGs written outside the chart cache (e.g. by notebooks) to the artifact log')
+    args = parser.parse_args(argv)
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    if args.watch:
+        watch(args.interval, args.backfill)
+    else:
+        update_once(args.backfill)
 
 
 if __name__ == '__main__':
@@ -1,7 +1,10 @@
 # weighted standard deviation
 
 import pandas as pd
-import numpy as np
+
+# the weighted statistics kernel (weighted_stats.py, next to this script) is
+# shared with assignments/assignment05-population.ipynb
+from weighted_stats import weighted_stats
 
 FILENAME="population_for_analysis.csv"
 DATADIR= "../data/"
@@ -16,9 +19,13 @@ district = headers[0]
 # this is incorrect
 print (df[district].describe())
 
-w_mean = np.average(df["Single Year of Age"], weights=df[district])
+# weighted mean, std, median etc. for every district at once
+stats = weighted_stats(df["Single Year of Age"], df[headers])
+
+w_mean = stats.at[district, "mean"]
 print(w_mean)
 
-w_variance = np.average((df['Single Year of Age'] - w_mean) ** 2, weights=df[district])
-w_standard_deviation = np.sqrt(w_variance)
+w_standard_deviation = stats.at[district, "std"]
 print (w_standard_deviation)
+
+print (stats[["total", "mean", "std", "median"]])
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+weighted_stats.py
+Author: Edward Cronin
+
+Weighted descriptive statistics of a value column (age) for every weight
+column of a table at once, e.g. every council in population_for_analysis.csv
+or Male/Female in the assignment05 pivot.
+
+The per-column loops in week05_weighted_standard_dev.py and
+assignment05-population.ipynb call np.average once or twice per column and
+work out the median in a separate loop. Here the weights form one
+(ages x columns) matrix W and everything is computed for all columns
+together:
+
+- totals, mean, variance, std, skew and kurtosis from weighted central
+  moments (matrix products over the age vector);
+- median and any other quantiles from one cumulative sum of W, using the
+  same rule as the notebook: the first age whose cumulative weight reaches
+  q * total.
+
+Variance is the population (ddof=0) weighted variance, as np.average gives;
+kurtosis is excess kurtosis (0 for a normal distribution).
+
+For inputs too large for memory, stream_weighted_stats reads a long CSV
+(one row per value/group/weight, e.g. the raw CSO download) in blocks,
+merges each block's moments into running totals with the pairwise update
+of Chan et al. / Pébay, and keeps the weight per distinct value for exact
+quantiles.
+
+It lives here in my-work/code, next to week05_weighted_standard_dev.py;
+assignment05-population.ipynb imports it from this folder together with
+cso_population_cube.py.
+
+Run from `my-work/code` like:
+    python weighted_stats.py --check
+"""
+
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+QUANTILES = (0.25, 0.5, 0.75)
+BLOCK_ROWS = 1_000_000
+STAT_COLUMNS = ["total", "mean", "variance", "std", "skew", "kurtosis"]
+
+
+def _quantile_label(q):
+    return "median" if q == 0.5 else f"q{round(q * 100):02d}"
+
+
+def _from_moments(total, mean, m2, m3, m4):
+    """Statistics from weight totals and summed central moments (arrays per column)."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        variance = np.where(total > 0, m2 / total, np.nan)
+        skew = (m3 / total) / variance ** 1.5
+        kurtosis = (m4 / total) / variance ** 2 - 3.0
+    mean = np.where(total > 0, mean, np.nan)
+    return {"total": total, "mean": mean, "variance": variance, "std": np.sqrt(variance),
+            "skew": skew, "kurtosis": kurtosis}
+
+
+def _moments(values, weights):
+    """(total, mean, M2, M3, M4) per column of ``weights`` (n x k)."""
+    total = weights.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = values @ weights / total
+    mean = np.where(total > 0, mean, 0.0)
+    d = values[:, None] - mean[None, :]
+    d2 = d * d
+    m2 = (d2 * weights).sum(axis=0)
+    m3 = (d2 * d * weights).sum(axis=0)
+    m4 = (d2 * d2 * weights).sum(axis=0)
+    return total, mean, m2, m3, m4
+
+
+def weighted_quantiles(values, weights, quantiles=QUANTILES):
+    """Array (len(quantiles) x k): first value whose cumulative weight reaches q * total."""
+    values = np.asarray(values, dtype=float)
+    weights = np.asarray(weights, dtype=float).reshape(len(values), -1)
+    order = np.argsort(values, kind="stable")
+    values, weights = values[order], weights[order]
+    cum = np.cumsum(weights, axis=0)
+    total = cum[-1]
+    out = np.full((len(quantiles), weights.shape[1]), np.nan)
+    for i, q in enumerate(quantiles):
+        idx = (cum < q * total).sum(axis=0)
+        ok = (total > 0) & (idx < len(values))
+        out[i, ok] = values[idx[ok]]
+    return out
+
+
+def weighted_stats(values, weights, quantiles=QUANTILES):
+    """Weighted statistics of ``values`` for every column of ``weights``.
+
+    ``values`` is a 1-D array (ages); ``weights`` is a DataFrame with one
+    row per value and one column per group (NaN counts as 0). Returns a
+    DataFrame indexed by group with total, mean, variance, std, skew,
+    kurtosis and one column per quantile ('median' for 0.5, else 'q25' etc.).
+    """
+    values = np.asarray(values, dtype=float)
+    w = weights.fillna(0).to_numpy(dtype=float)
+    stats = _from_moments(*_moments(values, w))
+    q = weighted_quantiles(values, w, quantiles)
+    for i, qq in enumerate(quantiles):
+        stats[_quantile_label(qq)] = q[i]
+    return pd.DataFrame(stats, index=weights.columns)
+
+
+def pivot_stats(pivot, quantiles=QUANTILES):
+    """weighted_stats for a pivot table whose index is the value (age)."""
+    values = pd.to_numeric(pivot.index.to_series(), errors="coerce").to_numpy(dtype=float)
+    keep = ~np.isnan(values)
+    return weighted_stats(values[keep], pivot[keep], quantiles)
+
+
+def _merge(acc, block):
+    """Combine running moments ``acc`` with ``block`` (pairwise update), per group."""
+    na, ma, m2a, m3a, m4a = acc
+    nb, mb, m2b, m3b, m4b = block
+    n = na + nb
+    with np.errstate(invalid="ignore", divide="ignore"):
+        d = np.where(n > 0, mb - ma, 0.0)
+        f = np.where(n > 0, na * nb / n, 0.0)
+        mean = np.where(n > 0, ma + d * nb / n, 0.0)
+        m2 = m2a + m2b + d * d * f
+        m3 = (m3a + m3b + d ** 3 * f * np.where(n > 0, (na - nb) / n, 0.0)
+              + 3 * d * np.where(n > 0, (na * m2b - nb * m2a) / n, 0.0))
+        m4 = (m4a + m4b + d ** 4 * f * np.where(n > 0, (na * na - na * nb + nb * nb) / (n * n), 0.0)
+              + 6 * d * d * np.where(n > 0, (na * na * m2b + nb * nb * m2a) / (n * n), 0.0)
+              + 4 * d * np.where(n > 0, (na * m3b - nb * m3a) / n, 0.0))
+    return n, mean, m2, m3, m4
+
+
+def stream_weighted_stats(filepath, value_col, group_col, weight_col, quantiles=QUANTILES,
+                          block_rows=BLOCK_ROWS, value_parser=None, **read_csv_kwargs):
+    """weighted_stats over a long-format CSV that need not fit in memory.
+
+    Each row holds one value, group and weight (e.g. 'Single Year of Age',
+    'Sex', 'VALUE'). ``value_parser`` can turn the raw value column into
+    numbers (rows where it gives NaN are skipped); by default it is
+    pd.to_numeric with errors='coerce'. Moments are merged block by block,
+    and the weight per distinct value is kept for the quantiles.
+    """
+    parse = value_parser or (lambda s: pd.to_numeric(s, errors="coerce"))
+    groups = []
+    acc = tuple(np.zeros(0) for _ in range(5))
+    hist = {}
+    reader = pd.read_csv(filepath, usecols=[value_col, group_col, weight_col],
+                         chunksize=block_rows, **read_csv_kwargs)
+    with reader:
+        for block in reader:
+            values = parse(block[value_col]).to_numpy(dtype=float)
+            weights = pd.to_numeric(block[weight_col], errors="coerce").fillna(0).to_numpy(dtype=float)
+            keep = ~np.isnan(values)
+            block = pd.DataFrame({"v": values[keep], "g": block[group_col].to_numpy()[keep],
+                                  "w": weights[keep]})
+            table = block.pivot_table(index="v", columns="g", values="w", aggfunc="sum", fill_value=0.0)
+
+            new = [g for g in table.columns if g not in groups]
+            if new:
+                groups.extend(new)
+                acc = tuple(np.concatenate([a, np.zeros(len(new))]) for a in acc)
+            table = table.reindex(columns=groups, fill_value=0.0)
+            acc = _merge(acc, _moments(table.index.to_numpy(dtype=float), table.to_numpy(dtype=float)))
+            for value, row in zip(table.index, table.to_numpy()):
+                prev = hist.get(value)
+                if prev is None:
+                    hist[value] = row.copy()
+                else:
+                    hist[value] = np.pad(prev, (0, len(row) - len(prev))) + row
+
+    if not groups:
+        return pd.DataFrame(columns=STAT_COLUMNS + [_quantile_label(q) for q in quantiles])
+    values = np.array(sorted(hist))
+    # histograms for groups first seen in a later block are shorter; pad them
+    w = np.array([np.pad(hist[v], (0, len(groups) - len(hist[v]))) for v in values])
+    stats = _from_moments(*acc)
+    q = weighted_quantiles(values, w, quantiles)
+    for i, qq in enumerate(quantiles):
+        stats[_quantile_label(qq)] = q[i]
+    return pd.DataFrame(stats, index=pd.Index(groups, name=group_col))
+
+
+def legacy_mean_std_median(values, weights):
+    """The per-column np.average / cumsum loop used before, for --check."""
+    rows = {}
+    for col in weights.columns:
+        w = weights[col].fillna(0).astype(float)
+        if w.sum() > 0:
+            wmean = np.average(values, weights=w)
+            wstd = np.sqrt(np.average((values - wmean) ** 2, weights=w))
+            cum = w.cumsum().to_numpy()
+            wmedian = values[cum >= w.sum() / 2][0]
+        else:
+            wmean = wstd = wmedian = np.nan
+        rows[col] = (wmean, wstd, wmedian)
+    return pd.DataFrame.from_dict(rows, orient="index", columns=["mean", "std", "median"])
+
+
+def check(csv_path):
+    """Compare weighted_stats and the streaming mode with the legacy loop."""
+    df = pd.read_csv(csv_path)
+    value_col = df.columns[0]
+    values = df[value_col].to_numpy(dtype=float)
+    weights = df.drop(columns=value_col)
+
+    new = weighted_stats(values, weights)
+    old = legacy_mean_std_median(values, weights)
+    ok = np.allclose(new[["mean", "std", "median"]].to_numpy(), old.to_numpy(), equal_nan=True)
+    print(f"weighted_stats vs per-column loop ({len(weights.columns)} columns): {'OK' if ok else 'MISMATCH'}")
+
+    long = weights.assign(**{value_col: values}).melt(id_vars=value_col, var_name="group", value_name="weight")
+    with tempfile.TemporaryDirectory() as tmp:
+        long_path = Path(tmp) / "long.csv"
+        long.to_csv(long_path, index=False)
+        streamed = stream_weighted_stats(long_path, value_col, "group", "weight", block_rows=257)
+    streamed = streamed.reindex(new.index)
+    ok_stream = np.allclose(streamed.to_numpy(dtype=float), new.to_numpy(dtype=float), equal_nan=True)
+    print(f"stream_weighted_stats vs weighted_stats: {'OK' if ok_stream else 'MISMATCH'}")
+    return ok and ok_stream
+
+
+def main(argv=None):
+    here = Path(__file__).resolve().parent
+    parser = argparse.ArgumentParser(description="Weighted statistics for every weight column of a CSV.")
+    parser.add_argument("csvfile", nargs="?",
+                        default=str(here.parent / "data" / "population_for_analysis.csv"))
+    parser.add_argument("--check", action="store_true", help="compare with the per-column np.average loop")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        if not check(args.csvfile):
+            sys.exit(1)
+        return
+    df = pd.read_csv(args.csvfile)
+    with pd.option_context("display.width", 120, "display.max_rows", 200):
+        print(weighted_stats(df.iloc[:, 0], df.iloc[:, 1:]).round(3))
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print("Error:", e)
+        sys.exit(1)
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+flight_clean.py
+Author: Edward Cronin
+
+One cleaning function for arrivals and departures, and a pipeline stage
+that cleans the monthly flight files (data/flight_batches/<kind>_YYYY-MM.parquet,
+written by flight_store.py) in parallel and keeps the results per month.
+
+Steps 15-21 of project.ipynb had two near-identical functions, clean_data
+for arrivals and clean_departures for departures, and ran them in a loop
+over the monthly files on one core, appending every cleaned month to a list
+before a final pd.concat (so every month was in memory twice). The two
+functions had drifted apart: departures cast the delay to int64 and dropped
+the audit flags, arrivals kept them with a nullable Int64 delay, and the
+category columns ended up with different categories per month, so the
+concatenated frame quietly fell back to object columns. Here instead:
+
+- ``clean_flights(df, kind)`` cleans either kind the same way and always
+  returns the same columns in the same order with the same dtypes
+  (``clean_columns(kind)`` / ``CLEAN_DTYPES``), however many values a month
+  has missing;
+- ``clean_partitions`` cleans each monthly file in a worker process and
+  writes data/flight_clean/<kind>_YYYY-MM.parquet, recording a SHA-256 of
+  the input file and of the cleaning code (this module and
+  datetime_parse.py) in data/flight_clean/_manifest.json.
+  A re-run only cleans months whose input or cleaning code has changed,
+  and removes outputs whose input has gone;
+- ``load_clean`` reads the cleaned months back in one pyarrow read, so the
+  category columns come back as categories over all months.
+
+Run from `project` like:
+    python flight_clean.py arrivals departures --workers 4
+    python flight_clean.py --benchmark
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from flight_store import BATCH_DIR, KINDS
+
+# The shared datetime parser lives with the weather store in assignments/
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "assignments"))
+import datetime_parse
+from datetime_parse import parse_datetimes
+
+CLEAN_DIR = Path("data") / "flight_clean"
+# source files whose changes invalidate every cleaned month
+CODE_FILES = (__file__, datetime_parse.__file__)
+MANIFEST = "_manifest.json"
+CATEGORIES = ["type", "status", "airline.name"]
+CLEAN_DTYPES = {
+    "type": "category",
+    "status": "category",
+    "delay": "Int64",
+    "scheduledTime": "datetime64[ns]",
+    "actualTime": "datetime64[ns]",
+    "airline.name": "category",
+    "date": "datetime64[ns]",
+    "actual_missing": "bool",
+    "computed_delay": "float64",
+    "delay_imputed": "bool",
+}
+
+
+def clean_columns(kind):
+    """Column names of ``clean_flights(df, kind)``, in order."""
+    side = KINDS[kind]
+    return [f"{side}.{c}" if c in ("delay", "scheduledTime", "actualTime", "actual_missing", "delay_imputed")
+            else c for c in CLEAN_DTYPES]
+
+
+def clean_flights(df, kind):
+    """
+    Clean Dublin Airport arrivals or departures data (``kind`` is 'arrivals' or 'departures'):
+    - Keep the operational columns for the flight's own side (``clean_columns(kind)``)
+    - Parse datetime columns (scheduled + actual times) with datetime_parse.parse_datetimes
+    - Remove flights with 'unknown' status
+    - Impute missing actual times from scheduled times, flagged in <side>.actual_missing
+    - Reconstruct missing delays in minutes, flagged in <side>.delay_imputed
+    - Round times to hourly bins for consistency
+    - Convert categorical fields for efficiency
+    """
+    side = KINDS[kind]
+    delay, scheduled, actual = f"{side}.delay", f"{side}.scheduledTime", f"{side}.actualTime"
+    df = df.reindex(columns=["type", "status", delay, scheduled, actual, "airline.name", "date"])
+
+    # ✅ Remove flights with unknown status
+    df = df[~df["status"].astype("string").str.contains("unknown", regex=False, na=False, case=False)].copy()
+
+    for col in (scheduled, actual, "date"):
+        df[col] = parse_datetimes(df[col], source=f"flights/{kind}", column=col)
+    for col in CATEGORIES:
+        df[col] = df[col].astype("string").astype("category")
+
+    # ✅ Impute missing actual times and reconstruct missing delays
+    df[f"{side}.actual_missing"] = df[actual].isna()
+    df[actual] = df[actual].fillna(df[scheduled])
+    df["computed_delay"] = (df[actual] - df[scheduled]).dt.total_seconds() / 60
+    reported = pd.to_numeric(df[delay], errors="coerce")
+    df[f"{side}.delay_imputed"] = reported.isna() & df["computed_delay"].notna()
+    df[delay] = reported.fillna(df["computed_delay"]).round().astype("Int64")
+
+    # ✅ Round times to hourly bins
+    df[scheduled] = df[scheduled].dt.floor("h")
+    df[actual] = df[actual].dt.floor("h")
+
+    columns = clean_columns(kind)
+    return df[columns].astype(dict(zip(columns, CLEAN_DTYPES.values()))).reset_index(drop=True)
+
+
+# --- partitions ------------------------------------------------------------
+
+def _hash_file(digest, path):
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+
+
+def input_hash(path):
+    """SHA-256 of the input file's bytes and of the cleaning code (``CODE_FILES``)."""
+    digest = hashlib.sha256()
+    _hash_file(digest, path)
+    for code in CODE_FILES:
+        _hash_file(digest, code)
+    return digest.hexdigest()
+
+
+def read_manifest(clean_dir):
+    path = Path(clean_dir) / MANIFEST
+    if path.exists():
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            pass
+    return {}
+
+
+def _save_manifest(clean_dir, manifest):
+    path = Path(clean_dir) / MANIFEST
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=1, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def clean_partition(task):
+    """Clean one monthly file (``task`` = (kind, source, target)); returns its row count."""
+    kind, source, target = task
+    df = clean_flights(pd.read_parquet(source), kind)
+    tmp = Path(target).with_name(Path(target).name + ".tmp")
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, target)
+    return len(df)
+
+
+def clean_partitions(kind, batch_dir=BATCH_DIR, clean_dir=CLEAN_DIR, workers=os.cpu_count() or 1, force=False):
+    """Clean every changed monthly file of ``kind``; returns {"cleaned": {...}, "skipped": {...}} of rows by file."""
+    if kind not in KINDS:
+        raise ValueError(f"kind must be one of {list(KINDS)}, not {kind!r}")
+    clean_dir = Path(clean_dir)
+    clean_dir.mkdir(parents=True, exist_ok=True)
+    sources = sorted(Path(batch_dir).glob(f"{kind}_*.parquet"))
+    if not sources:
+        raise FileNotFoundError(f"No {kind} files in {batch_dir}; run flight_store.convert() first")
+
+    manifest = read_manifest(clean_dir)
+    hashes = {src.name: input_hash(src) for src in sources}
+    todo, skipped = [], {}
+    for src in sources:
+        entry = manifest.get(src.name)
+        if not force and entry and entry["input"] == hashes[src.name] and (clean_dir / src.name).exists():
+            skipped[src.name] = entry["rows"]
+        else:
+            todo.append((kind, str(src), str(clean_dir / src.name)))
+
+    if workers > 1 and len(todo) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+            rows = list(pool.map(clean_partition, todo))
+    else:
+        rows = [clean_partition(task) for task in todo]
+    cleaned = {Path(task[1]).name: n for task, n in zip(todo, rows)}
+
+    for name in list(manifest):
+        if name.startswith(f"{kind}_") and name not in hashes:
+            (clean_dir / name).unlink(missing_ok=True)
+            del manifest[name]
+    for name, n in cleaned.items():
+        manifest[name] = {"input": hashes[name], "rows": n}
+    _save_manifest(clean_dir, manifest)
+    return {"cleaned": cleaned, "skipped": skipped}
+
+
+def load_clean(kind, clean_dir=CLEAN_DIR, columns=None):
+    """All of ``kind``'s cleaned months as one DataFrame (one pyarrow read, categories unified)."""
+    import pyarrow.dataset as ds
+
+    files = sorted(Path(clean_dir).glob(f"{kind}_*.parquet"))
+    if not files:
+        raise FileNotFoundError(f"No cleaned {kind} files in {clean_dir}; run clean_partitions() first")
+    return ds.dataset([str(f) for f in files], format="parquet").to_table(columns=columns).to_pandas()
+
+
+# --- benchmark -------------------------------------------------------------
+
+def _legacy_clean(df):
+    """clean_data (Step 15) as it was, for the timing and value comparison."""
+    df = df.drop(columns=[c for c in df.columns if c not in
+                          ["type", "status", "arrival.delay", "arrival.scheduledTime", "arrival.actualTime",
+                           "airline.name", "date"]])
+    for col in ["date", "arrival.scheduledTime", "arrival.actualTime"]:
+        df[col] = pd.to_datetime(df[col], errors="coerce")
+    df = df[~df["status"].str.contains("unknown", regex=False, na=False, case=False)]
+    for col in ["type", "status", "airline.name"]:
+        df[col] = df[col].astype("category")
+    df["arrival.actual_missing"] = df["arrival.actualTime"].isna()
+    df["arrival.actualTime"] = df["arrival.actualTime"].fillna(df["arrival.scheduledTime"])
+    df["computed_delay"] = (df["arrival.actualTime"] - df["arrival.scheduledTime"]).dt.total_seconds() / 60
+    df["arrival.delay"] = pd.to_numeric(df["arrival.delay"], errors="coerce")
+    df["arrival.delay"] = df["arrival.delay"].fillna(df["computed_delay"]).round().astype("Int64")
+    df["arrival.delay_imputed"] = df["arrival.delay"].isna() & df["computed_delay"].notna()
+    df["arrival.scheduledTime"] = df["arrival.scheduledTime"].dt.floor("h")
+    df["arrival.actualTime"] = df["arrival.actualTime"].dt.floor("h")
+    return df
+
+
+def benchmark(records=400_000, workers=os.cpu_count() or 1):
+    """Serial read/clean/concat loop (Steps 15-16) against clean_partitions, cold and warm."""
+    from flight_store import convert, write_sample
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        source = tmp / "dub_arrival_history.json"
+        write_sample(source, records)
+        convert(source, "arrivals", tmp / "batches", raw_dir=Path(__file__).resolve().parent / "data" / "raw_flights")
+        files = sorted((tmp / "batches").glob("arrivals_*.parquet"))
+
+        start = time.perf_counter()
+        old = pd.concat([_legacy_clean(pd.read_parquet(f)) for f in files], ignore_index=True)
+        t_old = time.perf_counter() - start
+
+        start = time.perf_counter()
+        serial = clean_partitions("arrivals", tmp / "batches", tmp / "serial", workers=1)
+        new = load_clean("arrivals", tmp / "serial")
+        t_serial = time.perf_counter() - start
+
+        start = time.perf_counter()
+        clean_partitions("arrivals", tmp / "batches", tmp / "pool", workers=workers)
+        pooled = load_clean("arrivals", tmp / "pool")
+        t_pool = time.perf_counter() - start
+
+        start = time.perf_counter()
+        warm = clean_partitions("arrivals", tmp / "batches", tmp / "pool", workers=workers)
+        t_warm = time.perf_counter() - start
+
+        same = (len(old) == len(new) and pooled.equals(new)
+                and all(np.array_equal(old[c].to_numpy(), new[c].to_numpy())
+                        for c in ["arrival.delay", "arrival.scheduledTime", "arrival.actualTime", "computed_delay"]))
+        rows = sum(serial["cleaned"].values())
+        print(f"{rows:,} rows in {len(files)} monthly files, {workers} worker(s) on {os.cpu_count()} CPU(s)")
+        print(f"{'read + clean_data + concat (Steps 15-16)':<44}{t_old:6.2f} s   status dtype: {old['status'].dtype}")
+        print(f"{'clean_partitions, 1 worker + load_clean':<44}{t_serial:6.2f} s   status dtype: {new['status'].dtype}")
+        print(f"{f'clean_partitions, {workers} workers + load_clean':<44}{t_pool:6.2f} s   ({t_old / t_pool:.1f}x)")
+        print(f"{'re-run, nothing changed':<44}{t_warm:6.2f} s   skipped {len(warm['skipped'])} of {len(files)}")
+        print(f"same values: {same}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clean the monthly flight files in parallel.")
+    parser.add_argument("kinds", nargs="*", help="arrivals and/or departures (default: both)")
+    parser.add_argument("--batches", default=str(BATCH_DIR), help="input folder (default: data/flight_batches)")
+    parser.add_argument("--out", default=str(CLEAN_DIR), help="output folder (default: data/flight_clean)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--force", action="store_true", help="clean every month, even unchanged ones")
+    parser.add_argument("--benchmark", action="store_true")
+    parser.add_argument("--records", type=int, default=400_000, help="synthetic records for --benchmark")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        benchmark(args.records, args.workers)
+        return
+    for kind in args.kinds or list(KINDS):
+        result = clean_partitions(kind, args.batches, args.out, args.workers, args.force)
+        for name, rows in result["cleaned"].items():
+            print(f"🧹 {name}: {rows:,} rows cleaned")
+        if result["skipped"]:
+            print(f"⏩ {kind}: {len(result['skipped'])} unchanged month(s) skipped")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print("Error:", e)
+        sys.exit(1)
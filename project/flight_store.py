@@ -0,0 +1,476 @@
+#!/usr/bin/env python3
+"""
+flight_store.py
+Author: Edward Cronin
+
+Streaming conversion of the raw Aviation Edge flight history files
+(dub_arrival_history.json, dub_departure_history.json) into monthly
+Parquet (or Feather) files for project.ipynb.
+
+Step 12 of the notebook used to json.load the whole history (130k+ nested
+records per file), flatten every record with pd.json_normalize and write
+each month back out as JSON lines in data/flight_batches/, which Steps
+14-23 then parsed again with pd.read_json. The whole file, the list of
+dicts and the flattened frame were all in memory at once. Here instead:
+
+- the JSON array is read in fixed-size text blocks and decoded one record
+  at a time (``iter_json_array``), so only one block and the current
+  batch of records are held;
+- only the fields named in data/raw_flights/<kind>_schema.txt are taken
+  from each record (``departure.scheduledTime`` -> record["departure"]
+  ["scheduledTime"]), with fixed types: times as timestamps, delays as
+  floats, everything else as strings;
+- ``date`` is the flight's own scheduled time (arrival.scheduledTime for
+  arrivals, departure.scheduledTime for departures), as in Step 12;
+- every ``batch_rows`` records are appended as a row group to the file for
+  their month, ``data/flight_batches/<kind>_YYYY-MM.parquet``. Files are
+  written under a temporary name and renamed when the input is finished.
+
+Peak memory depends on ``batch_rows``, not on the size of the input file.
+
+Once flight_fetch.py has fetched days into data/flight_batches/ (its
+data/raw_flights/fetch_checkpoint.json exists, see ``fetched_by_api``), the
+raw JSON is out of date and the command line refuses to convert into that
+folder again unless given --force.
+
+Run from `project` like:
+    python flight_store.py data/raw_flights/dub_arrival_history.json arrivals
+    python flight_store.py data/raw_flights/dub_departure_history.json departures --format feather
+    python flight_store.py --benchmark --records 130000
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+RAW_DIR = Path("data") / "raw_flights"
+BATCH_DIR = Path("data") / "flight_batches"
+FETCH_CHECKPOINT = "fetch_checkpoint.json"     # written by flight_fetch.py
+KINDS = {"arrivals": "arrival", "departures": "departure"}
+FORMATS = {"parquet": ".parquet", "feather": ".feather"}
+BATCH_ROWS = 10_000
+READ_BLOCK = 1 << 16
+_SEPARATORS = re.compile(r"[\s,]*")
+
+
+def iter_json_array(stream, block_size=READ_BLOCK):
+    """Yield the elements of the JSON array in the text ``stream`` one at a time.
+
+    The stream is read ``block_size`` characters at a time; an element cut
+    off at the end of a block is decoded again once the next block is read.
+    """
+    decoder = json.JSONDecoder()
+    buf = stream.read(block_size)
+    eof = not buf
+    pos = _SEPARATORS.match(buf).end()
+    while pos == len(buf) and not eof:
+        more = stream.read(block_size)
+        eof = not more
+        buf, pos = more, _SEPARATORS.match(more).end()
+    if buf[pos:pos + 1] != "[":
+        raise ValueError("Expected a JSON array of flight records")
+    pos += 1
+    while True:
+        pos = _SEPARATORS.match(buf, pos).end()
+        if pos < len(buf) and buf[pos] == "]":
+            return
+        try:
+            if pos >= len(buf):
+                raise json.JSONDecodeError("end of block", buf, pos)
+            value, end = decoder.raw_decode(buf, pos)
+            if end == len(buf) and not eof:
+                raise json.JSONDecodeError("element may continue in the next block", buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise ValueError(f"Truncated or invalid JSON near character {pos} of the current block")
+            more = stream.read(block_size)
+            eof = not more
+            buf = buf[pos:] + more
+            pos = 0
+            continue
+        yield value
+        pos = end
+
+
+def read_schema(kind, raw_dir=RAW_DIR):
+    """Flattened column names for ``kind`` from data/raw_flights/<kind>_schema.txt."""
+    path = Path(raw_dir) / f"{kind}_schema.txt"
+    return [line.strip() for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+
+def column_type(name):
+    """'time', 'float' or 'string' for a flattened column name."""
+    if name == "date" or name.endswith(("Time", "Runway")):
+        return "time"
+    if name.endswith(".delay"):
+        return "float"
+    return "string"
+
+
+def _arrow_schema(columns):
+    import pyarrow as pa
+
+    types = {"time": pa.timestamp("ns"), "float": pa.float64(), "string": pa.string()}
+    return pa.schema([(c, types[column_type(c)]) for c in columns])
+
+
+def parse_times(values):
+    """Aviation Edge times ('2025-06-01t06:35:00.000') as datetime64; anything else -> NaT."""
+    text = pd.Series(values, dtype="string").str.upper()
+    return pd.to_datetime(text, format="ISO8601", errors="coerce")
+
+
+def _column(name, values):
+    """Arrow array of the raw ``values`` for column ``name``, typed by ``column_type``."""
+    import pyarrow as pa
+
+    kind = column_type(name)
+    if kind == "time":
+        return pa.array(parse_times(values), type=pa.timestamp("ns"))
+    if kind == "float":
+        return pa.array(pd.to_numeric(pd.Series(values, dtype=object), errors="coerce"), type=pa.float64())
+    try:
+        return pa.array(values, type=pa.string())
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        return pa.array([None if v is None else str(v) for v in values], type=pa.string())
+
+
+def _flatten(records, paths):
+    """One list of values per dotted path, e.g. ["arrival", "delay"] -> record["arrival"]["delay"].
+
+    Works a column at a time; the sub-dicts of a shared prefix are looked up once.
+    """
+    parents = {(): records}
+
+    def values_at(prefix):
+        if prefix not in parents:
+            above = values_at(prefix[:-1])
+            key = prefix[-1]
+            parents[prefix] = [v.get(key) if type(v) is dict else None for v in above]
+        return parents[prefix]
+
+    return [values_at(tuple(path)) for path in paths]
+
+
+def batch_path(batch_dir, kind, month, fmt="parquet"):
+    """File for ``kind``'s flights in ``month`` ('YYYY-MM')."""
+    return Path(batch_dir) / f"{kind}_{month}{FORMATS[fmt]}"
+
+
+class _MonthWriters:
+    """One open Parquet/Feather writer per month, each writing to a temporary file."""
+
+    def __init__(self, batch_dir, kind, schema, fmt):
+        self.batch_dir, self.kind, self.schema, self.fmt = Path(batch_dir), kind, schema, fmt
+        self.writers = {}
+        self.rows = {}
+
+    def write(self, month, table):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if month not in self.writers:
+            path = batch_path(self.batch_dir, self.kind, month, self.fmt)
+            tmp = path.with_name(path.name + ".tmp")
+            if self.fmt == "parquet":
+                writer = pq.ParquetWriter(tmp, self.schema)
+            else:
+                writer = pa.ipc.new_file(str(tmp), self.schema)
+            self.writers[month] = (writer, tmp, path)
+            self.rows[month] = 0
+        writer = self.writers[month][0]
+        if self.fmt == "parquet":
+            writer.write_table(table)
+        else:
+            for batch in table.to_batches():
+                writer.write_batch(batch)
+        self.rows[month] += table.num_rows
+
+    def close(self, keep=True):
+        for writer, tmp, path in self.writers.values():
+            writer.close()
+            if keep:
+                os.replace(tmp, path)
+            else:
+                Path(tmp).unlink(missing_ok=True)
+
+
+class _Layout:
+    """Column names, record paths and Arrow schema for one kind of flight file."""
+
+    def __init__(self, kind, raw_dir=RAW_DIR):
+        if kind not in KINDS:
+            raise ValueError(f"kind must be one of {list(KINDS)}, not {kind!r}")
+        self.columns = read_schema(kind, raw_dir)
+        if "date" not in self.columns:
+            self.columns.append("date")
+        self.fields = [c for c in self.columns if c != "date"]
+        self.paths = [c.split(".") for c in self.fields]
+        self.date_from = f"{KINDS[kind]}.scheduledTime"
+        self.schema = _arrow_schema(self.columns)
+
+    def table(self, records):
+        """Typed Arrow table of ``records`` (a list of dicts)."""
+        import pyarrow as pa
+
+        arrays = {name: _column(name, values) for name, values in zip(self.fields, _flatten(records, self.paths))}
+        arrays["date"] = arrays[self.date_from]
+        return pa.table([arrays[c] for c in self.columns], schema=self.schema)
+
+
+def _by_month(table):
+    """Yield (month, rows) for ``table`` split by the month of 'date' ('unknown' when missing)."""
+    months = table.column("date").to_numpy().astype("datetime64[M]").astype(str)
+    months[months == "NaT"] = "unknown"
+    order = np.argsort(months, kind="stable")
+    months = months[order]
+    table = table.take(order)
+    cuts = [0, *(np.flatnonzero(months[1:] != months[:-1]) + 1), len(months)]
+    for lo, hi in zip(cuts[:-1], cuts[1:]):
+        yield str(months[lo]), table.slice(lo, hi - lo)
+
+
+def convert(source, kind, batch_dir=BATCH_DIR, fmt="parquet", batch_rows=BATCH_ROWS, raw_dir=RAW_DIR):
+    """Stream the JSON history ``source`` into monthly files; returns {month: rows}.
+
+    Records with no usable scheduled time go to ``<kind>_unknown``.
+    """
+    layout = _Layout(kind, raw_dir)
+    Path(batch_dir).mkdir(parents=True, exist_ok=True)
+    writers = _MonthWriters(batch_dir, kind, layout.schema, fmt)
+
+    def flush(batch):
+        for month, rows in _by_month(layout.table(batch)):
+            writers.write(month, rows)
+
+    ok = False
+    try:
+        with open(source, "r", encoding="utf-8") as stream:
+            batch = []
+            for record in iter_json_array(stream):
+                if isinstance(record, dict):
+                    batch.append(record)
+                if len(batch) == batch_rows:
+                    flush(batch)
+                    batch = []
+            if batch:
+                flush(batch)
+        ok = True
+    finally:
+        writers.close(keep=ok)
+    return dict(sorted(writers.rows.items()))
+
+
+def fetched_by_api(raw_dir=RAW_DIR):
+    """True once flight_fetch.py has written days into the batch files (its checkpoint exists).
+
+    The raw JSON history is no longer updated then, so converting it again
+    would overwrite the fetched days with older data.
+    """
+    return (Path(raw_dir) / FETCH_CHECKPOINT).exists()
+
+
+def _read_table(path, fmt):
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    return pq.read_table(path) if fmt == "parquet" else feather.read_table(path)
+
+
+def write_day(records, kind, day, batch_dir=BATCH_DIR, fmt="parquet", raw_dir=RAW_DIR):
+    """Merge one fetched day of ``records`` into the monthly files; returns {month: rows written}.
+
+    Rows already stored for ``day`` (by their 'date') are replaced, and so are
+    stored rows with the same flight number and scheduled time as a new one,
+    so fetching a day again never duplicates it. An empty ``records`` removes
+    the stored rows for ``day``. Callers writing from several threads must
+    serialise calls for the same month.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    layout = _Layout(kind, raw_dir)
+    day = pd.Timestamp(day).normalize()
+    written = {}
+    if records:
+        months = _by_month(layout.table(records))
+    else:
+        months = [(day.strftime("%Y-%m"), layout.schema.empty_table())]
+    for month, new in months:
+        path = batch_path(batch_dir, kind, month, fmt)
+        table = new
+        if path.exists():
+            old = _read_table(path, fmt).select(layout.columns).cast(layout.schema)
+            dates = old.column("date")
+            same_day = pc.equal(pc.floor_temporal(dates, unit="day"), pa.scalar(day.as_unit("ns").to_datetime64()))
+            keys = pc.binary_join_element_wise(old.column("flight.iataNumber"), pc.cast(dates, pa.string()), "|")
+            new_keys = pc.binary_join_element_wise(new.column("flight.iataNumber"), pc.cast(new.column("date"), pa.string()), "|")
+            replaced = pc.or_kleene(pc.fill_null(same_day, False), pc.fill_null(pc.is_in(keys, new_keys), False))
+            table = pa.concat_tables([old.filter(pc.invert(replaced)), new])
+            table = table.sort_by("date")
+        elif not new.num_rows:
+            continue
+        Path(batch_dir).mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        if fmt == "parquet":
+            pq.write_table(table, tmp)
+        else:
+            feather.write_feather(table, str(tmp))
+        os.replace(tmp, path)
+        written[month] = new.num_rows
+    return written
+
+
+def load_flights(kind, batch_dir=BATCH_DIR, columns=None, fmt="parquet"):
+    """All of ``kind``'s monthly files as one DataFrame (one pyarrow read)."""
+    import pyarrow.dataset as ds
+
+    files = sorted(Path(batch_dir).glob(f"{kind}_*{FORMATS[fmt]}"))
+    if not files:
+        raise FileNotFoundError(f"No {kind} files in {batch_dir}; run convert() first")
+    dataset = ds.dataset([str(f) for f in files], format="ipc" if fmt == "feather" else fmt)
+    return dataset.to_table(columns=columns).to_pandas()
+
+
+# --- benchmark -------------------------------------------------------------
+
+def write_sample(path, records=130_000, kind="arrivals", seed=0):
+    """Write a synthetic history file shaped like the Aviation Edge response (indent=2, like Step 11)."""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2025-05-27")
+    scheduled = start + pd.to_timedelta(np.sort(rng.integers(0, 158 * 24 * 60, records)), unit="min")
+    delay = rng.integers(0, 90, records)
+
+    def side(code, ts, d):
+        t = ts.strftime("%Y-%m-%dt%H:%M:%S.000")
+        out = {"iataCode": code, "icaoCode": code + "X", "terminal": "1", "gate": "101",
+               "scheduledTime": t, "estimatedTime": t}
+        if d:
+            out["delay"] = str(d)
+            out["actualTime"] = (ts + pd.Timedelta(minutes=int(d))).strftime("%Y-%m-%dt%H:%M:%S.000")
+        return out
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[\n")
+        for i in range(records):
+            record = {
+                "type": kind[:-1], "status": "landed",
+                "departure": side("lhr", scheduled[i] - pd.Timedelta(hours=1), 0),
+                "arrival": side("dub", scheduled[i], int(delay[i])),
+                "airline": {"name": "aer lingus", "iataCode": "ei", "icaoCode": "ein"},
+                "flight": {"number": str(100 + i % 900), "iataNumber": f"ei{100 + i % 900}",
+                           "icaoNumber": f"ein{100 + i % 900}"},
+            }
+            if i % 3 == 0:
+                record["codeshared"] = {"airline": {"name": "british airways", "iataCode": "ba", "icaoCode": "baw"},
+                                        "flight": {"number": "4321", "iataNumber": "ba4321", "icaoNumber": "baw4321"}}
+            f.write(("  " if i == 0 else ",\n  ") + json.dumps(record, indent=2).replace("\n", "\n  "))
+        f.write("\n]\n")
+
+
+def _legacy_batches(source, batch_dir):
+    """Step 12 as it was: json.load -> json_normalize -> one JSON-lines file per month."""
+    with open(source, "r", encoding="utf-8") as f:
+        records = json.load(f)
+    df = pd.json_normalize(records)
+    df["date"] = pd.to_datetime(df["arrival.scheduledTime"], errors="coerce")
+    Path(batch_dir).mkdir(parents=True, exist_ok=True)
+    for month, group in df.groupby(df["date"].dt.to_period("M")):
+        group.to_json(Path(batch_dir) / f"arrivals_{month}.json", orient="records", lines=True)
+    return len(df)
+
+
+def _peak_rss(job):
+    """Run ``job`` (a function name and args) in a fresh process; return (seconds, peak RSS in MB)."""
+    import multiprocessing
+
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(_measure, job)
+
+
+def _measure(name, *args):
+    import resource
+
+    start = time.perf_counter()
+    globals()[name](*args)
+    seconds = time.perf_counter() - start
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return seconds, rss / 1024 if sys.platform != "darwin" else rss / 1e6
+
+
+def benchmark(records=130_000):
+    """Time and peak RSS of Step 12 (json.load) against the streaming converter, plus reading back."""
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        source = tmp / "dub_arrival_history.json"
+        write_sample(source, records)
+        size = os.path.getsize(source) / 1e6
+        raw_dir = Path(__file__).resolve().parent / RAW_DIR
+
+        t_old, m_old = _peak_rss(("_legacy_batches", str(source), str(tmp / "old")))
+        t_new, m_new = _peak_rss(("convert", str(source), "arrivals", str(tmp / "new"), "parquet",
+                                  BATCH_ROWS, str(raw_dir)))
+
+        start = time.perf_counter()
+        old = pd.concat([pd.read_json(f, lines=True) for f in sorted((tmp / "old").glob("*.json"))],
+                        ignore_index=True)
+        t_read_old = time.perf_counter() - start
+        start = time.perf_counter()
+        new = load_flights("arrivals", tmp / "new")
+        t_read_new = time.perf_counter() - start
+
+        same = (len(old) == len(new)
+                and np.allclose(pd.to_numeric(old["arrival.delay"]).to_numpy(float),
+                                new["arrival.delay"].to_numpy(float), equal_nan=True)
+                and (pd.to_datetime(old["arrival.scheduledTime"]).to_numpy()
+                     == new["arrival.scheduledTime"].to_numpy()).all())
+        print(f"{records:,} records, {size:.0f} MB of JSON")
+        print(f"{'json.load + json_normalize (Step 12)':<40}{t_old:6.2f} s   peak RSS {m_old:6.0f} MB")
+        print(f"{'streaming convert (parquet)':<40}{t_new:6.2f} s   peak RSS {m_new:6.0f} MB")
+        print(f"{'read back: JSON-lines batches':<40}{t_read_old:6.2f} s")
+        print(f"{'read back: Parquet batches':<40}{t_read_new:6.2f} s   same rows and values: {same}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream a raw flight history JSON file into monthly Parquet files.")
+    parser.add_argument("source", nargs="?", help="e.g. data/raw_flights/dub_arrival_history.json")
+    parser.add_argument("kind", nargs="?", choices=KINDS)
+    parser.add_argument("--out", default=str(BATCH_DIR), help="output folder (default: data/flight_batches)")
+    parser.add_argument("--format", choices=FORMATS, default="parquet")
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+    parser.add_argument("--benchmark", action="store_true")
+    parser.add_argument("--records", type=int, default=130_000, help="synthetic records for --benchmark")
+    parser.add_argument("--force", action="store_true",
+                        help="convert into the default folder even though flight_fetch.py has written to it")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        benchmark(args.records)
+        return
+    if not args.source or not args.kind:
+        parser.error("a source file and kind are required")
+    if fetched_by_api() and Path(args.out).resolve() == BATCH_DIR.resolve() and not args.force:
+        parser.error(f"{RAW_DIR / FETCH_CHECKPOINT} exists: the monthly files in {BATCH_DIR} now come from "
+                     "flight_fetch.py; use --out for another folder (or --force to overwrite them)")
+    months = convert(args.source, args.kind, args.out, args.format, args.batch_rows)
+    for month, rows in months.items():
+        path = batch_path(args.out, args.kind, month, args.format)
+        print(f"💾 {path.name}: {rows:,} records ({os.path.getsize(path) / (1024 * 1024):.2f} MB)")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print("Error:", e)
+        sys.exit(1)
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+flight_weather.py
+Author: Edward Cronin
+
+Hourly join of flights to weather for project.ipynb (Step 28 and the
+Step 31 plots), by array position instead of a hash join.
+
+Step 28 copied df_arrivals_clean, df_departures_clean and df_weather_clean
+in full, added a ``date_hour`` column to each (the flight's scheduled time
+floored to the hour, and the weather's own hourly ``date``) and ran two
+generic pd.merge hash joins on it; every Step 31 plot repeated the same
+floor-and-merge on df_arrivals / df_departures. But the weather is one row
+per hour, in order, with few gaps, so the hour already says where its row
+is. Here instead:
+
+- ``hour_positions`` turns the weather's timestamps into one int64 array
+  over every hour from the first to the last, holding the weather row of
+  that hour (-1 where the hour is missing);
+- ``join_hourly`` floors each flight's time to a whole hour as an integer,
+  subtracts the first weather hour and reads the weather row from that
+  array: one index gather per flight, no hashing, no sorting. Flight and
+  weather columns are then taken straight from the source frames, so
+  nothing is copied except the rows of the result;
+- with ``tolerance`` (e.g. pd.Timedelta("30min")) each flight instead
+  gets the latest observation at or before its exact time, if it is no
+  older than the tolerance, like pd.merge_asof(direction="backward"). This
+  is for weather observed off the hour; it uses one np.searchsorted over
+  the observation times and needs neither side sorted by the caller;
+- ``join_flights_weather`` builds Step 28's df_flights_weather from
+  arrivals and departures with its ``flight_type`` column.
+
+Inner joins return the same rows, column names (with pandas' _x / _y
+suffixes), order and dtypes as the pd.merge they replace.
+
+Run from `project` like:
+    python flight_weather.py --benchmark
+    python flight_weather.py --benchmark --scale 10
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+KEY = "date_hour"
+HOUR = np.int64(3_600_000_000_000)      # nanoseconds
+_NAT = np.iinfo(np.int64).min
+
+
+def _ns(times):
+    """int64 nanoseconds of ``times`` (NaT as the int64 minimum)."""
+    times = pd.Series(times)
+    if times.dtype != "datetime64[ns]":
+        times = pd.to_datetime(times).astype("datetime64[ns]")
+    return times.to_numpy().view(np.int64)
+
+
+def hour_positions(weather_times):
+    """(first hour in ns, weather row of every hour from the first to the last or -1)."""
+    ns = _ns(weather_times)
+    valid = ns != _NAT
+    if not valid.any():
+        return 0, np.empty(0, dtype=np.int64)
+    hours = ns[valid] // HOUR
+    first = hours.min()
+    positions = np.full(int(hours.max() - first) + 1, -1, dtype=np.int64)
+    positions[hours - first] = np.flatnonzero(valid)      # a repeated hour keeps its last row
+    return int(first * HOUR), positions
+
+
+def _weather_rows(flight_ns, weather_times, tolerance):
+    """Weather row per flight (-1 for none) and the join key per flight."""
+    present = flight_ns != _NAT
+    if tolerance is None:
+        first, positions = hour_positions(weather_times)
+        hours = np.where(present, flight_ns // HOUR, 0)
+        offset = hours - first // HOUR
+        inside = present & (offset >= 0) & (offset < len(positions))
+        rows = np.full(len(flight_ns), -1, dtype=np.int64)
+        rows[inside] = positions[offset[inside]]
+        return rows, np.where(present, hours * HOUR, _NAT)
+    ns = _ns(weather_times)
+    order = np.flatnonzero(ns != _NAT)
+    order = order[np.argsort(ns[order], kind="stable")]
+    sorted_ns = ns[order]
+    at = np.searchsorted(sorted_ns, flight_ns, side="right") - 1
+    tol = pd.Timedelta(tolerance).value
+    found = present & (at >= 0)
+    found[found] &= flight_ns[found] - sorted_ns[at[found]] <= tol
+    rows = np.where(found, order[np.maximum(at, 0)], -1) if len(order) else np.full(len(flight_ns), -1)
+    return rows, np.where(found, sorted_ns[np.maximum(at, 0)] if len(order) else _NAT, _NAT)
+
+
+def _values(column):
+    """The column's array: numpy for numpy dtypes (pandas re-checks wrapped object arrays for NA), else its ExtensionArray."""
+    return column.array if isinstance(column.dtype, pd.api.extensions.ExtensionDtype) else column.to_numpy()
+
+
+def _take(column, rows, fill):
+    values = _values(column)
+    return pd.api.extensions.take(values, rows, allow_fill=True) if fill else values.take(rows)
+
+
+def _match(flights, weather, time_col, weather_time_col, how, tolerance):
+    """(flight rows kept, weather row per kept flight or -1, join key per kept flight in ns)."""
+    if how not in ("inner", "left"):
+        raise ValueError(f"how must be 'inner' or 'left', not {how!r}")
+    rows, key_ns = _weather_rows(_ns(flights[time_col]), weather[weather_time_col], tolerance)
+    if how == "left":
+        return np.arange(len(flights)), rows, key_ns
+    keep = np.flatnonzero(rows >= 0)
+    return keep, rows[keep], key_ns[keep]
+
+
+def _names(flights, weather, columns, key, suffixes):
+    """{flight column: output name}, {weather column: output name}, with pd.merge's suffixes on clashes."""
+    left = [c for c in flights.columns if c != key]
+    right = [c for c in (weather.columns if columns is None else columns) if c != key]
+    both = set(left) & set(right)
+    return ({c: f"{c}{suffixes[0]}" if c in both else c for c in left},
+            {c: f"{c}{suffixes[1]}" if c in both else c for c in right})
+
+
+def join_hourly(flights, weather, time_col, weather_time_col="date", columns=None, how="inner",
+                tolerance=None, key=KEY, suffixes=("_x", "_y")):
+    """Each flight with the weather of its hour (``weather`` one row per hour, as df_weather_clean).
+
+    ``time_col`` is the flight time to join on (e.g. 'arrival.scheduledTime');
+    ``columns`` limits the weather columns (default all). ``how`` is 'inner'
+    (flights without weather are dropped, like Step 28) or 'left' (kept,
+    with missing weather). The result has the flight columns, ``key`` (the
+    flight's hour, or the matched observation time with ``tolerance``) and
+    the weather columns, with ``suffixes`` on names both sides have.
+    """
+    keep, rows, key_ns = _match(flights, weather, time_col, weather_time_col, how, tolerance)
+    left, right = _names(flights, weather, columns, key, suffixes)
+    out = {name: _values(flights[c]).take(keep) for c, name in left.items()}
+    out[key] = key_ns.view("datetime64[ns]")
+    fill = bool((rows < 0).any())
+    out.update({name: _take(weather[c], rows, fill) for c, name in right.items()})
+    return pd.DataFrame(out, copy=False)
+
+
+def join_flights_weather(arrivals, departures, weather, weather_time_col="date", columns=None, how="inner",
+                         tolerance=None, key=KEY):
+    """Step 28's df_flights_weather: arrivals and departures joined to ``weather``, with a flight_type column.
+
+    Same result as concatenating the two join_hourly results, but every
+    weather column is gathered once for both and only the flight columns
+    go through pd.concat.
+    """
+    sides = [(arrivals, "arrival.scheduledTime", "Arrival"), (departures, "departure.scheduledTime", "Departure")]
+    matches = [_match(f, weather, t, weather_time_col, how, tolerance) for f, t, _ in sides]
+    names = [_names(f, weather, columns, key, ("_x", "_y")) for f, _, _ in sides]
+
+    flight_names = list(names[0][0].values())
+    flight_names += [n for n in names[1][0].values() if n not in flight_names]
+    parts = [pd.DataFrame({name: _values(f[c]).take(keep) for c, name in left.items()}, copy=False)
+             .reindex(columns=[n for n in flight_names if n in left.values()])
+             if len(left) else pd.DataFrame(index=range(len(keep)))
+             for (f, _, _), (keep, _, _), (left, _) in zip(sides, matches, names)]
+    flights = pd.concat(parts, ignore_index=True)
+
+    rows = np.concatenate([m[1] for m in matches])
+    out = {name: _values(flights[name]) for name in names[0][0].values()}
+    out[key] = np.concatenate([m[2] for m in matches]).view("datetime64[ns]")
+    fill = bool((rows < 0).any())
+    out.update({name: _take(weather[c], rows, fill) for c, name in names[0][1].items()})
+    flight_type = np.empty(len(rows), dtype=object)
+    flight_type[:len(matches[0][0])] = sides[0][2]
+    flight_type[len(matches[0][0]):] = sides[1][2]
+    out["flight_type"] = flight_type
+    out.update({name: _values(flights[name]) for name in flight_names if name not in out})
+    return pd.DataFrame(out, copy=False)
+
+
+# --- benchmark -------------------------------------------------------------
+
+def _sample(scale=1, seed=0):
+    """Clean arrivals/departures (Step 16/21 views) and May–Oct hourly weather at ``scale`` x Step 28's volume."""
+    rng = np.random.default_rng(seed)
+    hours = pd.date_range("2025-05-01", "2025-10-31 23:00", freq="h")
+    hours = hours[rng.random(len(hours)) > 0.01]          # a few missing hours, as in the real file
+    weather = pd.DataFrame({"date": hours})
+    for name in ["rain", "temp", "wetb", "dewpt", "vappr", "rhum", "msl", "wdsp", "wddir", "ww", "w",
+                 "sun", "vis", "clht", "clamt"]:
+        weather[name] = np.round(rng.normal(10, 5, len(hours)), 1)
+    weather["month"] = hours.to_period("M").start_time.date
+    for name in ["risk_wind", "risk_temp", "risk_visib", "risk_precip", "risk_score"]:
+        weather[name] = rng.integers(0, 2, len(hours))
+
+    def flights(side, n):
+        start = pd.Timestamp("2025-05-27").value
+        scheduled = pd.to_datetime(np.sort(rng.integers(start, pd.Timestamp("2025-11-01").value, n)))
+        df = pd.DataFrame({
+            "type": pd.Categorical([side] * n), "status": pd.Categorical(["landed"] * n),
+            f"{side}.delay": pd.array(rng.integers(-10, 90, n), dtype="Int64"),
+            f"{side}.scheduledTime": scheduled.floor("h"), f"{side}.actualTime": scheduled.ceil("h"),
+            "airline.name": pd.Categorical(rng.choice(["aer lingus", "ryanair", "british airways"], n)),
+            "date": scheduled, "computed_delay": rng.normal(5, 20, n),
+        })
+        return df
+
+    arrivals = flights("arrival", 127_968 * scale)
+    arrivals.insert(7, "arrival.actual_missing", rng.random(len(arrivals)) < 0.1)
+    arrivals["arrival.delay_imputed"] = False
+    departures = flights("departure", 137_444 * scale)
+    return arrivals, departures, weather
+
+
+def _legacy_step28(df_arrivals_clean, df_departures_clean, df_weather_clean):
+    """Step 28 as it was: three full copies, dt.floor and two pd.merge hash joins."""
+    arrivals_for_merge = df_arrivals_clean.copy()
+    departures_for_merge = df_departures_clean.copy()
+    weather_for_merge = df_weather_clean.copy()
+    arrivals_for_merge["date_hour"] = arrivals_for_merge["arrival.scheduledTime"].dt.floor("h")
+    departures_for_merge["date_hour"] = departures_for_merge["departure.scheduledTime"].dt.floor("h")
+    weather_for_merge["date_hour"] = weather_for_merge["date"]
+    arrivals_weather = pd.merge(arrivals_for_merge, weather_for_merge, on="date_hour", how="inner")
+    departures_weather = pd.merge(departures_for_merge, weather_for_merge, on="date_hour", how="inner")
+    arrivals_weather["flight_type"] = "Arrival"
+    departures_weather["flight_type"] = "Departure"
+    return pd.concat([arrivals_weather, departures_weather], ignore_index=True)
+
+
+def benchmark(scale=10, repeat=3):
+    """Step 28's merges against join_flights_weather, and pd.merge_asof against a tolerance join."""
+    arrivals, departures, weather = _sample(scale)
+    off_hour = weather.assign(date=weather["date"] + pd.to_timedelta(np.random.default_rng(1).integers(
+        -20, 20, len(weather)), unit="min"))
+
+    def best(func, *args, **kwargs):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            times.append(time.perf_counter() - start)
+        return result, min(times)
+
+    old, t_old = best(_legacy_step28, arrivals, departures, weather)
+    new, t_new = best(join_flights_weather, arrivals, departures, weather)
+    same = old.equals(new)
+    del old, new
+
+    def legacy_asof():
+        left = arrivals.sort_values("arrival.scheduledTime")
+        return pd.merge_asof(left, off_hour.sort_values("date"), left_on="arrival.scheduledTime",
+                             right_on="date", tolerance=pd.Timedelta("30min"))
+
+    old_asof, t_old_asof = best(legacy_asof)
+    new_asof, t_new_asof = best(join_hourly, arrivals, off_hour, "arrival.scheduledTime", how="left",
+                                tolerance="30min")
+    same_asof = np.allclose(old_asof.sort_index()["temp"].to_numpy(float), new_asof["temp"].to_numpy(float),
+                            equal_nan=True)
+    print(f"{len(arrivals):,} arrivals + {len(departures):,} departures ({scale}x Step 28), "
+          f"{len(weather):,} weather hours; best of {repeat}")
+    print(f"{'Step 28: 3 copies + floor + 2 pd.merge':<42}{t_old:6.2f} s")
+    print(f"{'join_flights_weather (hour index gather)':<42}{t_new:6.2f} s   ({t_old / t_new:.1f}x)   "
+          f"same result: {same}")
+    print(f"{'arrivals: sort + pd.merge_asof, 30 min':<42}{t_old_asof:6.2f} s")
+    print(f"{'join_hourly(tolerance=30 min)':<42}{t_new_asof:6.2f} s   ({t_old_asof / t_new_asof:.1f}x)   "
+          f"same temps: {same_asof}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Hourly flights x weather join by array position.")
+    parser.add_argument("--benchmark", action="store_true")
+    parser.add_argument("--scale", type=int, default=10, help="multiple of Step 28's flight volume")
+    args = parser.parse_args(argv)
+    if args.benchmark:
+        benchmark(args.scale)
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print("Error:", e)
+        sys.exit(1)